@@ -0,0 +1,469 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+import random
+import socket
+import struct
+import zlib
+from typing import Dict, List, NamedTuple, Optional
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from indexer.boc import BocException, Cell, deserialize_boc, serialize_boc, parse_hashmap, parse_hashmap_e, parse_vm_stack, build_vm_stack
+from indexer.liteclient import LiteClientException, account_data_fingerprint
+from indexer.utils import ValidatorSet, parse_complaints_list
+
+
+# TL schemes, ref: https://github.com/ton-blockchain/ton/blob/master/tl/generate/scheme/lite_api.tl
+def tl_id(scheme: str) -> bytes:
+    return struct.pack('<I', zlib.crc32(scheme.encode()))
+
+PUB_ED25519 = tl_id('pub.ed25519 key:int256 = PublicKey')
+ADNL_QUERY = tl_id('adnl.message.query query_id:int256 query:bytes = adnl.Message')
+ADNL_ANSWER = tl_id('adnl.message.answer query_id:int256 answer:bytes = adnl.Message')
+LS_QUERY = tl_id('liteServer.query data:bytes = Object')
+LS_ERROR = tl_id('liteServer.error code:int message:string = liteServer.Error')
+LS_GET_MASTERCHAIN_INFO = tl_id('liteServer.getMasterchainInfo = liteServer.MasterchainInfo')
+LS_MASTERCHAIN_INFO = tl_id('liteServer.masterchainInfo last:tonNode.blockIdExt state_root_hash:int256 init:tonNode.zeroStateIdExt = liteServer.MasterchainInfo')
+LS_LOOKUP_BLOCK = tl_id('liteServer.lookupBlock mode:# id:tonNode.blockId lt:mode.1?long utime:mode.2?int = liteServer.BlockHeader')
+LS_BLOCK_HEADER = tl_id('liteServer.blockHeader id:tonNode.blockIdExt mode:# header_proof:bytes = liteServer.BlockHeader')
+LS_GET_CONFIG_PARAMS = tl_id('liteServer.getConfigParams mode:# id:tonNode.blockIdExt param_list:(vector int) = liteServer.ConfigInfo')
+LS_CONFIG_INFO = tl_id('liteServer.configInfo mode:# id:tonNode.blockIdExt state_proof:bytes config_proof:bytes = liteServer.ConfigInfo')
+LS_GET_ACCOUNT_STATE = tl_id('liteServer.getAccountState id:tonNode.blockIdExt account:liteServer.accountId = liteServer.AccountState')
+LS_ACCOUNT_STATE = tl_id('liteServer.accountState id:tonNode.blockIdExt shardblk:tonNode.blockIdExt shard_proof:bytes proof:bytes state:bytes = liteServer.AccountState')
+LS_RUN_SMC_METHOD = tl_id('liteServer.runSmcMethod mode:# id:tonNode.blockIdExt account:liteServer.accountId method_id:long params:bytes = liteServer.RunMethodResult')
+LS_RUN_METHOD_RESULT = tl_id('liteServer.runMethodResult mode:# id:tonNode.blockIdExt shardblk:tonNode.blockIdExt shard_proof:mode.0?bytes proof:mode.0?bytes state_proof:mode.1?bytes init_c7:mode.3?bytes lib_extras:mode.4?bytes exit_code:int result:mode.2?bytes = liteServer.RunMethodResult')
+
+MASTERCHAIN = -1
+MASTERCHAIN_SHARD = -0x8000000000000000
+
+
+def tl_bytes(data: bytes) -> bytes:
+    if len(data) < 254:
+        result = bytes([len(data)]) + data
+    else:
+        result = b'\xfe' + len(data).to_bytes(3, 'little') + data
+    return result + b'\x00' * (-len(result) % 4)
+
+
+class TlReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, n: int) -> bytes:
+        if self.pos + n > len(self.data):
+            raise LiteClientException('Unexpected end of TL answer')
+        self.pos += n
+        return self.data[self.pos - n:self.pos]
+
+    def int(self) -> int:
+        return struct.unpack('<i', self.read(4))[0]
+
+    def long(self) -> int:
+        return struct.unpack('<q', self.read(8))[0]
+
+    def bytes(self) -> bytes:
+        start = self.pos
+        length = self.read(1)[0]
+        if length == 254:
+            length = int.from_bytes(self.read(3), 'little')
+        data = self.read(length)
+        self.read(-(self.pos - start) % 4)
+        return data
+
+    def block_id_ext(self):
+        workchain, shard, seqno = struct.unpack('<iqi', self.read(16))
+        return BlockIdExt(workchain, shard, seqno, self.read(32), self.read(32))
+
+
+class BlockIdExt(NamedTuple):
+    workchain: int
+    shard: int
+    seqno: int
+    root_hash: bytes
+    file_hash: bytes
+
+    def serialize(self) -> bytes:
+        return struct.pack('<iqi', self.workchain, self.shard, self.seqno) + self.root_hash + self.file_hash
+
+    def __str__(self):
+        # the same format lite-client uses
+        return f'({self.workchain},{self.shard % (1 << 64):016x},{self.seqno}):{self.root_hash.hex().upper()}:{self.file_hash.hex().upper()}'
+
+    @classmethod
+    def from_str(cls, block_id_ext: str):
+        block_id, root_hash, file_hash = block_id_ext.split(':')
+        workchain, shard, seqno = block_id.strip('()').split(',')
+        shard = int(shard, 16)
+        if shard >= 1 << 63:
+            shard -= 1 << 64
+        return cls(int(workchain), shard, int(seqno), bytes.fromhex(root_hash), bytes.fromhex(file_hash))
+
+
+# ed25519 <-> x25519 public key conversion, ADNL uses ed25519 keys for x25519 key agreement
+P25519 = 2 ** 255 - 19
+
+def _ed25519_to_x25519(key: bytes) -> bytes:
+    y = int.from_bytes(key, 'little') & ((1 << 255) - 1)
+    u = (1 + y) * pow(1 - y, P25519 - 2, P25519) % P25519
+    return u.to_bytes(32, 'little')
+
+def _x25519_to_ed25519(key: bytes) -> bytes:
+    u = int.from_bytes(key, 'little')
+    y = (u - 1) * pow(u + 1, P25519 - 2, P25519) % P25519
+    return y.to_bytes(32, 'little')
+
+def _aes_ctr(key: bytes, iv: bytes):
+    return Cipher(algorithms.AES(key), modes.CTR(iv)).encryptor()
+
+
+class AdnlConnection:
+    """ADNL over TCP connection to a single liteserver.
+
+    Queries are multiplexed by query id, any number of them can be in flight.
+    Ref: https://docs.ton.org/learn/networking/adnl
+    """
+    def __init__(self, host: str, port: int, server_key: bytes):
+        self.host = host
+        self.port = port
+        self.server_key = server_key
+        self.reader = None
+        self.writer = None
+        self.closed = False
+        self._pending = dict()
+        self._ready = None
+        self._read_task = None
+
+    async def connect(self, timeout: float):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+
+        private_key = X25519PrivateKey.generate()
+        public_key = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+        shared = private_key.exchange(X25519PublicKey.from_public_bytes(_ed25519_to_x25519(self.server_key)))
+
+        params = os.urandom(160)
+        checksum = hashlib.sha256(params).digest()
+        self._decryptor = _aes_ctr(params[0:32], params[64:80])
+        self._encryptor = _aes_ctr(params[32:64], params[80:96])
+
+        handshake_cipher = _aes_ctr(shared[0:16] + checksum[16:32], checksum[0:4] + shared[20:32])
+        key_id = hashlib.sha256(PUB_ED25519 + self.server_key).digest()
+        self.writer.write(key_id + _x25519_to_ed25519(public_key) + checksum + handshake_cipher.update(params))
+
+        self._ready = asyncio.get_running_loop().create_future()
+        self._read_task = asyncio.ensure_future(self._read_loop())
+        try:
+            # liteserver confirms the handshake with an empty packet
+            await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+        except asyncio.TimeoutError:
+            self.close()
+            raise LiteClientException(f'ADNL handshake timeout: {self.host}:{self.port}')
+
+    def _send(self, payload: bytes):
+        nonce = os.urandom(32)
+        packet = nonce + payload + hashlib.sha256(nonce + payload).digest()
+        self.writer.write(self._encryptor.update(struct.pack('<I', len(packet)) + packet))
+
+    async def _read_packet(self) -> bytes:
+        length = struct.unpack('<I', self._decryptor.update(await self.reader.readexactly(4)))[0]
+        packet = self._decryptor.update(await self.reader.readexactly(length))
+        if length < 64 or hashlib.sha256(packet[:-32]).digest() != packet[-32:]:
+            raise LiteClientException('ADNL packet checksum mismatch')
+        return packet[32:-32]
+
+    async def _read_loop(self):
+        error = None
+        try:
+            while True:
+                payload = await self._read_packet()
+                if not payload:
+                    if not self._ready.done():
+                        self._ready.set_result(True)
+                    continue
+                if payload[:4] != ADNL_ANSWER:
+                    # tcp.pong and other messages are not used
+                    continue
+                reader = TlReader(payload[4:])
+                query_id = reader.read(32)
+                future = self._pending.pop(query_id, None)
+                if future is not None and not future.done():
+                    future.set_result(reader.bytes())
+        except asyncio.CancelledError:
+            error = LiteClientException('ADNL connection closed')
+        except (OSError, asyncio.IncompleteReadError) as e:
+            error = LiteClientException(f'ADNL connection lost: {e!r}')
+        except Exception as e:
+            error = e if isinstance(e, LiteClientException) else LiteClientException(f'ADNL protocol error: {e!r}')
+        self.close(error)
+
+    async def query(self, data: bytes, timeout: float) -> bytes:
+        if self.closed:
+            raise LiteClientException('ADNL connection closed')
+        query_id = os.urandom(32)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[query_id] = future
+        self._send(ADNL_QUERY + query_id + tl_bytes(data))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise LiteClientException(f'LiteServer query timeout: {self.host}:{self.port}')
+        finally:
+            self._pending.pop(query_id, None)
+
+    def close(self, error: Optional[Exception] = None):
+        if self.closed:
+            return
+        self.closed = True
+        error = error or LiteClientException('ADNL connection closed')
+        for future in list(self._pending.values()) + [self._ready]:
+            if future is not None and not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        if self._read_task is not None and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+
+class AsyncLiteClient:
+    """Asyncio liteserver client with the interface of indexer.liteclient.LiteClient.
+
+    Answers are decoded from BoC into the same values LiteClient parses out of
+    lite-client text output. All queries share one ADNL connection, which is
+    re-established on the next query after it is lost.
+    """
+    def __init__(self, config_path: str, index: Optional[int] = None, timeout: float = 10):
+        with open(config_path, 'r') as f:
+            self.liteservers = json.load(f)['liteservers']
+        self.index = index
+        self.timeout = timeout
+        self._connection = None
+        self._connect_lock = None
+
+    async def _get_connection(self) -> AdnlConnection:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._connection is None or self._connection.closed:
+                index = self.index if self.index is not None else random.randrange(len(self.liteservers))
+                liteserver = self.liteservers[index]
+                host = socket.inet_ntoa(struct.pack('>I', liteserver['ip'] % (1 << 32)))
+                key = base64.b64decode(liteserver['id']['key'])
+                connection = AdnlConnection(host, liteserver['port'], key)
+                try:
+                    await connection.connect(self.timeout)
+                except (OSError, asyncio.TimeoutError) as e:
+                    connection.close()
+                    raise LiteClientException(f'Failed to connect to liteserver {host}:{liteserver["port"]}: {e!r}')
+                self._connection = connection
+            return self._connection
+
+    async def _query(self, request: bytes, expected: bytes) -> TlReader:
+        connection = await self._get_connection()
+        answer = await connection.query(LS_QUERY + tl_bytes(request), self.timeout)
+        reader = TlReader(answer)
+        constructor = reader.read(4)
+        if constructor == LS_ERROR:
+            code = reader.int()
+            message = reader.bytes().decode('utf-8', 'replace')
+            raise LiteClientException(f'LiteServer error {code}: {message}')
+        if constructor != expected:
+            raise LiteClientException(f'Unexpected liteserver answer: {constructor.hex()}')
+        return reader
+
+    async def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def get_masterchain_info(self) -> BlockIdExt:
+        reader = await self._query(LS_GET_MASTERCHAIN_INFO, LS_MASTERCHAIN_INFO)
+        return reader.block_id_ext()
+
+    async def lookup_block(self, utime: int) -> BlockIdExt:
+        request = LS_LOOKUP_BLOCK + struct.pack('<Iiqii', 4, MASTERCHAIN, MASTERCHAIN_SHARD, 0, utime)
+        reader = await self._query(request, LS_BLOCK_HEADER)
+        return reader.block_id_ext()
+
+    async def get_config_params(self, config_ids: List[int], block: Optional[BlockIdExt] = None) -> Dict[int, Optional[Cell]]:
+        block = block or await self.get_masterchain_info()
+        request = LS_GET_CONFIG_PARAMS + struct.pack('<I', 0) + block.serialize()
+        request += struct.pack('<i', len(config_ids)) + b''.join(struct.pack('<i', i) for i in config_ids)
+        reader = await self._query(request, LS_CONFIG_INFO)
+        reader.int()
+        reader.block_id_ext()
+        reader.bytes()  # state_proof
+        config_proof = reader.bytes()
+        try:
+            # MerkleProof -> ShardStateUnsplit -> custom:^McStateExtra
+            state = deserialize_boc(config_proof)[0].refs[0]
+            s = state.refs[3].begin_parse()
+            if s.load_uint(16) != 0xcc26:
+                raise BocException('McStateExtra expected')
+            if s.load_bit():
+                s.load_ref()  # shard_hashes
+            s.load_uint(256)  # config_addr
+            params = parse_hashmap(s.load_ref(), 32)
+        except (BocException, IndexError) as e:
+            raise LiteClientException(f'Failed to parse config proof: {e}')
+        return {i: params[i].load_ref() if i in params else None for i in config_ids}
+
+    async def run_smc_method(self, addr: str, method: str, params: list = [], block: Optional[BlockIdExt] = None):
+        block = block or await self.get_masterchain_info()
+        workchain, account = addr.split(':')
+        method_id = (binascii.crc_hqx(method.encode(), 0) & 0xffff) | 0x10000  # CRC16-XMODEM
+        stack = serialize_boc(build_vm_stack([int(param) for param in params]))
+        request = LS_RUN_SMC_METHOD + struct.pack('<I', 4) + block.serialize()
+        request += struct.pack('<i', int(workchain)) + bytes.fromhex(account.rjust(64, '0'))
+        request += struct.pack('<q', method_id) + tl_bytes(stack)
+        reader = await self._query(request, LS_RUN_METHOD_RESULT)
+        mode = reader.int()
+        reader.block_id_ext()
+        reader.block_id_ext()
+        for flag in (1, 1, 2, 8, 16):
+            if mode & flag:
+                reader.bytes()
+        exit_code = reader.int()
+        if exit_code not in (0, 1) or not mode & 4:
+            return None
+        try:
+            return parse_vm_stack(deserialize_boc(reader.bytes())[0])
+        except BocException as e:
+            raise LiteClientException(f'Failed to parse VM stack: {e}')
+
+    async def get_account_state(self, addr: str, block: Optional[BlockIdExt] = None) -> bytes:
+        """BoC of the Account, empty for an account that does not exist."""
+        block = block or await self.get_masterchain_info()
+        workchain, account = addr.split(':')
+        request = LS_GET_ACCOUNT_STATE + block.serialize()
+        request += struct.pack('<i', int(workchain)) + bytes.fromhex(account.rjust(64, '0'))
+        reader = await self._query(request, LS_ACCOUNT_STATE)
+        reader.block_id_ext()
+        reader.block_id_ext()
+        reader.bytes()  # shard_proof
+        reader.bytes()  # proof
+        return reader.bytes()
+
+    async def _block(self, block: Optional[str]) -> BlockIdExt:
+        if block is None:
+            return await self.get_masterchain_info()
+        return BlockIdExt.from_str(block)
+
+    async def get_last_block(self):
+        return str(await self.get_masterchain_info())
+
+    async def get_block_by_utime(self, timestamp: int):
+        return str(await self.lookup_block(timestamp))
+
+    async def get_config(self, config_id: int, block: Optional[str] = None):
+        cell = (await self.get_config_params([config_id], await self._block(block)))[config_id]
+        if cell is None:
+            raise LiteClientException(f'Config param {config_id} is not set')
+        s = cell.begin_parse()
+        if config_id == 1:
+            return {'elector_addr': f'x{s.load_uint(256):064X}'}
+        if config_id == 15:
+            keys = ['validators_elected_for', 'elections_start_before', 'elections_end_before', 'stake_held_for']
+            return {key: s.load_uint(32) for key in keys}
+        if config_id == 16:
+            keys = ['max_validators', 'max_main_validators', 'min_validators']
+            return {key: s.load_uint(16) for key in keys}
+        if config_id == 17:
+            config = dict()
+            for key in ['min_stake', 'max_stake', 'min_total_stake']:
+                length = s.load_uint_less(16)
+                amount = {'_': 'var_uint', 'len': length, 'value': s.load_uint(length * 8)}
+                config[key] = {'_': 'nanograms', 'amount': amount}
+            config['max_stake_factor'] = s.load_uint(32)
+            return config
+        raise LiteClientException(f'Config param {config_id} is not supported by the native backend')
+
+    async def get_elector_address(self, block: Optional[str] = None):
+        elector_contract = (await self.get_config(1, block))['elector_addr']
+        if elector_contract[0] == 'x':
+            elector_contract = f'-1:{elector_contract[1:]}'
+        return elector_contract
+
+    async def run_method(self, addr: str, method: str, params: list = [], block: Optional[str] = None):
+        return await self.run_smc_method(addr, method, params, await self._block(block))
+
+    async def run_method_full(self, addr: str, method: str, params: list = [], timestamp: Optional[int] = None, block: Optional[str] = None):
+        if timestamp is not None:
+            return await self.run_smc_method(addr, method, params, await self.lookup_block(timestamp))
+        return await self.run_smc_method(addr, method, params, await self._block(block))
+
+    async def get_account_data_fingerprint(self, addr: str, block: Optional[str] = None):
+        state = await self.get_account_state(addr, await self._block(block))
+        if not state:
+            raise LiteClientException(f'Account {addr} does not exist')
+        return account_data_fingerprint(state)
+
+    async def get_config_17(self, block: Optional[str] = None):
+        config = await self.get_config(17, block)
+        config17 = dict()
+        config17["min_stake"] = config["min_stake"]["amount"]["value"]
+        config17["max_stake"] = config["max_stake"]["amount"]["value"]
+        config17["max_stake_factor"] = config["max_stake_factor"]
+        return config17
+
+    async def get_validator_set(self, config_id: int, block: Optional[str] = None):
+        if config_id not in [32, 34, 36]:
+            raise ValueError("config_id has to be 32, 34, 36")
+
+        cell = (await self.get_config_params([config_id], await self._block(block)))[config_id]
+        if cell is None:
+            return None
+        # Ref: https://github.com/ton-blockchain/ton/blob/master/crypto/block/block.tlb (ValidatorSet)
+        s = cell.begin_parse()
+        tag = s.load_uint(8)
+        if tag not in (0x11, 0x12):
+            raise LiteClientException(f'Unknown ValidatorSet tag: {tag:x}')
+        utime_since = s.load_uint(32)
+        utime_until = s.load_uint(32)
+        total = s.load_uint(16)
+        s.load_uint(16)  # main
+        total_weight = None
+        if tag == 0x12:
+            total_weight = s.load_uint(64)
+            descriptions = parse_hashmap_e(s, 16)
+        else:
+            descriptions = parse_hashmap(s, 16)
+
+        pubkeys, adnl_addrs, weights = [], [], []
+        for descr in descriptions.values():
+            descr_tag = descr.load_uint(8)
+            descr.load_uint(32)  # ed25519_pubkey#8e81278a
+            pubkeys.append(f'{descr.load_uint(256):064X}')
+            weights.append(descr.load_uint(64))
+            adnl_addrs.append(f'{descr.load_uint(256):064X}' if descr_tag == 0x73 else None)
+        if total_weight is None:
+            total_weight = sum(weights)
+        return ValidatorSet(total, utime_since, utime_until, total_weight, pubkeys, adnl_addrs, weights)
+
+    async def get_validators_list(self, config_id: int, block: Optional[str] = None):
+        val_set = await self.get_validator_set(config_id, block)
+        if val_set is None:
+            return None
+        return val_set.to_dict()
+
+    async def get_complaints_list(self, config_id: int, block: Optional[str] = None):
+        if config_id not in [32, 34]:
+            raise ValueError("config_id has to be 32, 34")
+
+        elector_contract = await self.get_elector_address(block)
+        val_set = await self.get_validator_set(config_id, block)
+        election_id = val_set.utime_since
+        complaints_raw = await self.run_method_full(elector_contract, 'list_complaints', [election_id], block=block)
+
+        if complaints_raw is None:
+            return []
+
+        complaints_raw = complaints_raw[0]
+
+        return parse_complaints_list(complaints_raw, val_set)
@@ -0,0 +1,140 @@
+"""Backfill of past validation cycles, elections and complaints.
+
+    python3 -m indexer.backfill [--since UNIXTIME] [--parallel N]
+
+Cycles are found by walking config 34 back through cycle boundaries, then
+every cycle is read at the last masterchain block before its end. Finished
+cycles are recorded in a checkpoint, so an interrupted run resumes where it
+stopped. The beat tasks keep indexing the current cycle and election.
+"""
+import argparse
+import logging
+import time
+
+import indexer.constants as constants
+from indexer.database import mongo, get_database, bootstrap_database, bump_data_version, upsert_changed
+from indexer.liteclient import create_lite_client, run_parallel, LiteClientException
+from indexer.lookups import update_cycle_lookups, update_election_lookups
+from indexer.utils import parse_election, set_complaints_wallet_address, ELECTION_CLOSE_THRESHOLD
+from indexer.views import update_cycle_views
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = 'backfill'
+
+
+def find_cycles(lite_client, since: int):
+    """(cycle_id, utime_until) of finished cycles that started at or after `since`, newest first."""
+    cycles = []
+    previous_since = None
+    block = lite_client.get_last_block()
+    while True:
+        val_set = lite_client.snapshot(block).get_validator_set(34)
+        if val_set is None or val_set.utime_since < since:
+            break
+        if previous_since is not None and val_set.utime_since >= previous_since:
+            # block lookup did not move back past the cycle start
+            break
+        previous_since = val_set.utime_since
+        if val_set.utime_until <= time.time():
+            cycles.append((val_set.utime_since, val_set.utime_until))
+        try:
+            block = lite_client.get_block_by_utime(val_set.utime_since - 1)
+        except Exception as e:
+            # liteserver without history of earlier blocks
+            logger.warning(f"Can not look up block before cycle {val_set.utime_since}: {e}")
+            break
+    return cycles
+
+
+def read_cycle(lite_client, cycle_id: int, utime_until: int):
+    """Cycle, election and complaints documents of a past cycle, with the seqno of the block they were read at."""
+    snapshot = lite_client.snapshot(lite_client.get_block_by_utime(utime_until - 1))
+    validators, config15, config16, config17 = snapshot.gather(('get_validators_list', 34),
+                                                               ('get_config', 15),
+                                                               ('get_config', 16),
+                                                               ('get_config_17',),
+                                                               max_in_flight=1)  # cycles are read in parallel instead
+    if validators['utime_since'] != cycle_id:
+        raise LiteClientException(f'Unexpected validator set {validators["utime_since"]} for cycle {cycle_id}')
+    cycle = {
+        'cycle_id': cycle_id,
+        'cycle_info': validators,
+        'config15': config15,
+        'config16': config16,
+        'config17': config17
+    }
+
+    elector_contract = snapshot.get_elector_address()
+    before_closing_election = cycle_id - config15['elections_end_before'] - ELECTION_CLOSE_THRESHOLD
+    participants_info = snapshot.run_method_full(elector_contract, 'participant_list_extended', timestamp=before_closing_election)
+    election = parse_election(cycle_id, participants_info, finished=True)
+
+    complaints = snapshot.get_complaints_list(34)
+    set_complaints_wallet_address(complaints, election['participants_list'])
+    return cycle, election, complaints, snapshot.seqno
+
+
+def write_cycle(db, cycle: dict, election: dict, complaints: list, seqno: int):
+    upsert_changed(db.validation_data, 'cycle_id', [cycle], seqno)
+    upsert_changed(db.elections_data, 'election_id', [election], seqno)
+    upsert_changed(db.complaints_data, 'pseudohash', complaints, seqno)
+    update_cycle_lookups(db, cycle)
+    update_election_lookups(db, election)
+    update_cycle_views(db, [cycle['cycle_id']], seqno)
+    db.service_state.update_one({'_id': CHECKPOINT_ID}, {'$addToSet': {'cycle_ids': cycle['cycle_id']}}, upsert=True)
+
+
+def backfill(lite_client, db, since: int, parallel: int):
+    checkpoint = db.service_state.find_one({'_id': CHECKPOINT_ID}) or {}
+    done = set(checkpoint.get('cycle_ids', []))
+    cycles = [cycle for cycle in find_cycles(lite_client, since) if cycle[0] not in done]
+    logger.info(f"{len(cycles)} cycles to backfill, {len(done)} done before")
+
+    def read(cycle_id, utime_until):
+        try:
+            return read_cycle(lite_client, cycle_id, utime_until)
+        except Exception as e:
+            logger.error(f"Failed to read cycle {cycle_id}: {e}")
+            return None
+
+    failed = 0
+    for i in range(0, len(cycles), parallel):
+        chunk = cycles[i:i + parallel]
+        results = run_parallel([lambda cycle=cycle: read(*cycle) for cycle in chunk], parallel)
+        for (cycle_id, _), result in zip(chunk, results):
+            if result is None:
+                failed += 1
+                continue
+            write_cycle(db, *result)
+            logger.info(f"Cycle {cycle_id} backfilled")
+        bump_data_version(db)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill past validation cycles, elections and complaints')
+    parser.add_argument('--since', type=int, default=0, help='oldest cycle start (unixtime) to backfill')
+    parser.add_argument('--parallel', type=int, default=constants.LITE_CLIENT_POOL_SIZE, help='cycles read concurrently')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    lite_client = create_lite_client(constants.LITE_CLIENT_BACKEND,
+                                     constants.LITE_CLIENT_BINARY,
+                                     constants.LITE_CLIENT_CONFIG,
+                                     args.parallel)
+    db = get_database()
+    try:
+        bootstrap_database(db)
+        failed = backfill(lite_client, db, args.since, args.parallel)
+    finally:
+        lite_client.close()
+        mongo.close()
+    if failed:
+        logger.error(f"{failed} cycles failed, run the backfill again to retry them")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+import hashlib
+from typing import Dict, List, Optional, Union
+
+
+# Ref: https://github.com/ton-blockchain/ton/blob/master/crypto/tl/boc.tlb
+BOC_MAGIC = b'\xb5\xee\x9c\x72'
+
+PRUNED_BRANCH = 1
+MERKLE_PROOF = 3
+
+
+class BocException(Exception):
+    pass
+
+
+class Cell:
+    __slots__ = ('data', 'bits', 'refs', 'special', '_hash', '_depth')
+
+    def __init__(self, data: bytes = b'', bits: int = 0, refs: Optional[list] = None, special: bool = False):
+        self.data = data
+        self.bits = bits
+        self.refs = refs or []
+        self.special = special
+        self._hash = None
+        self._depth = None
+
+    @property
+    def type(self):
+        if not self.special:
+            return None
+        return self.data[0]
+
+    @property
+    def is_pruned(self):
+        return self.type == PRUNED_BRANCH
+
+    def descriptors(self):
+        d1 = len(self.refs) + 8 * self.special
+        d2 = (self.bits + 7) // 8 + self.bits // 8
+        return bytes([d1, d2])
+
+    def padded_data(self):
+        data = bytearray(self.data[:(self.bits + 7) // 8])
+        if self.bits % 8:
+            # completion tag
+            data[-1] |= 1 << (7 - self.bits % 8)
+        return bytes(data)
+
+    def depth(self):
+        if self._depth is None:
+            self._depth = max((ref.depth() + 1 for ref in self.refs), default=0)
+        return self._depth
+
+    def hash(self):
+        # representation hash of an ordinary level 0 cell, enough for cells of the VM stack
+        if self._hash is None:
+            repr_ = self.descriptors() + self.padded_data()
+            repr_ += b''.join(ref.depth().to_bytes(2, 'big') for ref in self.refs)
+            repr_ += b''.join(ref.hash() for ref in self.refs)
+            self._hash = hashlib.sha256(repr_).digest()
+        return self._hash
+
+    def begin_parse(self):
+        return Slice(self)
+
+    def __repr__(self):
+        return f'C{{{self.hash().hex().upper()}}}'
+
+
+class Slice:
+    __slots__ = ('cell', 'value', 'bits', 'pos', 'ref_pos')
+
+    def __init__(self, cell: Cell):
+        if cell.is_pruned:
+            raise BocException('Can not read pruned branch cell')
+        self.cell = cell
+        self.value = int.from_bytes(cell.data, 'big')
+        self.bits = len(cell.data) * 8
+        self.pos = 0
+        self.ref_pos = 0
+
+    def remaining_bits(self):
+        return self.cell.bits - self.pos
+
+    def remaining_refs(self):
+        return len(self.cell.refs) - self.ref_pos
+
+    def load_uint(self, n: int):
+        if n > self.remaining_bits():
+            raise BocException(f'Cell underflow: {n} bits requested, {self.remaining_bits()} left')
+        self.pos += n
+        return (self.value >> (self.bits - self.pos)) & ((1 << n) - 1)
+
+    def load_int(self, n: int):
+        value = self.load_uint(n)
+        if n and value >> (n - 1):
+            value -= 1 << n
+        return value
+
+    def load_bit(self):
+        return self.load_uint(1)
+
+    def load_bits(self, n: int):
+        return self.load_uint(n).to_bytes((n + 7) // 8, 'big')
+
+    def load_uint_leq(self, m: int):
+        # `#<= m`
+        return self.load_uint(m.bit_length())
+
+    def load_uint_less(self, m: int):
+        # `#< m`
+        return self.load_uint((m - 1).bit_length())
+
+    def load_var_uint(self, n: int):
+        length = self.load_uint_less(n)
+        return self.load_uint(length * 8)
+
+    def load_ref(self):
+        if self.ref_pos >= len(self.cell.refs):
+            raise BocException('Cell underflow: no more references')
+        self.ref_pos += 1
+        return self.cell.refs[self.ref_pos - 1]
+
+
+class Builder:
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+        self.refs = []
+
+    def store_uint(self, value: int, n: int):
+        if value < 0 or value >> n:
+            raise BocException(f'Value {value} does not fit into {n} bits')
+        self.value = (self.value << n) | value
+        self.bits += n
+        return self
+
+    def store_int(self, value: int, n: int):
+        if not -(1 << (n - 1)) <= value < (1 << (n - 1)):
+            raise BocException(f'Value {value} does not fit into {n} bits')
+        return self.store_uint(value % (1 << n), n)
+
+    def store_ref(self, cell: Cell):
+        self.refs.append(cell)
+        return self
+
+    def end_cell(self):
+        if self.bits > 1023 or len(self.refs) > 4:
+            raise BocException('Cell overflow')
+        padding = -self.bits % 8
+        data = (self.value << padding).to_bytes((self.bits + padding) // 8, 'big')
+        return Cell(data, self.bits, list(self.refs))
+
+
+def deserialize_boc(data: bytes) -> List[Cell]:
+    if data[:4] != BOC_MAGIC:
+        raise BocException('Unknown BoC magic')
+    flags = data[4]
+    has_idx = flags & 0x80
+    has_crc32c = flags & 0x40
+    size = flags & 0x07
+    offset_size = data[5]
+    pos = 6
+
+    def read(n):
+        nonlocal pos
+        pos += n
+        return int.from_bytes(data[pos - n:pos], 'big')
+
+    cells_num = read(size)
+    roots_num = read(size)
+    read(size)  # absent
+    read(offset_size)  # tot_cells_size
+    roots = [read(size) for _ in range(roots_num)]
+    if has_idx:
+        pos += cells_num * offset_size
+
+    raw_cells = []
+    for _ in range(cells_num):
+        d1, d2 = data[pos], data[pos + 1]
+        pos += 2
+        refs_num = d1 & 7
+        special = bool(d1 & 8)
+        if d1 & 16:
+            # cell is serialized with its hashes and depths
+            level_mask = d1 >> 5
+            pos += (bin(level_mask).count('1') + 1) * (32 + 2)
+        length = (d2 + 1) // 2
+        cell_data = data[pos:pos + length]
+        pos += length
+        bits = length * 8
+        if d2 % 2:
+            last = cell_data[-1]
+            if last == 0:
+                raise BocException('Invalid cell padding')
+            bits -= (last & -last).bit_length()
+        refs = [read(size) for _ in range(refs_num)]
+        raw_cells.append((cell_data, bits, refs, special))
+
+    if has_crc32c:
+        pos += 4
+    if pos != len(data):
+        raise BocException('Unexpected BoC size')
+
+    # references always point forward, so cells can be built from the end
+    cells = [None] * cells_num
+    for i in range(cells_num - 1, -1, -1):
+        cell_data, bits, refs, special = raw_cells[i]
+        if any(ref <= i for ref in refs):
+            raise BocException('BoC is not topologically ordered')
+        cells[i] = Cell(cell_data, bits, [cells[ref] for ref in refs], special)
+    return [cells[root] for root in roots]
+
+
+def serialize_boc(root: Cell) -> bytes:
+    order, index = [], {}
+
+    def visit(cell):
+        if id(cell) in index:
+            return
+        index[id(cell)] = None
+        for ref in cell.refs:
+            visit(ref)
+        order.append(cell)
+
+    visit(root)
+    order.reverse()
+    for i, cell in enumerate(order):
+        index[id(cell)] = i
+
+    size = max(1, (len(order).bit_length() + 7) // 8)
+    payload = bytearray()
+    for cell in order:
+        payload += cell.descriptors() + cell.padded_data()
+        for ref in cell.refs:
+            payload += index[id(ref)].to_bytes(size, 'big')
+    offset_size = max(1, (len(payload).bit_length() + 7) // 8)
+
+    result = bytearray(BOC_MAGIC)
+    result.append(size)
+    result.append(offset_size)
+    result += len(order).to_bytes(size, 'big')
+    result += (1).to_bytes(size, 'big')
+    result += (0).to_bytes(size, 'big')
+    result += len(payload).to_bytes(offset_size, 'big')
+    result += (0).to_bytes(size, 'big')
+    result += payload
+    return bytes(result)
+
+
+# Ref: https://github.com/ton-blockchain/ton/blob/master/crypto/block/block.tlb (Hashmap)
+def _load_label(s: Slice, m: int):
+    if s.load_bit() == 0:
+        # hml_short
+        n = 0
+        while s.load_bit():
+            n += 1
+        return n, s.load_uint(n)
+    if s.load_bit() == 0:
+        # hml_long
+        n = s.load_uint_leq(m)
+        return n, s.load_uint(n)
+    # hml_same
+    v = s.load_bit()
+    n = s.load_uint_leq(m)
+    return n, ((1 << n) - 1) * v
+
+
+def parse_hashmap(root: Union[Cell, Slice], n: int) -> Dict[int, Slice]:
+    """Leaves of `Hashmap n X` as key -> slice positioned at X.
+
+    `root` is the root cell, or a slice positioned at a root stored inline.
+    Pruned branches of Merkle proofs are skipped.
+    """
+    result = dict()
+    stack = [(root, n, 0)]
+    while stack:
+        node, m, prefix = stack.pop()
+        if isinstance(node, Slice):
+            s = node
+        elif node.is_pruned:
+            continue
+        else:
+            s = Slice(node)
+        l, label = _load_label(s, m)
+        prefix = (prefix << l) | label
+        m -= l
+        if m == 0:
+            result[prefix] = s
+            continue
+        left, right = s.load_ref(), s.load_ref()
+        stack.append((right, m - 1, (prefix << 1) | 1))
+        stack.append((left, m - 1, prefix << 1))
+    return dict(sorted(result.items()))
+
+
+def parse_hashmap_e(s: Slice, n: int) -> Dict[int, Slice]:
+    if s.load_bit() == 0:
+        return dict()
+    return parse_hashmap(s.load_ref(), n)
+
+
+# Ref: https://github.com/ton-blockchain/ton/blob/master/crypto/block/block.tlb (VmStack)
+# Values are converted the way `runmethod` output is read by Result2List: tuples
+# become lists, lisp-style lists are flattened and null is an empty list.
+class _VmList(list):
+    pass
+
+
+def _is_list(value):
+    return value == [] or isinstance(value, _VmList)
+
+
+def _load_vm_tuple(s: Slice, n: int):
+    if n == 0:
+        return []
+    head = _load_vm_tuple_ref(s, n - 1)
+    tail = _load_vm_value(s.load_ref().begin_parse())
+    return head + [tail]
+
+
+def _load_vm_tuple_ref(s: Slice, n: int):
+    if n == 0:
+        return []
+    if n == 1:
+        return [_load_vm_value(s.load_ref().begin_parse())]
+    return _load_vm_tuple(s.load_ref().begin_parse(), n)
+
+
+def _load_vm_value(s: Slice):
+    tag = s.load_uint(8)
+    if tag == 0x00:
+        return []
+    if tag == 0x01:
+        return s.load_int(64)
+    if tag == 0x02:
+        if s.load_uint(7) == 0:
+            return s.load_int(257)
+        s.load_bit()
+        return 'NaN'
+    if tag == 0x03:
+        return repr(s.load_ref())
+    if tag == 0x04:
+        cell = s.load_ref()
+        st_bits, end_bits = s.load_uint(10), s.load_uint(10)
+        st_ref, end_ref = s.load_uint_leq(4), s.load_uint_leq(4)
+        return f'CS{{Cell{{{cell.hash().hex().upper()}}} bits: {st_bits}..{end_bits}; refs: {st_ref}..{end_ref}}}'
+    if tag == 0x05:
+        return f'BC{{{s.load_ref().hash().hex().upper()}}}'
+    if tag == 0x07:
+        n = s.load_uint(16)
+        if n == 2:
+            return _load_vm_pairs(s)
+        return _load_vm_tuple(s, n)
+    raise BocException(f'Unsupported VM stack value type: {tag}')
+
+
+def _load_vm_pairs(s: Slice):
+    # lisp-style lists are chains of pairs as long as the list, walked in a
+    # loop so that lists of hundreds of participants do not exhaust the stack
+    heads = []
+    while True:
+        heads.append(_load_vm_value(s.load_ref().begin_parse()))
+        tail = s.load_ref()
+        s = tail.begin_parse()
+        if s.load_uint(8) != 0x07 or s.load_uint(16) != 2:
+            break
+    value = _load_vm_value(tail.begin_parse())
+    for head in reversed(heads):
+        value = _VmList([head] + value) if _is_list(value) else [head, value]
+    return value
+
+
+def parse_vm_stack(cell: Cell) -> list:
+    s = cell.begin_parse()
+    depth = s.load_uint(24)
+    values = []
+    for _ in range(depth):
+        rest = s.load_ref()
+        values.append(_load_vm_value(s))
+        s = rest.begin_parse()
+    values.reverse()
+    return _plain(values)
+
+
+def _plain(value):
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _store_vm_int(b: Builder, value: int):
+    if -(1 << 63) <= value < (1 << 63):
+        b.store_uint(0x01, 8).store_int(value, 64)
+    else:
+        b.store_uint(0x0100, 15).store_int(value, 257)
+
+
+def build_vm_stack(values: List[int]) -> Cell:
+    rest = Builder().end_cell()
+    for value in values[:-1]:
+        b = Builder().store_ref(rest)
+        _store_vm_int(b, value)
+        rest = b.end_cell()
+    b = Builder().store_uint(len(values), 24)
+    if values:
+        b.store_ref(rest)
+        _store_vm_int(b, values[-1])
+    return b.end_cell()
@@ -1,6 +1,8 @@
 import os
 from celery import Celery
 
+import indexer.constants as constants
+
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
 RABBITMQ_PORT = os.getenv("RABBITMQ_PORT")
 
@@ -17,17 +19,39 @@ app.conf.update(
     result_expires=3600,
 )
 
-app.conf.beat_schedule = {
-    "update_validation_cycle": {
-        "task": "indexer.tasks.update_validation_cycle",
-        "schedule": 60.0
-    },
-    "update_elections": {
-        "task": "indexer.tasks.update_elections",
-        "schedule": 60.0
-    },
-    "update_complaints": {
-        "task": "indexer.tasks.update_complaints",
-        "schedule": 60.0
+if constants.INDEXER_SCHEDULE == 'chain':
+    # polls are cheap and frequent, a poll that waited in the queue past the next one is dropped
+    app.conf.beat_schedule = {
+        "follow_masterchain": {
+            "task": "indexer.tasks.follow_masterchain",
+            "schedule": constants.SCHEDULER_FAST_INTERVAL,
+            "options": {"expires": constants.SCHEDULER_FAST_INTERVAL}
+        }
+    }
+elif constants.INDEXER_SCHEDULE == 'pipeline':
+    app.conf.beat_schedule = {
+        "update_all": {
+            "task": "indexer.tasks.update_all",
+            "schedule": 60.0,
+            "options": {"expires": 60.0}
+        }
     }
-}
\ No newline at end of file
+else:
+    # a run still queued when the next one is scheduled is dropped
+    app.conf.beat_schedule = {
+        "update_validation_cycle": {
+            "task": "indexer.tasks.update_validation_cycle",
+            "schedule": 60.0,
+            "options": {"expires": 60.0}
+        },
+        "update_elections": {
+            "task": "indexer.tasks.update_elections",
+            "schedule": 60.0,
+            "options": {"expires": 60.0}
+        },
+        "update_complaints": {
+            "task": "indexer.tasks.update_complaints",
+            "schedule": 60.0,
+            "options": {"expires": 60.0}
+        }
+    }
\ No newline at end of file
@@ -5,6 +5,11 @@ MONGO_PORT = int(os.getenv("MONGO_PORT"))
 MONGO_DATABASE = os.getenv("MONGO_DATABASE")
 MONGO_USER = os.getenv("MONGO_USER")
 MONGO_PASSWORD_FILE = os.getenv("MONGO_PASSWORD_FILE")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 10))
+# 'binary' stores pubkeys, ADNL and wallet addresses as 32-byte BinData instead of hex/base64 strings
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "string")
+# size in bytes of the capped collection of update events pushed to API subscribers
+EVENTS_COLLECTION_SIZE = int(os.getenv("EVENTS_COLLECTION_SIZE", 64 * 1024 * 1024))
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
 RABBITMQ_PORT = os.getenv("RABBITMQ_PORT")
@@ -12,6 +17,28 @@ RABBITMQ_PORT = os.getenv("RABBITMQ_PORT")
 CELERY_BROKER_URL = f"amqp://{RABBITMQ_HOST}:{RABBITMQ_PORT}"
 CELERY_BACKEND_URL = f"rpc://{RABBITMQ_HOST}:{RABBITMQ_PORT}"
 
+# 'chain' dispatches the indexing tasks when the chain state they read changes, 'interval' runs them every 60 s,
+# 'pipeline' runs all of them as one task every 60 s
+INDEXER_SCHEDULE = os.getenv("INDEXER_SCHEDULE", "chain")
+# seconds between masterchain polls of the chain scheduler, near election and cycle boundaries and otherwise
+SCHEDULER_FAST_INTERVAL = float(os.getenv("SCHEDULER_FAST_INTERVAL", 5))
+SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", 30))
+SCHEDULER_BOUNDARY_WINDOW = float(os.getenv("SCHEDULER_BOUNDARY_WINDOW", 600))
+# all tasks are dispatched at least this often, whether their inputs changed or not
+SCHEDULER_REFRESH_INTERVAL = float(os.getenv("SCHEDULER_REFRESH_INTERVAL", 900))
+# seconds a task run holds its single-flight lock at most, runs queued longer than that are dropped
+TASK_LOCK_TTL = float(os.getenv("TASK_LOCK_TTL", 300))
+
 LITE_CLIENT_BINARY = 'distlib/lite-client'
 LITE_CLIENT_CONFIG = 'liteserver_config.json'
+LITE_CLIENT_BACKEND = os.getenv("LITE_CLIENT_BACKEND", "binary")
+# lite-client sessions (or in-flight native queries) per worker process used by parallel queries,
+# every session is a lite-client process with its own liteserver connection
+LITE_CLIENT_POOL_SIZE = int(os.getenv("LITE_CLIENT_POOL_SIZE", 1))
+
 
+# slow-changing config params shared by the tasks, LITE_CLIENT_CACHE_PATH makes the cache a SQLite file shared by workers
+LITE_CLIENT_CACHED_CONFIGS = [int(x) for x in os.getenv("LITE_CLIENT_CACHED_CONFIGS", "1,15,16,17").split(',') if x]
+LITE_CLIENT_CACHE_TTL = float(os.getenv("LITE_CLIENT_CACHE_TTL", 600))
+LITE_CLIENT_CACHE_SIZE = int(os.getenv("LITE_CLIENT_CACHE_SIZE", 256))
+LITE_CLIENT_CACHE_PATH = os.getenv("LITE_CLIENT_CACHE_PATH")
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List, Optional
+
+from pymongo import MongoClient, ReplaceOne, UpdateOne, ASCENDING, DESCENDING
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+import indexer.constants as constants
+from indexer import storage
+from indexer.storage import decode_document
+
+
+# Collection name -> indexes, each index is a list of (field, direction) pairs
+INDEXES = {
+    'validation_data': [
+        [('cycle_id', ASCENDING)],
+    ],
+    'elections_data': [
+        [('election_id', ASCENDING)],
+        [('participants_list.wallet_address', ASCENDING), ('election_id', DESCENDING)],
+        [('participants_list.adnl_addr', ASCENDING), ('election_id', DESCENDING)],
+    ],
+    'complaints_data': [
+        [('election_id', ASCENDING)],
+        [('pseudohash', ASCENDING)],
+        # sort order and keyset cursor of /getComplaints
+        [('election_id', DESCENDING), ('created_time', DESCENDING), ('pseudohash', DESCENDING)],
+        [('wallet_address', ASCENDING), ('election_id', DESCENDING), ('created_time', DESCENDING), ('pseudohash', DESCENDING)],
+        [('adnl_addr', ASCENDING), ('election_id', DESCENDING), ('created_time', DESCENDING), ('pseudohash', DESCENDING)],
+    ],
+    # pre-joined cycles, see indexer.views
+    'cycle_view': [
+        [('cycle_id', DESCENDING)],
+    ],
+    # lookup collections, see indexer.lookups
+    'wallet_pubkeys': [
+        [('wallet_address', ASCENDING), ('pubkey', ASCENDING)],
+        [('election_id', ASCENDING), ('pubkey', ASCENDING)],
+    ],
+    'pubkey_cycles': [
+        [('pubkey', ASCENDING), ('cycle_id', DESCENDING)],
+        [('cycle_id', ASCENDING), ('pubkey', ASCENDING)],
+    ],
+    'adnl_cycles': [
+        [('adnl_addr', ASCENDING), ('cycle_id', DESCENDING)],
+        [('cycle_id', ASCENDING), ('adnl_addr', ASCENDING)],
+    ],
+}
+
+
+class MongoConnection:
+    """One pooled MongoClient per process.
+
+    MongoClient is not fork-safe, so the client is created lazily in the
+    process that uses it (every prefork worker child gets its own) and reused
+    by all tasks of that process.
+    """
+    def __init__(self):
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def client(self) -> MongoClient:
+        with self._lock:
+            if self._pid != os.getpid():
+                with open(constants.MONGO_PASSWORD_FILE, 'r') as f:
+                    password = f.read()
+                self._client = MongoClient(host=constants.MONGO_HOST,
+                                           port=constants.MONGO_PORT,
+                                           username=constants.MONGO_USER,
+                                           password=password,
+                                           maxPoolSize=constants.MONGO_MAX_POOL_SIZE,
+                                           connect=False)
+                self._pid = os.getpid()
+            return self._client
+
+    def database(self) -> Database:
+        return self.client()[constants.MONGO_DATABASE]
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+
+mongo = MongoConnection()
+
+
+def get_database() -> Database:
+    return mongo.database()
+
+
+def bootstrap_database(db: Database):
+    """Create collection indexes. Run once at worker start, not on every task."""
+    if 'events' not in db.list_collection_names():
+        # tailed by the webserver, see indexer.events
+        db.create_collection('events', capped=True, size=constants.EVENTS_COLLECTION_SIZE)
+    for collection, indexes in INDEXES.items():
+        for keys in indexes:
+            db[collection].create_index(keys)
+
+
+# Every indexed document carries `_meta: {fingerprint, seqno}`: a hash of its
+# content and the masterchain seqno it was read at. Writes are skipped when the
+# fingerprint did not change. The API strips `_meta` from responses.
+#
+# Documents that lookups, views or events are derived from are written
+# unconfirmed, with no fingerprint and the last confirmed version in
+# `_meta.previous`, and confirmed once the derived writes succeeded. Until
+# then every run writes them again and redoes the derived writes.
+META_FIELD = '_meta'
+BULK_WRITE_BATCH_SIZE = 500
+
+
+def fingerprint(document: dict) -> str:
+    data = json.dumps(document, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _bulk_write(collection: Collection, requests: list):
+    for i in range(0, len(requests), BULK_WRITE_BATCH_SIZE):
+        collection.bulk_write(requests[i:i + BULK_WRITE_BATCH_SIZE], ordered=False)
+
+
+def upsert_changed(collection: Collection, key: str, documents: List[dict], seqno: Optional[int],
+                   previous: Optional[dict] = None, confirm: bool = True) -> list:
+    """Upsert documents matched by the `key` field whose content changed.
+
+    Returns the keys of the documents written. If `previous` is given, it is
+    filled with the last confirmed versions of the written documents that
+    existed. With `confirm=False` the caller confirms the written documents
+    with confirm_changed.
+    """
+    if not documents:
+        return []
+    fingerprints = {doc[key]: fingerprint(doc) for doc in documents}
+    full = previous is not None or not confirm
+    projection = {'_id': False} if full else {key: True, f'{META_FIELD}.fingerprint': True}
+    stored = {doc[key]: doc for doc in collection.find({key: {'$in': list(fingerprints)}}, projection)}
+
+    keys, requests = [], []
+    for doc in documents:
+        stored_doc = stored.get(doc[key])
+        meta = stored_doc.get(META_FIELD, {}) if stored_doc is not None else {}
+        if meta.get('fingerprint') == fingerprints[doc[key]]:
+            continue
+        confirmed = stored_doc
+        if stored_doc is not None and full:
+            confirmed = meta['previous'] if 'previous' in meta else {k: v for k, v in stored_doc.items() if k != META_FIELD}
+        if confirmed is not None and previous is not None:
+            previous[doc[key]] = decode_document(confirmed)
+        doc = encode_document(doc)
+        if confirm:
+            doc[META_FIELD] = {'fingerprint': fingerprints[doc[key]], 'seqno': seqno}
+        else:
+            doc[META_FIELD] = {'fingerprint': None, 'seqno': seqno, 'previous': confirmed}
+        keys.append(doc[key])
+        requests.append(ReplaceOne({key: {'$eq': doc[key]}}, doc, upsert=True))
+
+    _bulk_write(collection, requests)
+    return keys
+
+
+def confirm_changed(collection: Collection, key: str, documents: List[dict], keys: list):
+    """Record the fingerprints of documents written by upsert_changed(confirm=False)."""
+    keys = set(keys)
+    _bulk_write(collection, [UpdateOne({key: {'$eq': doc[key]}},
+                                       {'$set': {f'{META_FIELD}.fingerprint': fingerprint(doc)},
+                                        '$unset': {f'{META_FIELD}.previous': ''}})
+                             for doc in documents if doc[key] in keys])
+
+
+def encode_document(document: dict) -> dict:
+    """Copy of `document` in the configured storage format, see indexer.storage."""
+    if constants.STORAGE_FORMAT != 'binary':
+        return dict(document)
+    return storage.encode_document(document)
+
+
+def migrate_storage(db: Database):
+    """Convert stored documents to the configured STORAGE_FORMAT.
+
+    The capped `events` collection is left as is, its documents can not change size.
+    """
+    convert = encode_document if constants.STORAGE_FORMAT == 'binary' else decode_document
+    for name in INDEXES:
+        requests = []
+        for doc in db[name].find({}):
+            converted = convert(decode_document(doc))
+            if converted != doc:
+                requests.append(ReplaceOne({'_id': doc['_id']}, converted))
+            if len(requests) == BULK_WRITE_BATCH_SIZE:
+                db[name].bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            db[name].bulk_write(requests, ordered=False)
+
+
+# Counter bumped after every task run that changed indexed data. The webserver
+# keys its response cache by it.
+def bump_data_version(db: Database):
+    db.service_state.update_one({'_id': 'data_version'}, {'$inc': {'version': 1}}, upsert=True)
+
+
+if __name__ == '__main__':
+    import sys
+    from indexer.lookups import rebuild_lookups
+    from indexer.views import rebuild_cycle_views
+
+    db = get_database()
+    bootstrap_database(db)
+    if '--rebuild-lookups' in sys.argv[1:]:
+        rebuild_lookups(db)
+    if '--rebuild-views' in sys.argv[1:]:
+        rebuild_cycle_views(db)
+    if '--migrate-storage' in sys.argv[1:]:
+        migrate_storage(db)
+    if '--rebuild-lookups' in sys.argv[1:] or '--rebuild-views' in sys.argv[1:] or '--migrate-storage' in sys.argv[1:]:
+        bump_data_version(db)
+    mongo.close()
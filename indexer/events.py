@@ -0,0 +1,69 @@
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+from indexer.database import encode_document
+from indexer.singleflight import acquire_task_lock, release_task_lock
+
+
+# Update events are appended to the capped `events` collection, which the
+# webserver tails to push them to subscribers. Every event has `type`
+# ('election' or 'complaint'), `event`, `election_id`, `seqno` and `seq`: a
+# counter in `service_state` that subscribers resume from. Numbers are taken
+# and events inserted under the `events` lock, so `seq` follows insertion
+# order across worker processes.
+EVENTS_LOCK = 'events'
+EVENTS_LOCK_TTL = 30
+EVENTS_LOCK_TIMEOUT = 60
+
+
+def election_events(election: dict, previous: Optional[dict]) -> List[dict]:
+    election_id = election['election_id']
+    previous_participants = dict()
+    if previous is not None:
+        previous_participants = {x['pubkey']: x for x in previous['participants_list']}
+
+    events = []
+    for participant in election['participants_list']:
+        previous_participant = previous_participants.get(participant['pubkey'])
+        if previous_participant is None:
+            events.append({'type': 'election', 'event': 'participant_added', 'election_id': election_id,
+                           'participant': participant})
+        elif previous_participant['stake'] != participant['stake']:
+            events.append({'type': 'election', 'event': 'stake_changed', 'election_id': election_id,
+                           'participant': participant, 'previous_stake': previous_participant['stake']})
+    if election['finished'] and (previous is None or not previous['finished']):
+        events.append({'type': 'election', 'event': 'election_finished', 'election_id': election_id,
+                       'total_stake': election['total_stake']})
+    return events
+
+
+def complaint_events(complaints: List[dict], updated: List[str], previous: Dict[str, dict]) -> List[dict]:
+    updated = set(updated)
+    return [{'type': 'complaint',
+             'event': 'complaint_updated' if complaint['pseudohash'] in previous else 'complaint_added',
+             'election_id': complaint['election_id'],
+             'complaint': complaint}
+            for complaint in complaints if complaint['pseudohash'] in updated]
+
+
+def publish_events(db: Database, events: List[dict], seqno: Optional[int]):
+    if not events:
+        return
+    owner = str(uuid.uuid4())
+    deadline = time.monotonic() + EVENTS_LOCK_TIMEOUT
+    while not acquire_task_lock(db, EVENTS_LOCK, owner, EVENTS_LOCK_TTL):
+        if time.monotonic() >= deadline:
+            raise TimeoutError('Timed out waiting for the events lock')
+        time.sleep(0.05)
+    try:
+        counter = db.service_state.find_one_and_update({'_id': 'event_seq'}, {'$inc': {'seq': len(events)}},
+                                                       upsert=True, return_document=ReturnDocument.AFTER)
+        first = counter['seq'] - len(events) + 1
+        db.events.insert_many([encode_document({**event, 'seqno': seqno, 'seq': first + i}) for i, event in enumerate(events)],
+                              ordered=True)
+    finally:
+        release_task_lock(db, EVENTS_LOCK, owner)
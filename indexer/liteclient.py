@@ -1,151 +1,671 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import selectors
+import sqlite3
 import subprocess
-from typing import Optional
-from indexer.utils import Tlb2Json, Result2List, Pars, Dec2HexAddr, HexAddr2Base64Addr
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional
+from indexer.boc import BocException, deserialize_boc
+from indexer.utils import Tlb2Json, Result2List, Pars, block_seqno, parse_validator_set, parse_complaints_list
+
+BLOCK_ID_EXT = re.compile(r'\(-1,[0-9A-Fa-f]{16},\d+\):[0-9A-Fa-f]{64}:[0-9A-Fa-f]{64}')
 
 class LiteClientException(Exception):
     pass
 
-class LiteClient:
-    def __init__(self, binary_path: str, config_path: str):
+def account_data_fingerprint(state: bytes) -> str:
+    """Hash of the code, data and libraries of an Account or StateInit BoC.
+
+    Balance and last transaction lt are bits of the Account root cell, while
+    code, data, libraries (and extra currencies) are its refs, so tick-tock
+    transactions that do not change contract state keep the fingerprint. A
+    StateInit has the same refs, without extra currencies.
+    """
+    try:
+        root = deserialize_boc(state)[0]
+    except (BocException, IndexError) as e:
+        raise LiteClientException(f'Failed to parse account state: {e}')
+    return hashlib.sha256(b''.join(ref.hash() for ref in root.refs)).hexdigest().upper()
+
+def run_parallel(calls: List[Callable], max_in_flight: int, retries: int = 0):
+    """Run independent queries concurrently and return their results in order.
+
+    At most `max_in_flight` calls run at once. A call failing with
+    LiteClientException is retried up to `retries` times; the first error
+    that is not retried is raised after all calls have finished.
+    """
+    def run(call):
+        for attempt in range(retries + 1):
+            try:
+                return call()
+            except LiteClientException:
+                if attempt == retries:
+                    raise
+
+    if len(calls) <= 1 or max_in_flight <= 1:
+        return [run(call) for call in calls]
+    with ThreadPoolExecutor(max_workers=min(max_in_flight, len(calls))) as executor:
+        futures = [executor.submit(run, call) for call in calls]
+    return [future.result() for future in futures]
+
+class LiteClientSession:
+    """Long-lived interactive lite-client process.
+
+    Commands are written to stdin one at a time. Interactive lite-client gives no
+    end-of-output marker, so once the answer starts to arrive an unknown command
+    with a unique marker is sent: lite-client handles it only after the previous
+    answer is printed, which delimits the output of the command.
+    """
+    MARKER = '__end_of_command_'
+    NOISE = ('cannot parse command', 'unknown command')
+
+    def __init__(self, binary_path: str, config_path: str, index: Optional[int] = None):
         self.binary_path = binary_path
         self.config_path = config_path
+        self.index = index
+        self.process = None
+        self.selector = None
+        self.counter = 0
 
-    def _run(self, cmd, **kwargs):
-        timeout = kwargs.get("timeout", 10)
-        index = kwargs.get("index")
-        args = [self.binary_path, "--global-config", self.config_path, "--verbosity", "0", "--cmd", cmd]
-        if index is not None:
-            index = str(index)
-            args += ["-i", index]
+    def start(self, timeout: float):
+        args = [self.binary_path, "--global-config", self.config_path, "--verbosity", "0"]
+        if self.index is not None:
+            args += ["-i", str(self.index)]
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        self.selector = selectors.DefaultSelector()
+        for stream in (self.process.stdout, self.process.stderr):
+            os.set_blocking(stream.fileno(), False)
+            self.selector.register(stream, selectors.EVENT_READ)
+        # the first answer from liteserver means the connection is established
+        self.execute('time', timeout)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
 
+    def close(self):
+        if self.process is None:
+            return
+        self.selector.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            stream.close()
+        self.process = None
+
+    def _write(self, line: str):
         try:
-            process = subprocess.run(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
-        except subprocess.TimeoutExpired as e:
-            raise LiteClientException(f"LiteClient timeout. Output: \n {e.output}")
+            self.process.stdin.write((line + '\n').encode('utf-8'))
+        except (BrokenPipeError, OSError) as e:
+            raise LiteClientException(f"LiteClient session is dead: {e}")
+
+    def _read(self, out: bytearray, err: bytearray, deadline: float, done, wait: bool = True):
+        while not done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if not wait:
+                    return
+                raise LiteClientException(f"LiteClient timeout. Output: \n {out.decode('utf-8', 'replace')}")
+            events = self.selector.select(remaining if wait else 0)
+            if not events and not wait:
+                return
+            for key, _ in events:
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    raise LiteClientException(f"LiteClient session terminated. Output: \n {out.decode('utf-8', 'replace')}")
+                if key.fileobj is self.process.stdout:
+                    out += chunk
+                else:
+                    err += chunk
+
+    def _strip(self, text: str, marker: str):
+        lines = []
+        for line in text.splitlines(keepends=True):
+            if marker in line:
+                break
+            if self.MARKER in line or line.strip().startswith(self.NOISE):
+                continue
+            lines.append(line)
+        return ''.join(lines)
 
-        output = process.stdout.decode("utf-8")
-        err = process.stderr.decode("utf-8")
+    def execute(self, cmd: str, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+        # drop leftovers of the previous marker command
+        self._read(bytearray(), bytearray(), deadline, lambda: False, wait=False)
+
+        out, err = bytearray(), bytearray()
+        self._write(cmd)
+        self._read(out, err, deadline, lambda: out or err)
+
+        self.counter += 1
+        marker = f'{self.MARKER}{self.counter}'
+        marker_bytes = marker.encode('utf-8')
+        self._write(marker)
+        self._read(out, err, deadline, lambda: marker_bytes in out)
+
+        output = self._strip(out.decode('utf-8'), marker)
+        err = self._strip(err.decode('utf-8'), marker)
         if len(err) > 0:
             raise LiteClientException("LiteClient error: {err}".format(err=err))
         return output
 
-    def get_config(self, config_id: int):
-        cmd = f'getconfig {config_id}'
-        result = self._run(cmd)
+class LiteClientSessionPool:
+    """Bounded pool of lite-client sessions shared by threads of one process.
+
+    Sessions are started lazily and dropped after any failure, so a dead or
+    desynchronized process is replaced on next use. The pool is reset after fork.
+    """
+    def __init__(self, binary_path: str, config_path: str, index: Optional[int] = None, size: int = 1, start_timeout: float = 30):
+        self.binary_path = binary_path
+        self.config_path = config_path
+        self.index = index
+        self.size = size
+        self.start_timeout = start_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _check_pid(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # sessions belong to the parent process
+                self._reset()
+
+    @contextmanager
+    def session(self, timeout: float):
+        self._check_pid()
+        if not self._slots.acquire(timeout=timeout):
+            raise LiteClientException("LiteClient timeout: no free lite-client session")
+        session = None
+        try:
+            with self._lock:
+                while self._idle and session is None:
+                    session = self._idle.pop()
+                    if not session.is_alive():
+                        session.close()
+                        session = None
+            if session is None:
+                session = LiteClientSession(self.binary_path, self.config_path, self.index)
+                try:
+                    session.start(self.start_timeout)
+                except Exception:
+                    session.close()
+                    raise
+            try:
+                yield session
+            except Exception:
+                session.close()
+                session = None
+                raise
+            finally:
+                if session is not None:
+                    with self._lock:
+                        self._idle.append(session)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        if self._pid != os.getpid():
+            return
+        for session in idle:
+            session.close()
+
+class ConfigCache:
+    """Bounded TTL cache of slow-changing config params.
+
+    Entries are keyed by config id and the masterchain block they were read at.
+    A value read at block N is served for blocks N and later until its TTL
+    expires, which bounds how long a changed param can stay stale.
+    """
+    def __init__(self, config_ids: Iterable[int], ttl: float = 600, max_size: int = 256):
+        self.config_ids = set(config_ids)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._reported = {'hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _find(self, config_id: int, block: str, seqno: int, now: float):
+        found = None
+        for key, (entry_seqno, stored_at, value) in list(self._entries.items()):
+            if stored_at + self.ttl <= now:
+                del self._entries[key]
+            elif key == (config_id, block):
+                return key, value
+            elif key[0] == config_id and entry_seqno <= seqno and (found is None or entry_seqno > found[0]):
+                found = (entry_seqno, key, value)
+        return found and found[1:]
+
+    def get(self, config_id: int, block: str):
+        with self._lock:
+            found = self._find(config_id, block, block_seqno(block), time.time())
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(found[0])
+            return copy.deepcopy(found[1])
+
+    def put(self, config_id: int, block: str, value):
+        with self._lock:
+            self._entries[(config_id, block)] = (block_seqno(block), time.time(), copy.deepcopy(value))
+            self._entries.move_to_end((config_id, block))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def take_stats(self):
+        """Counts since the previous call, for metrics summed over processes."""
+        with self._lock:
+            stats = self.stats()
+            taken = {name: value - self._reported.get(name, 0) for name, value in stats.items()}
+            self._reported = stats
+            return taken
+
+class SqliteConfigCache(ConfigCache):
+    """ConfigCache in a local SQLite file, shared by all worker processes of a host."""
+    def __init__(self, path: str, config_ids: Iterable[int], ttl: float = 600, max_size: int = 256):
+        super().__init__(config_ids, ttl, max_size)
+        self.path = path
+        self._pid = None
+        self._db = None
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS config_cache ('
+                             'config_id INTEGER, block TEXT, seqno INTEGER, stored_at REAL, value TEXT, '
+                             'PRIMARY KEY (config_id, block))')
+            self._db.execute('CREATE TABLE IF NOT EXISTS config_cache_stats (name TEXT PRIMARY KEY, value INTEGER)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS config_cache_reported (name TEXT PRIMARY KEY, value INTEGER)')
+        return self._db
+
+    def _count(self, db, name: str):
+        db.execute('INSERT INTO config_cache_stats VALUES (?, 1) '
+                   'ON CONFLICT (name) DO UPDATE SET value = value + 1', (name,))
+
+    def get(self, config_id: int, block: str):
+        with self._lock:
+            db = self._connection()
+            row = db.execute('SELECT value FROM config_cache '
+                             'WHERE config_id = ? AND stored_at > ? AND (block = ? OR seqno <= ?) '
+                             'ORDER BY block = ? DESC, seqno DESC LIMIT 1',
+                             (config_id, time.time() - self.ttl, block, block_seqno(block), block)).fetchone()
+            self._count(db, 'misses' if row is None else 'hits')
+            return None if row is None else json.loads(row[0])
+
+    def put(self, config_id: int, block: str, value):
+        with self._lock:
+            db = self._connection()
+            db.execute('INSERT OR REPLACE INTO config_cache VALUES (?, ?, ?, ?, ?)',
+                       (config_id, block, block_seqno(block), time.time(), json.dumps(value)))
+            db.execute('DELETE FROM config_cache WHERE stored_at <= ?', (time.time() - self.ttl,))
+            db.execute('DELETE FROM config_cache WHERE rowid NOT IN '
+                       '(SELECT rowid FROM config_cache ORDER BY stored_at DESC LIMIT ?)', (self.max_size,))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._connection().execute('SELECT name, value FROM config_cache_stats').fetchall())
+
+    def take_stats(self):
+        # counters are shared, so counts are taken once by whichever process reports first
+        with self._lock:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                stats = dict(db.execute('SELECT name, value FROM config_cache_stats').fetchall())
+                reported = dict(db.execute('SELECT name, value FROM config_cache_reported').fetchall())
+                db.executemany('INSERT OR REPLACE INTO config_cache_reported VALUES (?, ?)', stats.items())
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+            return {name: value - reported.get(name, 0) for name, value in stats.items()}
+
+class LiteClient:
+    def __init__(self, binary_path: str, config_path: str, pool_size: int = 1, config_cache: Optional[ConfigCache] = None):
+        self.binary_path = binary_path
+        self.config_path = config_path
+        self.pool_size = pool_size
+        self.config_cache = config_cache
+        self.max_in_flight = pool_size
+        self._pools = dict()
+        self._pools_lock = threading.Lock()
+
+    def _get_pool(self, index: Optional[int]):
+        with self._pools_lock:
+            if index not in self._pools:
+                self._pools[index] = LiteClientSessionPool(self.binary_path, self.config_path, index, self.pool_size)
+            return self._pools[index]
+
+    def _run(self, cmd, **kwargs):
+        timeout = kwargs.get("timeout", 10)
+        index = kwargs.get("index")
+        with self._get_pool(index).session(timeout) as session:
+            return session.execute(cmd, timeout)
+
+    def close(self):
+        with self._pools_lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+    def get_last_block(self):
+        result = self._run('last')
+        block_id_ext = BLOCK_ID_EXT.search(result)
+        if block_id_ext is None:
+            raise LiteClientException(f'Last masterchain block not found. Output: \n {result}')
+        return block_id_ext.group()
+
+    def get_block_by_utime(self, timestamp: int):
+        block_id_ext_raw = self._run(f'byutime -1:8000000000000000 {timestamp}')
+        block_id_ext = Pars(block_id_ext_raw, 'reference masterchain block : ', '\n')
+        if block_id_ext is None:
+            raise Exception('Block not found by unixtime.')
+        return block_id_ext
+
+    def snapshot(self, block: Optional[str] = None):
+        return LiteClientSnapshot(self, block, self.config_cache)
+
+    def _getconfig(self, config_id: int, block: Optional[str] = None):
+        if block is not None:
+            return self._run(f'getconfigfrom {block} {config_id}')
+        return self._run(f'getconfig {config_id}')
+
+    def get_config(self, config_id: int, block: Optional[str] = None):
+        result = self._getconfig(config_id, block)
         start = result.find("ConfigParam")
         text = result[start:]
         return Tlb2Json(text)
 
-    def run_method(self, addr: str, method: str, params: list = []):
-        result = self._run(f"runmethod {addr} {method} {' '.join(params)}")
+    def get_elector_address(self, block: Optional[str] = None):
+        elector_contract = self.get_config(1, block)['elector_addr']
+        if elector_contract[0] == 'x':
+            elector_contract = f'-1:{elector_contract[1:]}'
+        return elector_contract
+
+    def run_method(self, addr: str, method: str, params: list = [], block: Optional[str] = None):
+        params = list(map(str, params))
+        if block is not None:
+            result = self._run(f"runmethod {addr} {block} {method} {' '.join(params)}")
+        else:
+            result = self._run(f"runmethod {addr} {method} {' '.join(params)}")
         return Result2List(result)
 
-    def run_method_full(self, addr: str, method: str, params: list = [], timestamp: Optional[int] = None):
+    def run_method_full(self, addr: str, method: str, params: list = [], timestamp: Optional[int] = None, block: Optional[str] = None):
         params = list(map(str, params))
         if timestamp is not None:
-            block_id_ext_raw = self._run(f'byutime -1:8000000000000000 {timestamp}')
-            block_id_ext = Pars(block_id_ext_raw, 'reference masterchain block : ', '\n')
-            if block_id_ext is None:
-                raise Exception('Block not found by unixtime.')
-            result = self._run(f"runmethodfull {addr} {block_id_ext} {method} {' '.join(params)}")
+            block = self.get_block_by_utime(timestamp)
+        if block is not None:
+            result = self._run(f"runmethodfull {addr} {block} {method} {' '.join(params)}")
         else:
             result = self._run(f"runmethodfull {addr} {method} {' '.join(params)}")
         return Result2List(result)
 
-    def get_config_17(self):
-        config = self.get_config(17)
+    def get_account_data_fingerprint(self, addr: str, block: Optional[str] = None):
+        """Hash of the code, data and libraries of an active account.
+
+        Unlike the balance and last transaction lt, which change with every
+        tick-tock transaction of special accounts, they change only when the
+        contract updates its state. `saveaccount` writes the StateInit of the
+        account, which is hashed like the Account of the native backend.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'account.boc')
+            if block is not None:
+                self._run(f'saveaccount {path} {addr} {block}')
+            else:
+                self._run(f'saveaccount {path} {addr}')
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                raise LiteClientException(f'Account {addr} does not exist')
+            with open(path, 'rb') as f:
+                state = f.read()
+        return account_data_fingerprint(state)
+
+    def get_config_17(self, block: Optional[str] = None):
+        config = self.get_config(17, block)
         config17 = dict()
         config17["min_stake"] = config["min_stake"]["amount"]["value"]
         config17["max_stake"] = config["max_stake"]["amount"]["value"]
         config17["max_stake_factor"] = config["max_stake_factor"]
         return config17
 
-    def get_validators_list(self, config_id: int):
+    def get_validator_set(self, config_id: int, block: Optional[str] = None):
         if config_id not in [32, 34, 36]:
             raise ValueError("config_id has to be 32, 34, 36")
 
-        config = dict()
-        result = self._run(f'getconfig {config_id}')
+        result = self._getconfig(config_id, block)
         if '= (null)' in result:
             return None
-        config["total"] = int(Pars(result, "total:", ' '))
-        config["utime_since"] = int(Pars(result, "utime_since:", ' '))
-        config["utime_until"] = int(Pars(result, "utime_until:", ' '))
-        config["total_weight"] = int(Pars(result, "total_weight:", ' '))
-        lines = result.split('\n')
-        validators = list()
-        for line in lines:
-            if "public_key:" in line:
-                validatorAdnlAddr = Pars(line, "adnl_addr:x", ')')
-                pubkey = Pars(line, "pubkey:x", ')')
-                validatorWeight = int(Pars(line, "weight:", ' '))
-                buff = dict()
-                buff["adnl_addr"] = validatorAdnlAddr
-                buff["pubkey"] = pubkey
-                buff["weight"] = validatorWeight
-                buff["index"] = len(validators)
-                validators.append(buff)
-        config["validators"] = validators
-        return config
+        return parse_validator_set(result)
 
-    def get_complaints_list(self, config_id: int):
+    def get_validators_list(self, config_id: int, block: Optional[str] = None):
+        val_set = self.get_validator_set(config_id, block)
+        if val_set is None:
+            return None
+        return val_set.to_dict()
+
+    def get_complaints_list(self, config_id: int, block: Optional[str] = None):
         if config_id not in [32, 34]:
             raise ValueError("config_id has to be 32, 34")
 
+        elector_contract = self.get_elector_address(block)
+        val_set = self.get_validator_set(config_id, block)
+        election_id = val_set.utime_since
+        complaints_raw = self.run_method_full(elector_contract, 'list_complaints', [election_id], block=block)
+
+        if complaints_raw is None:
+            return []
+
+        complaints_raw = complaints_raw[0]
+
+        return parse_complaints_list(complaints_raw, val_set)
+
+class LiteClientSnapshot:
+    """Queries pinned to one masterchain block.
+
+    Everything read through a snapshot comes from the same chain state, so
+    config params, validator sets and the elector address are fetched once
+    per snapshot, or taken from the client's ConfigCache. `timestamp` queries
+    still look up their own block.
+    """
+    def __init__(self, client, block: Optional[str] = None, config_cache: Optional[ConfigCache] = None):
+        self.client = client
+        self.config_cache = config_cache
+        self.block = block or client.get_last_block()
+        self.seqno = block_seqno(self.block)
+        self._configs = dict()
+        self._validator_sets = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def gather(self, *queries, max_in_flight: Optional[int] = None, retries: int = 1):
+        """Run independent snapshot queries concurrently.
+
+        Each query is a tuple of a method name and its arguments, e.g.
+        `snapshot.gather(('get_config', 15), ('get_config_17',))`. Results
+        are returned in the order of the queries.
+        """
+        calls = [lambda query=query: getattr(self, query[0])(*query[1:]) for query in queries]
+        return run_parallel(calls, max_in_flight or self.client.max_in_flight, retries)
+
+    def get_config(self, config_id: int):
+        if config_id in self._configs:
+            return self._configs[config_id]
+        cache = self.config_cache
+        if cache is not None and config_id in cache.config_ids:
+            config = cache.get(config_id, self.block)
+            if config is None:
+                config = self.client.get_config(config_id, block=self.block)
+                cache.put(config_id, self.block, config)
+        else:
+            config = self.client.get_config(config_id, block=self.block)
+        self._configs[config_id] = config
+        return config
+
+    def get_elector_address(self):
         elector_contract = self.get_config(1)['elector_addr']
         if elector_contract[0] == 'x':
             elector_contract = f'-1:{elector_contract[1:]}'
+        return elector_contract
+
+    def get_config_17(self):
+        config = self.get_config(17)
+        config17 = dict()
+        config17["min_stake"] = config["min_stake"]["amount"]["value"]
+        config17["max_stake"] = config["max_stake"]["amount"]["value"]
+        config17["max_stake_factor"] = config["max_stake_factor"]
+        return config17
+
+    def get_validator_set(self, config_id: int):
+        if config_id not in self._validator_sets:
+            self._validator_sets[config_id] = self.client.get_validator_set(config_id, block=self.block)
+        return self._validator_sets[config_id]
+
+    def get_validators_list(self, config_id: int):
+        val_set = self.get_validator_set(config_id)
+        if val_set is None:
+            return None
+        return val_set.to_dict()
+
+    def run_method(self, addr: str, method: str, params: list = []):
+        return self.client.run_method(addr, method, params, block=self.block)
 
-        val_config = self.get_validators_list(config_id)
-        election_id = val_config['utime_since']
-        complaints_raw = self.run_method_full(elector_contract, 'list_complaints', [election_id])
+    def run_method_full(self, addr: str, method: str, params: list = [], timestamp: Optional[int] = None):
+        if timestamp is not None:
+            return self.client.run_method_full(addr, method, params, timestamp=timestamp)
+        return self.client.run_method_full(addr, method, params, block=self.block)
+
+    def get_account_data_fingerprint(self, addr: str):
+        return self.client.get_account_data_fingerprint(addr, block=self.block)
+
+    def get_complaints_list(self, config_id: int):
+        if config_id not in [32, 34]:
+            raise ValueError("config_id has to be 32, 34")
+
+        val_set = self.get_validator_set(config_id)
+        complaints_raw = self.run_method_full(self.get_elector_address(), 'list_complaints', [val_set.utime_since])
 
         if complaints_raw is None:
             return []
 
-        complaints_raw = complaints_raw[0]
+        return parse_complaints_list(complaints_raw[0], val_set)
 
-        complaints = []
-        total_weight = val_config["total_weight"]
-        for complaint in complaints_raw:
-            if len(complaint) == 0:
-                continue
-            chash = complaint[0]
-            subdata = complaint[1]
-
-            # Create dict
-            # parser from: https://github.com/ton-blockchain/ton/blob/dab7ee3f9794db5a6d32c895dbc2564f681d9126/crypto/smartcont/elector-code.fc#L1149
-            item = dict()
-            buff = subdata[0] # *complaint*
-            item["election_id"] = election_id
-            item["hash"] = str(chash)
-            pubkey = Dec2HexAddr(buff[0]) # *validator_pubkey*
-            adnl = next(val['adnl_addr'] for val in val_config['validators'] if val['pubkey'] == pubkey)
-            item["pubkey"] = pubkey
-            item["adnl_addr"] = adnl
-            item["description"] = buff[1] # *description*
-            item["created_time"] = buff[2] # *created_at*
-            item["severity"] = buff[3] # *severity*
-            reward_addr = buff[4]
-            reward_addr = "-1:" + Dec2HexAddr(reward_addr)
-            reward_addr = HexAddr2Base64Addr(reward_addr)
-            item["reward_addr"] = reward_addr # *reward_addr*
-            item["paid"] = buff[5] # *paid*
-            item["suggested_fine"] = buff[6] # *suggested_fine*
-            item["suggested_fine_part"] = buff[7] # *suggested_fine_part*
-            voted_validators = subdata[1] # *voters_list*
-            item["voted_validators"] = voted_validators
-            item["vset_id"] = str(subdata[2]) # *vset_id*
-            weight_remaining = subdata[3] # *weight_remaining*
-            required_weight = total_weight * 2 / 3
-            if len(voted_validators) == 0:
-                weight_remaining = required_weight
-            available_weight = required_weight - weight_remaining
-            item["weight_remaining"] = weight_remaining
-            item["approved_percent"] = round(available_weight / total_weight * 100, 3)
-            item["is_passed"] = (weight_remaining < 0)
-            pseudohash = pubkey + str(election_id)
-            item["pseudohash"] = pseudohash
-            complaints.append(item)
-
-        return complaints
+class NativeLiteClient:
+    """LiteClient interface backed by indexer.adnl.AsyncLiteClient.
+
+    The asyncio client runs in a background event loop thread of the process,
+    so threads calling this client share one liteserver connection.
+    """
+    def __init__(self, config_path: str, index: Optional[int] = None, timeout: float = 10, config_cache: Optional[ConfigCache] = None, max_in_flight: int = 4):
+        self.config_path = config_path
+        self.index = index
+        self.timeout = timeout
+        self.config_cache = config_cache
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+
+    def _get_client(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                from indexer.adnl import AsyncLiteClient
+
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+                self._client = AsyncLiteClient(self.config_path, self.index, self.timeout)
+            return self._loop, self._client
+
+    def _call(self, method: str, *args, **kwargs):
+        loop, client = self._get_client()
+        return asyncio.run_coroutine_threadsafe(getattr(client, method)(*args, **kwargs), loop).result()
+
+    def get_last_block(self):
+        return self._call('get_last_block')
+
+    def get_block_by_utime(self, timestamp: int):
+        return self._call('get_block_by_utime', timestamp)
+
+    def snapshot(self, block: Optional[str] = None):
+        return LiteClientSnapshot(self, block, self.config_cache)
+
+    def get_config(self, config_id: int, block: Optional[str] = None):
+        return self._call('get_config', config_id, block)
+
+    def get_elector_address(self, block: Optional[str] = None):
+        return self._call('get_elector_address', block)
+
+    def run_method(self, addr: str, method: str, params: list = [], block: Optional[str] = None):
+        return self._call('run_method', addr, method, params, block)
+
+    def run_method_full(self, addr: str, method: str, params: list = [], timestamp: Optional[int] = None, block: Optional[str] = None):
+        return self._call('run_method_full', addr, method, params, timestamp, block)
+
+    def get_account_data_fingerprint(self, addr: str, block: Optional[str] = None):
+        return self._call('get_account_data_fingerprint', addr, block)
+
+    def get_config_17(self, block: Optional[str] = None):
+        return self._call('get_config_17', block)
+
+    def get_validator_set(self, config_id: int, block: Optional[str] = None):
+        return self._call('get_validator_set', config_id, block)
+
+    def get_validators_list(self, config_id: int, block: Optional[str] = None):
+        return self._call('get_validators_list', config_id, block)
+
+    def get_complaints_list(self, config_id: int, block: Optional[str] = None):
+        return self._call('get_complaints_list', config_id, block)
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._pid = None
+
+def create_config_cache(config_ids: Iterable[int], ttl: float, max_size: int, path: Optional[str] = None):
+    if path:
+        return SqliteConfigCache(path, config_ids, ttl, max_size)
+    return ConfigCache(config_ids, ttl, max_size)
+
+def create_lite_client(backend: str, binary_path: str, config_path: str, pool_size: int = 1, config_cache: Optional[ConfigCache] = None):
+    """LiteClient running `binary_path`, or the NativeLiteClient talking to the liteserver directly.
+
+    The native backend decodes config params 1, 15, 16 and 17 for get_config,
+    and raises LiteClientException for any other id. Validator sets are read
+    with get_validator_set.
+    """
+    if backend == 'binary':
+        return LiteClient(binary_path, config_path, pool_size, config_cache)
+    if backend == 'native':
+        return NativeLiteClient(config_path, config_cache=config_cache, max_in_flight=pool_size)
+    raise ValueError(f"Unknown lite-client backend: {backend}")
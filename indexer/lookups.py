@@ -0,0 +1,49 @@
+from typing import List
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from indexer.database import BULK_WRITE_BATCH_SIZE, encode_document, decode_document
+
+
+# Flat lookup collections answering wallet and ADNL address filters of the API
+# with indexed point queries instead of `$unwind` over the whole history:
+#   wallet_pubkeys: {wallet_address, pubkey, election_id}
+#   pubkey_cycles:  {pubkey, cycle_id}
+#   adnl_cycles:    {adnl_addr, cycle_id}
+
+
+def _replace_entries(collection, scope: dict, key: str, entries: List[dict]):
+    """Make `entries` the only documents of `collection` matching `scope`.
+
+    Within the scope an entry is identified by its `key` field.
+    """
+    entries = [encode_document(entry) for entry in entries]
+    collection.delete_many({**scope, key: {'$nin': [entry[key] for entry in entries]}})
+    requests = [UpdateOne({**scope, key: entry[key]}, {'$set': entry}, upsert=True) for entry in entries]
+    for i in range(0, len(requests), BULK_WRITE_BATCH_SIZE):
+        collection.bulk_write(requests[i:i + BULK_WRITE_BATCH_SIZE], ordered=False)
+
+
+def update_cycle_lookups(db: Database, cycle: dict):
+    cycle_id = cycle['cycle_id']
+    validators = cycle['cycle_info']['validators']
+    _replace_entries(db.pubkey_cycles, {'cycle_id': cycle_id}, 'pubkey',
+                     [{'pubkey': v['pubkey'], 'cycle_id': cycle_id} for v in validators])
+    _replace_entries(db.adnl_cycles, {'cycle_id': cycle_id}, 'adnl_addr',
+                     [{'adnl_addr': v['adnl_addr'], 'cycle_id': cycle_id} for v in validators if v['adnl_addr']])
+
+
+def update_election_lookups(db: Database, election: dict):
+    election_id = election['election_id']
+    _replace_entries(db.wallet_pubkeys, {'election_id': election_id}, 'pubkey',
+                     [{'wallet_address': p['wallet_address'], 'pubkey': p['pubkey'], 'election_id': election_id}
+                      for p in election['participants_list']])
+
+
+def rebuild_lookups(db: Database):
+    """Fill lookup collections from already indexed documents."""
+    for cycle in db.validation_data.find({}, {'cycle_id': True, 'cycle_info.validators': True}):
+        update_cycle_lookups(db, decode_document(cycle))
+    for election in db.elections_data.find({}, {'election_id': True, 'participants_list': True}):
+        update_election_lookups(db, decode_document(election))
@@ -0,0 +1,152 @@
+from typing import Dict
+
+from celery.utils.log import get_task_logger
+from pymongo.database import Database
+
+from indexer.database import bump_data_version, upsert_changed, confirm_changed, decode_document
+from indexer.events import election_events, complaint_events, publish_events
+from indexer.lookups import update_cycle_lookups, update_election_lookups
+from indexer.utils import parse_election, set_complaints_wallet_address, ELECTION_CLOSE_THRESHOLD
+from indexer.views import update_cycle_views
+
+
+logger = get_task_logger(__name__)
+
+# Indexing stages. Each stage reads chain state through the snapshot of an
+# IndexerContext and leaves what later stages need in it, so the stages of
+# one run share config params, validator sets and elections instead of
+# querying them again.
+NO_ID = {'_id': False}
+
+# chain state read by the stages, fetched concurrently when all of them run
+PREFETCH = (('get_config', 1), ('get_config', 15), ('get_config', 16), ('get_config', 17),
+            ('get_validator_set', 32), ('get_validator_set', 34), ('get_validator_set', 36))
+
+
+class IndexerContext:
+    """State shared by the stages of one indexer run."""
+    def __init__(self, db: Database, snapshot):
+        self.db = db
+        self.snapshot = snapshot
+        self.elections: Dict[int, dict] = dict()
+        self.changed = False
+
+
+def index_validation_cycle(ctx: IndexerContext) -> str:
+    snapshot = ctx.snapshot
+    validators, config15, config16, config17 = snapshot.gather(('get_validators_list', 36),
+                                                               ('get_config', 15),
+                                                               ('get_config', 16),
+                                                               ('get_config_17',))
+
+    if not validators:
+        return 'Config 36 is not ready yet'
+
+    data = {
+        'cycle_id': validators['utime_since'],
+        'cycle_info': validators,
+        'config15': config15,
+        'config16': config16,
+        'config17': config17
+    }
+
+    updated = upsert_changed(ctx.db.validation_data, 'cycle_id', [data], snapshot.seqno, confirm=False)
+    if not updated:
+        return 'Validators config did not change'
+    ctx.changed = True
+    update_cycle_lookups(ctx.db, data)
+    update_cycle_views(ctx.db, [data['cycle_id']], snapshot.seqno)
+    confirm_changed(ctx.db.validation_data, 'cycle_id', [data], updated)
+
+    return 'Validators config updated'
+
+
+def index_elections(ctx: IndexerContext) -> str:
+    db, snapshot = ctx.db, ctx.snapshot
+    elector_contract = snapshot.get_elector_address()
+
+    election_id = snapshot.run_method(elector_contract, 'active_election_id')[0]
+
+    if election_id == 0:
+        # Run `participant_list_extended` at the moment before closing election.
+        # Note: election_id is end timestamp of next validation cycle.
+        election_is_in_progress = False
+        last_election_ids = snapshot.run_method(elector_contract, 'past_election_ids')[0]
+        election_id = max([int(id) for id in last_election_ids])
+
+        prev_saved_election = db.elections_data.find_one({'election_id': {'$eq': election_id}}, NO_ID)
+        if prev_saved_election is not None and prev_saved_election['finished']:
+            ctx.elections[election_id] = decode_document(prev_saved_election)
+            return 'This elections is finished and already exists in DB'
+
+        before_closing_election = election_id - snapshot.get_config(15)['elections_end_before'] - ELECTION_CLOSE_THRESHOLD
+
+        participants_info = snapshot.run_method_full(elector_contract, 'participant_list_extended', timestamp=before_closing_election)
+    else:
+        # Calling run_method_full at the snapshot block as workaround for bug:
+        # run_method returnes parsing error in lite-client.
+        election_is_in_progress = True
+        participants_info = snapshot.run_method_full(elector_contract, 'participant_list_extended')
+
+    election_data = parse_election(election_id, participants_info, finished=not election_is_in_progress)
+    ctx.elections[election_id] = election_data
+
+    previous = dict()
+    updated = upsert_changed(db.elections_data, 'election_id', [election_data], snapshot.seqno, previous, confirm=False)
+    if not updated:
+        return f"Election {election_id} did not change"
+    ctx.changed = True
+    update_election_lookups(db, election_data)
+    update_cycle_views(db, [election_id], snapshot.seqno)
+    publish_events(db, election_events(election_data, previous.get(election_id)), snapshot.seqno)
+    confirm_changed(db.elections_data, 'election_id', [election_data], updated)
+
+    return f"Election {election_id} was added/updated"
+
+
+def index_complaints(ctx: IndexerContext) -> str:
+    db, snapshot = ctx.db, ctx.snapshot
+
+    # elector address is shared by both queries
+    snapshot.get_elector_address()
+    cycles_complaints = [c for c in snapshot.gather(('get_complaints_list', 32), ('get_complaints_list', 34)) if c]
+
+    # participants of elections not indexed in this run are read in one query
+    missing = [c[0]['election_id'] for c in cycles_complaints if c[0]['election_id'] not in ctx.elections]
+    if missing:
+        for election in db.elections_data.find({'election_id': {'$in': missing}}, {**NO_ID, 'election_id': True, 'participants_list': True}):
+            ctx.elections[election['election_id']] = decode_document(election)
+
+    complaints = []
+    for cycle_complaints in cycles_complaints:
+        election = ctx.elections.get(cycle_complaints[0]['election_id'])
+        if election:
+            set_complaints_wallet_address(cycle_complaints, election['participants_list'])
+        complaints += cycle_complaints
+
+    previous = dict()
+    updated = upsert_changed(db.complaints_data, 'pseudohash', complaints, snapshot.seqno, previous, confirm=False)
+    if updated:
+        ctx.changed = True
+        updated_set = set(updated)
+        update_cycle_views(db, [c['election_id'] for c in complaints if c['pseudohash'] in updated_set], snapshot.seqno)
+        publish_events(db, complaint_events(complaints, updated, previous), snapshot.seqno)
+        confirm_changed(db.complaints_data, 'pseudohash', complaints, updated)
+
+    return f"{len(updated)} of {len(complaints)} complaints were added/updated"
+
+
+STAGES = (index_validation_cycle, index_elections, index_complaints)
+
+
+def run_stages(db: Database, snapshot, stages=STAGES) -> str:
+    """Run `stages` in order over one snapshot, bumping the data version once if any of them changed data."""
+    ctx = IndexerContext(db, snapshot)
+    if len(stages) > 1:
+        snapshot.gather(*PREFETCH)
+    try:
+        results = [stage(ctx) for stage in stages]
+    finally:
+        if ctx.changed:
+            bump_data_version(db)
+    return '; '.join(results)
@@ -0,0 +1,86 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+from pymongo.database import Database
+
+import indexer.constants as constants
+
+
+# Chain scheduler: `poll` follows the last masterchain block and dispatches an
+# indexing task only when chain state the task reads changed since the
+# previous poll. Its state lives in `service_state`, so any worker process
+# can run the next poll.
+STATE_ID = 'scheduler'
+
+TASK_INPUTS = {
+    'indexer.tasks.update_validation_cycle': ('config36',),
+    'indexer.tasks.update_elections': ('elector',),
+    'indexer.tasks.update_complaints': ('elector', 'config32', 'config34'),
+}
+# runs all the tasks above over one snapshot
+PIPELINE_TASK = 'indexer.tasks.update_all'
+
+
+def _validator_set_id(val_set) -> Optional[str]:
+    if val_set is None:
+        return None
+    return f'{val_set.utime_since}:{val_set.utime_until}:{val_set.total_weight}'
+
+
+def read_inputs(snapshot) -> Dict[str, Optional[str]]:
+    """Fingerprints of the chain state read by the indexing tasks."""
+    elector, config32, config34, config36 = snapshot.gather(('get_account_data_fingerprint', snapshot.get_elector_address()),
+                                                           ('get_validator_set', 32),
+                                                           ('get_validator_set', 34),
+                                                           ('get_validator_set', 36))
+    return {
+        'elector': elector,
+        'config32': _validator_set_id(config32),
+        'config34': _validator_set_id(config34),
+        'config36': _validator_set_id(config36),
+    }
+
+
+def poll_interval(config15: dict, cycle, now: float) -> float:
+    """Seconds to the next poll, short around election start and end and the cycle switch."""
+    if cycle is None:
+        return constants.SCHEDULER_FAST_INTERVAL
+    boundaries = (cycle.utime_until - config15['elections_start_before'],
+                  cycle.utime_until - config15['elections_end_before'],
+                  cycle.utime_until)
+    if any(abs(now - boundary) <= constants.SCHEDULER_BOUNDARY_WINDOW for boundary in boundaries):
+        return constants.SCHEDULER_FAST_INTERVAL
+    return constants.SCHEDULER_POLL_INTERVAL
+
+
+def changed_tasks(previous: dict, inputs: dict) -> List[str]:
+    changed = {name for name, value in inputs.items() if previous.get(name) != value}
+    return [task for task, names in TASK_INPUTS.items() if changed.intersection(names)]
+
+
+def poll(db: Database, lite_client, dispatch: Callable[[str], None]) -> str:
+    state = db.service_state.find_one({'_id': STATE_ID}) or {}
+    now = time.time()
+    if now < state.get('next_poll_at', 0):
+        return 'Not polling yet'
+
+    refresh = state.get('refreshed_at', 0) + constants.SCHEDULER_REFRESH_INTERVAL <= now
+    snapshot = lite_client.snapshot()
+    if snapshot.seqno == state.get('seqno') and not refresh:
+        db.service_state.update_one({'_id': STATE_ID},
+                                    {'$set': {'next_poll_at': now + state.get('interval', constants.SCHEDULER_FAST_INTERVAL)}})
+        return f'No new masterchain block after {snapshot.seqno}'
+
+    inputs = read_inputs(snapshot)
+    interval = poll_interval(snapshot.get_config(15), snapshot.get_validator_set(34), now)
+    tasks = list(TASK_INPUTS) if refresh else changed_tasks(state.get('inputs', {}), inputs)
+    if len(tasks) == len(TASK_INPUTS):
+        tasks = [PIPELINE_TASK]
+    for task in tasks:
+        dispatch(task)
+
+    update = {'seqno': snapshot.seqno, 'inputs': inputs, 'interval': interval, 'next_poll_at': now + interval}
+    if refresh:
+        update['refreshed_at'] = now
+    db.service_state.update_one({'_id': STATE_ID}, {'$set': update}, upsert=True)
+    return f"Block {snapshot.seqno}: dispatched {', '.join(tasks) or 'nothing'}, next poll in {interval:.0f} s"
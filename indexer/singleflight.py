@@ -0,0 +1,61 @@
+import time
+from typing import List, Optional
+
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+
+# Single-flight execution of indexer tasks. A run holds the locks of the
+# stages it runs in `task_locks` ({_id: lock name, owner, expires_at, pending})
+# until it finishes or the locks expire. A run that finds a lock held is
+# skipped; with coalescing it adds its task to `pending`, and the lock holder
+# dispatches each pending task once when it releases the lock. Retries of a run keep its task id
+# and re-acquire the lock, keeping runs coalesced meanwhile pending.
+#
+# Counters of runs, skips and coalesced runs per task, config cache hits and
+# misses, and the broker queue depth, are kept in the `task_metrics` document
+# of `service_state`.
+METRICS_ID = 'task_metrics'
+
+
+def acquire_task_lock(db: Database, name: str, owner: str, ttl: float) -> bool:
+    now = time.time()
+    try:
+        db.task_locks.update_one({'_id': name, '$or': [{'owner': None}, {'owner': owner}, {'expires_at': {'$lt': now}}]},
+                                 {'$set': {'owner': owner, 'expires_at': now + ttl}},
+                                 upsert=True)
+    except DuplicateKeyError:
+        # the lock exists and is held by another run
+        return False
+    return True
+
+
+def set_task_pending(db: Database, name: str, task: str):
+    db.task_locks.update_one({'_id': name, 'owner': {'$ne': None}}, {'$addToSet': {'pending': task}})
+
+
+def release_task_lock(db: Database, name: str, owner: str) -> List[str]:
+    """Release the lock, returns the tasks whose runs were coalesced into this one."""
+    lock = db.task_locks.find_one_and_update({'_id': name, 'owner': owner},
+                                             {'$set': {'owner': None, 'pending': []}})
+    if lock is None or not isinstance(lock.get('pending'), list):
+        return []
+    return lock['pending']
+
+
+def record_task_run(db: Database, name: str, skipped: bool = False, coalesced: bool = False,
+                    duration: Optional[float] = None, queue_depth: Optional[int] = None,
+                    config_cache: Optional[dict] = None):
+    update = {'$inc': {f'tasks.{name}.skipped' if skipped else f'tasks.{name}.runs': 1}}
+    for counter, value in (config_cache or {}).items():
+        if value:
+            update['$inc'][f'config_cache.{counter}'] = value
+    if coalesced:
+        update['$inc'][f'tasks.{name}.coalesced'] = 1
+    fields = {f'tasks.{name}.last_run_at': time.time()}
+    if duration is not None:
+        fields[f'tasks.{name}.last_duration'] = duration
+    if queue_depth is not None:
+        fields['queue_depth'] = queue_depth
+    update['$set'] = fields
+    db.service_state.update_one({'_id': METRICS_ID}, update, upsert=True)
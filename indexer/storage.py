@@ -0,0 +1,72 @@
+import base64
+import binascii
+
+
+# Storage forms of pubkeys and addresses, shared by the indexer and the
+# webserver, so this module imports nothing from either of them.
+#
+# With STORAGE_FORMAT=binary pubkeys and ADNL addresses (64 hex digits) and
+# wallet addresses (bounceable base64 masterchain addresses) are stored as
+# their 32 bytes, which pymongo writes as BinData and reads back as bytes.
+# Fingerprints and everything the indexer computes use the string form, and
+# decode_document converts stored documents of either format back to it.
+BINARY_FIELDS = {'pubkey': 'hex', 'adnl_addr': 'hex', 'wallet_address': 'address', 'reward_addr': 'address'}
+# bounceable mainnet address tag and masterchain workchain of wallet addresses
+ADDRESS_PREFIX = bytes([0x11, 0xff])
+
+
+def encode_value(kind: str, value):
+    """32 bytes of a hex or address string, or the value itself if it can not be restored from them."""
+    if not isinstance(value, str):
+        return value
+    if kind == 'hex':
+        if len(value) == 64 and value == value.upper():
+            try:
+                return bytes.fromhex(value)
+            except ValueError:
+                pass
+        return value
+    try:
+        data = base64.urlsafe_b64decode(value)
+    except (binascii.Error, ValueError):
+        return value
+    if len(data) == 36 and data[:2] == ADDRESS_PREFIX and decode_value('address', data[2:34]) == value:
+        return data[2:34]
+    return value
+
+
+def decode_value(kind: str, value):
+    if not isinstance(value, bytes):
+        return value
+    if kind == 'hex':
+        return value.hex().upper()
+    data = ADDRESS_PREFIX + value
+    crc = binascii.crc_hqx(data, 0)  # CRC16-XMODEM
+    return base64.urlsafe_b64encode(data + bytes([crc >> 8, crc & 0xff])).decode()
+
+
+def _convert(value, convert):
+    if isinstance(value, dict):
+        return {key: convert(BINARY_FIELDS[key], item) if key in BINARY_FIELDS else _convert(item, convert)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_convert(item, convert) for item in value]
+    return value
+
+
+def encode_document(document: dict) -> dict:
+    return _convert(document, encode_value)
+
+
+def decode_document(document: dict) -> dict:
+    return _convert(document, decode_value)
+
+
+def encodings(kind: str, value: str) -> list:
+    """`value` in its string and binary storage forms, for filters that match either format."""
+    encoded = encode_value(kind, value.upper() if kind == 'hex' else value)
+    return [value, encoded] if encoded is not value else [value]
+
+
+def match(kind: str, value: str) -> dict:
+    return {'$in': encodings(kind, value)}
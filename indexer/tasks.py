@@ -1,172 +1,133 @@
-from datetime import datetime
-from pymongo import MongoClient
+import functools
+import time
+import uuid
+
+from celery import current_task
+from celery.signals import worker_init, worker_process_shutdown
+from celery.utils.log import get_task_logger
 from indexer.celery import app
-from indexer.liteclient import LiteClient, LiteClientException
-from indexer.utils import Dec2HexAddr, HexAddr2Base64Addr
+from indexer.database import mongo, get_database, bootstrap_database, bump_data_version
+from indexer.lookups import rebuild_lookups
+from indexer.views import rebuild_cycle_views
+from indexer.pipeline import run_stages, index_validation_cycle, index_elections, index_complaints
+from indexer import scheduler
+from indexer.singleflight import acquire_task_lock, set_task_pending, release_task_lock, record_task_run
+from indexer.liteclient import create_config_cache, create_lite_client, LiteClientException
 
 import indexer.constants as constants
 
-lite_client = LiteClient(constants.LITE_CLIENT_BINARY, constants.LITE_CLIENT_CONFIG)
+logger = get_task_logger(__name__)
+
+config_cache = create_config_cache(constants.LITE_CLIENT_CACHED_CONFIGS,
+                                   constants.LITE_CLIENT_CACHE_TTL,
+                                   constants.LITE_CLIENT_CACHE_SIZE,
+                                   constants.LITE_CLIENT_CACHE_PATH)
+lite_client = create_lite_client(constants.LITE_CLIENT_BACKEND,
+                                 constants.LITE_CLIENT_BINARY,
+                                 constants.LITE_CLIENT_CONFIG,
+                                 constants.LITE_CLIENT_POOL_SIZE,
+                                 config_cache)
+
+@worker_init.connect
+def bootstrap(**kwargs):
+    db = get_database()
+    bootstrap_database(db)
+    if db.pubkey_cycles.estimated_document_count() == 0:
+        rebuild_lookups(db)
+    if db.cycle_view.estimated_document_count() == 0:
+        rebuild_cycle_views(db)
+        bump_data_version(db)
+    mongo.close()
+
+@worker_process_shutdown.connect
+def close_connections(**kwargs):
+    logger.info(f"Config cache stats: {config_cache.stats()}")
+    lite_client.close()
+    mongo.close()
+
+def queue_depth():
+    try:
+        with app.connection_or_acquire() as connection:
+            return connection.default_channel.queue_declare(queue=app.conf.task_default_queue, passive=True).message_count
+    except Exception as e:
+        logger.warning(f"Failed to read queue depth: {e}")
+        return None
+
+def release_locks(db, locks, owner: str):
+    pending = set()
+    for lock in locks:
+        pending.update(release_task_lock(db, lock, owner))
+    for task in sorted(pending):
+        app.send_task(task, expires=constants.TASK_LOCK_TTL)
+
+def single_flight(*locks: str, coalesce: bool = True):
+    """Skip a run of the task while another run holds one of its `locks`.
+
+    Locks are named after the pipeline stages a task runs, so update_all and
+    the single-stage tasks exclude each other; by default the lock is the
+    task name. With `coalesce` the skipped runs are replaced by one more run
+    after the current one finishes, so changes they were dispatched for are
+    indexed.
+    """
+    def decorator(func):
+        names = locks or (func.__name__,)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            db = get_database()
+            name = func.__name__
+            owner = current_task.request.id or str(uuid.uuid4())
+            acquired = []
+            for lock in names:
+                if not acquire_task_lock(db, lock, owner, constants.TASK_LOCK_TTL):
+                    break
+                acquired.append(lock)
+            if len(acquired) < len(names):
+                release_locks(db, acquired, owner)
+                if coalesce:
+                    set_task_pending(db, names[len(acquired)], current_task.name)
+                record_task_run(db, name, skipped=True, coalesced=coalesce, queue_depth=queue_depth())
+                return f"{names[len(acquired)]} is already running, run skipped"
+
+            started = time.monotonic()
+            retrying = False
+            try:
+                return func(*args, **kwargs)
+            except LiteClientException:
+                # autoretry_for queues the retry under the same task id, which keeps the lock
+                retrying = (LiteClientException in getattr(current_task, 'autoretry_for', ())
+                            and current_task.request.retries < current_task.max_retries)
+                raise
+            finally:
+                if not retrying:
+                    release_locks(db, names, owner)
+                record_task_run(db, name, duration=time.monotonic() - started, queue_depth=queue_depth(),
+                                config_cache=config_cache.take_stats())
+        return wrapper
+    return decorator
+
+@app.task
+@single_flight(coalesce=False)
+def follow_masterchain():
+    return scheduler.poll(get_database(), lite_client, lambda task: app.send_task(task, expires=constants.TASK_LOCK_TTL))
 
 @app.task(autoretry_for=(LiteClientException,), default_retry_delay=1, max_retries=5)
+@single_flight('validation_cycle')
 def update_validation_cycle():
-    with open(constants.MONGO_PASSWORD_FILE, 'r') as f:
-        password = f.read()
-    client = MongoClient(host=constants.MONGO_HOST, 
-                         port=constants.MONGO_PORT,
-                         username=constants.MONGO_USER,
-                         password=password)
-    validation_collection = client[constants.MONGO_DATABASE]['validation_data']
-    validation_collection.create_index('cycle_id')
-
-    validators = lite_client.get_validators_list(36)
-
-    if not validators:
-        return 'Config 36 is not ready yet'
-
-    prev_saved_config = validation_collection.find_one({
-        'cycle_id': {
-            '$eq' : validators['utime_since']
-        }
-    })
-    if prev_saved_config is not None:
-        if prev_saved_config['cycle_info'] == validators:
-            return 'Validators config did not change'
-
-    config15 = lite_client.get_config(15)
-    config16 = lite_client.get_config(16)
-    config17 = lite_client.get_config_17()
-    
-    data = {
-        'cycle_id': validators['utime_since'],
-        'cycle_info': validators,
-        'config15': config15,
-        'config16': config16,
-        'config17': config17
-    }
-
-    validation_collection.replace_one({'cycle_id' : {'$eq': validators['utime_since']}}, data, upsert=True)
-
-    return 'Validators config updated'
+    return run_stages(get_database(), lite_client.snapshot(), (index_validation_cycle,))
 
 @app.task(autoretry_for=(LiteClientException,), default_retry_delay=1, max_retries=5)
+@single_flight('elections')
 def update_elections():
-    with open(constants.MONGO_PASSWORD_FILE, 'r') as f:
-        password = f.read()
-    client = MongoClient(host=constants.MONGO_HOST, 
-                         port=constants.MONGO_PORT,
-                         username=constants.MONGO_USER,
-                         password=password)
-    elections_collection = client[constants.MONGO_DATABASE]['elections_data']
-    elections_collection.create_index('election_id')
-
-    elector_contract = lite_client.get_config(1)['elector_addr']
-    if elector_contract[0] == 'x':
-        elector_contract = f'-1:{elector_contract[1:]}'
-
-    election_id = lite_client.run_method(elector_contract, 'active_election_id')[0]
-
-    if election_id == 0:
-        # Run `participant_list_extended` at the moment before closing election.
-        # Note: election_id is end timestamp of next validation cycle.
-        election_is_in_progress = False
-        last_election_ids = lite_client.run_method(elector_contract, 'past_election_ids')[0]
-        election_id = max([int(id) for id in last_election_ids])
-
-        prev_saved_election = elections_collection.find_one({
-            'election_id': {
-                '$eq' : election_id
-            }
-        })
-        if prev_saved_election is not None and prev_saved_election['finished']:
-            return 'This elections is finished and already exists in DB'
-        
-        config15 = lite_client.get_config(15)
-        elections_end_before = config15['elections_end_before']
-        ELECTION_CLOSE_THRESHOLD = 10
-        before_closing_election = election_id - elections_end_before - ELECTION_CLOSE_THRESHOLD
-
-        participants_info = lite_client.run_method_full(elector_contract, 'participant_list_extended', timestamp=before_closing_election)
-    else:
-        # Calling run_method_full with timestamp set as now() with small offset as workaround for bug: 
-        # run_method returnes parsing error in lite-client.
-        election_is_in_progress = True
-        NOW_THRESHOLD = 10
-        now_timestamp = int(datetime.utcnow().timestamp() - NOW_THRESHOLD)
-        participants_info = lite_client.run_method_full(elector_contract, 'participant_list_extended', timestamp=now_timestamp)
-
-    elect_at = int(participants_info[0])
-    elect_close = int(participants_info[1])
-    min_stake = int(participants_info[2])
-    total_stake = int(participants_info[3])
-    participant_list_raw = participants_info[4]
-    # failed = bool(participants_info[5])
-    # finished = bool(participants_info[6])
-
-    if elect_at != election_id:
-        raise Exception(f'Inconsistency error: election_id={election_id}, elect_at={elect_at}')
-
-    participant_list = []
-    for participant_raw in participant_list_raw:
-        wallet_address = participant_raw[1][2]
-        wallet_address = "-1:" + Dec2HexAddr(wallet_address)
-        wallet_address = HexAddr2Base64Addr(wallet_address)
-        participant_list.append({
-            'pubkey': Dec2HexAddr(participant_raw[0]),
-            'stake': participant_raw[1][0],
-            'max_factor': participant_raw[1][1],
-            'wallet_address': wallet_address,
-            'adnl_addr': Dec2HexAddr(participant_raw[1][3])
-        })
-
-
-    election_data = {
-        'election_id': election_id,
-        'elect_close': elect_close,
-        'min_stake': min_stake,
-        'total_stake': total_stake,
-        'participants_list': participant_list,
-        'finished': not election_is_in_progress
-    }
-
-    elections_collection.replace_one({'election_id' : {'$eq': election_id}}, election_data, upsert=True)
-
-    return f"Election {election_id} was added/updated"
+    return run_stages(get_database(), lite_client.snapshot(), (index_elections,))
 
 @app.task(autoretry_for=(LiteClientException,), default_retry_delay=1, max_retries=5)
+@single_flight('complaints')
 def update_complaints():
-    with open(constants.MONGO_PASSWORD_FILE, 'r') as f:
-        password = f.read()
-    client = MongoClient(host=constants.MONGO_HOST, 
-                         port=constants.MONGO_PORT,
-                         username=constants.MONGO_USER,
-                         password=password)
-    complaints_collection = client[constants.MONGO_DATABASE]['complaints_data']
-    complaints_collection.create_index('election_id')
-    elections_collection = client[constants.MONGO_DATABASE]['elections_data']
-
-    elector_contract = lite_client.get_config(1)['elector_addr']
-    if elector_contract[0] == 'x':
-        elector_contract = f'-1:{elector_contract[1:]}'
-
-    complaints = []
-    for val_cycle in [32, 34]:
-        cycle_complaints = lite_client.get_complaints_list(val_cycle)
-
-        # Set wallet_address for each complaint. TODO: Refactor it.
-        if len(cycle_complaints) == 0:
-            continue
-        election_req = elections_collection.find_one({'election_id': {'$eq' : cycle_complaints[0]['election_id']}})
-        if election_req:
-            for complaint in cycle_complaints:
-                try:
-                    participant = next(participant for participant in election_req['participants_list'] if participant['pubkey'] == complaint['pubkey'])
-                    wallet_address = participant['wallet_address']
-                except StopIteration:
-                    wallet_address = None
-                complaint['wallet_address'] = wallet_address
-                
-        complaints += cycle_complaints
-    
-    for complaint in complaints:
-        complaints_collection.replace_one({'pseudohash' : {'$eq': complaint['pseudohash']}}, complaint, upsert=True)
+    return run_stages(get_database(), lite_client.snapshot(), (index_complaints,))
+
+@app.task(autoretry_for=(LiteClientException,), default_retry_delay=1, max_retries=5)
+@single_flight('validation_cycle', 'elections', 'complaints')
+def update_all():
+    # all stages over one snapshot: cycle, then elections, then complaints matched with their participants
+    return run_stages(get_database(), lite_client.snapshot())
@@ -1,6 +1,6 @@
 import base64
-import crc16
-import json
+import binascii
+import re
 
 
 def dec2hex(dec):
@@ -16,6 +16,10 @@ def Dec2HexAddr(dec):
     h64 = hu.rjust(64, "0")
     return h64
 
+# block id in lite-client format: (-1,8000000000000000,123):ROOT_HASH:FILE_HASH
+def block_seqno(block_id_ext):
+    return int(block_id_ext[1:block_id_ext.index(')')].split(',')[2])
+
 # Ref: https://github.com/igroman787/mypylib/blob/447655f4485181da6978f0d41b33a82d4861713f/mypylib.py#L647
 def Pars(text, search, search2=None):
     if search is None or text is None:
@@ -27,113 +31,112 @@ def Pars(text, search, search2=None):
         text = text[:text.find(search2)]
     return text
 
-# Ref: https://github.com/ton-blockchain/mytonctrl/blob/cf14be114ca4bcffa1d1280550c0951310c86fef/mytoncore.py#L2651
+# Output shape follows https://github.com/ton-blockchain/mytonctrl/blob/cf14be114ca4bcffa1d1280550c0951310c86fef/mytoncore.py#L2651
+# `(name a:1 b:(c d:x1))` -> {"_": "name", "a": 1, "b": {"_": "c", "d": "x1"}}
+# The type name is kept only if it directly follows the bracket, nested objects
+# and atoms without a key are stored under "_" (the last one wins, as in the
+# JSON based parser), digit-only values become ints. Bitstring literals such as
+# `x{001_}` are atoms; the cell dump after the pretty-print starts on a line of
+# its own.
+TLB_TOKEN = re.compile(r'x\{[0-9A-Fa-f_]*\}|[(){}:]|[^\s(){}:]+')
+TLB_CELL_DUMP = re.compile(r'^\s*x\{', re.MULTILINE)
+TLB_OPEN = ('(', '{')
+TLB_CLOSE = (')', '}')
+
+def _tlb_atom(token):
+    return int(token) if token.isdigit() else token
+
+def _tlb_value(tokens, pos):
+    if pos >= len(tokens):
+        raise ValueError("Tlb2Json error: unexpected end of text")
+    token = tokens[pos].group()
+    if token in TLB_OPEN:
+        return _tlb_object(tokens, pos + 1)
+    if token in TLB_CLOSE or token == ':':
+        raise ValueError(f"Tlb2Json error: unexpected '{token}' at {tokens[pos].start()}")
+    return _tlb_atom(token), pos + 1
+
+def _tlb_object(tokens, pos):
+    data = dict()
+    if pos < len(tokens) and tokens[pos].start() == tokens[pos - 1].end():
+        token = tokens[pos].group()
+        if token not in TLB_OPEN and token not in TLB_CLOSE and token != ':':
+            data['_'] = _tlb_atom(token)
+            pos += 1
+    while True:
+        if pos >= len(tokens):
+            raise ValueError("Tlb2Json error: unexpected end of text")
+        token = tokens[pos].group()
+        if token in TLB_CLOSE:
+            return data, pos + 1
+        if token in TLB_OPEN:
+            data['_'], pos = _tlb_object(tokens, pos + 1)
+            continue
+        if token == ':':
+            raise ValueError(f"Tlb2Json error: field name expected at {tokens[pos].start()}")
+        if pos + 1 >= len(tokens) or tokens[pos + 1].group() != ':':
+            data['_'] = _tlb_atom(token)
+            pos += 1
+            continue
+        data[token], pos = _tlb_value(tokens, pos + 2)
+
 def Tlb2Json(text):
-    # Заменить скобки
     start = 0
     end = len(text)
     if '=' in text:
         start = text.find('=')+1
-    if "x{" in text:
-        end = text.find("x{")
-    text = text[start:end]
-    text = text.strip()
-    text = text.replace('(', '{')
-    text = text.replace(')', '}')
-
-    # Добавить кавычки к строкам (1 этап)
-    buff = text
-    buff = buff.replace('\r', ' ')
-    buff = buff.replace('\n', ' ')
-    buff = buff.replace('\t', ' ')
-    buff = buff.replace('{', ' ')
-    buff = buff.replace('}', ' ')
-    buff = buff.replace(':', ' ')
-
-    # Добавить кавычки к строкам (2 этап)
-    buff2 = ""
-    itemList = list()
-    for item in list(buff):
-        if item == ' ':
-            if len(buff2) > 0:
-                itemList.append(buff2)
-                buff2 = ""
-            itemList.append(item)
-        else:
-            buff2 += item
-    #end for
-
-    # Добавить кавычки к строкам (3 этап)
-    i = 0
-    for item in itemList:
-        l = len(item)
-        if item == ' ':
-            pass
-        elif item.isdigit() is False:
-            c = '"'
-            item2 = c + item + c
-            text = text[:i] + item2 + text[i+l:]
-            i += 2
-        #end if
-        i += l
-    #end for
-
-    # Обозначить тип объекта
-    text = text.replace('{"', '{"_":"')
-
-    # Расставить запятые
-    while True:
-        try:
-            data = json.loads(text)
-            break
-        except json.JSONDecodeError as err:
-            if "Expecting ',' delimiter" in err.msg:
-                text = text[:err.pos] + ',' + text[err.pos:]
-            elif "Expecting property name enclosed in double quotes" in err.msg:
-                text = text[:err.pos] + '"_":' + text[err.pos:]
-            else:
-                raise err
-    #end while
-
+    cell_dump = TLB_CELL_DUMP.search(text, start)
+    if cell_dump is not None:
+        end = cell_dump.start()
+    tokens = list(TLB_TOKEN.finditer(text, start, end))
+    data, pos = _tlb_value(tokens, 0)
+    if pos != len(tokens):
+        raise ValueError(f"Tlb2Json error: unexpected data at {tokens[pos].start()}")
     return data
-#end define
 
-# Ref: https://github.com/ton-blockchain/mytonctrl/blob/69f0c57d4797db0621ab2f0b24af0420a427aeed/mytoncore.py#L2302
+# Output shape follows https://github.com/ton-blockchain/mytonctrl/blob/69f0c57d4797db0621ab2f0b24af0420a427aeed/mytoncore.py#L2302
+# `[ 1 (2 3) C{AB} ]` -> [1, [2, 3], "C{AB}"]
+# Cell, slice and builder literals are kept as strings.
+RESULT_LITERAL_TOKEN = re.compile(r'[A-Za-z]*\{(?:[^{}]|\{[^{}]*\})*\}|[\[\]]|[^\s\[\]]+')
+
+def _result_tokens(buff):
+    buff = buff.replace('(', '[').replace(')', ']')
+    tokens = buff.replace('[', ' [ ').replace(']', ' ] ').split()
+    if '{' in buff and any(token.count('{') != token.count('}') for token in tokens if '{' in token or '}' in token):
+        # slice literals contain spaces and were split above
+        return RESULT_LITERAL_TOKEN.findall(buff)
+    return tokens
+
+def _result_atom(token):
+    if token == 'NaN':
+        return float('nan')
+    if token == 'null':
+        return None
+    return token
+
 def Result2List(text):
     buff = Pars(text, "result:", "\n")
     if buff is None or "error" in buff:
         return
-    buff = buff.replace(')', ']')
-    buff = buff.replace('(', '[')
-    buff = buff.replace(']', ' ] ')
-    buff = buff.replace('[', ' [ ')
-    arr = buff.split()
-
-    # Get good raw data
-    output = ""
-    arrLen = len(arr)
-    for i in range(arrLen):
-        item = arr[i]
-        # get next item
-        if i+1 < arrLen:
-            nextItem = arr[i+1]
-        else:
-            nextItem = None
-        # add item to output
-        if item == '[':
-            output += item
-        elif nextItem == ']':
-            output += item
-        elif '{' in item or '}' in item:
-            output += "\"{item}\", ".format(item=item)
-        elif i+1 == arrLen:
-            output += item
+    stack = []
+    current = []
+    for token in _result_tokens(buff):
+        if token == '[':
+            stack.append(current)
+            current = []
+        elif token == ']':
+            if not stack:
+                raise ValueError("Result2List error: unbalanced ']'")
+            item = current
+            current = stack.pop()
+            current.append(item)
+        elif token[-1].isdigit():
+            current.append(int(token))
         else:
-            output += item + ', '
-    #end for
-    data = json.loads(output)
-    return data
-#end define
+            current.append(_result_atom(token))
+    if stack or len(current) != 1:
+        raise ValueError("Result2List error: one complete value expected")
+    return current[0]
 
 # Ref: https://github.com/ton-blockchain/mytonctrl/blob/f84dae39353766c8524733594a83cc7e0c6c71d3/mytoncore.py#L2534
 def HexAddr2Base64Addr(fullAddr, bounceable=True, testnet=False):
@@ -150,7 +153,7 @@ def HexAddr2Base64Addr(fullAddr, bounceable=True, testnet=False):
     b[1] = workchain % 256
     b[2:34] = bytearray.fromhex(addr_hex)
     buff = bytes(b[:34])
-    crc = crc16.crc16xmodem(buff)
+    crc = binascii.crc_hqx(buff, 0)  # CRC16-XMODEM
     b[34] = crc >> 8
     b[35] = crc & 0xff
     result = base64.b64encode(b)
@@ -158,4 +161,158 @@ def HexAddr2Base64Addr(fullAddr, bounceable=True, testnet=False):
     result = result.replace('+', '-')
     result = result.replace('/', '_')
     return result
-#end define
\ No newline at end of file
+#end define
+class ValidatorSet:
+    """Validator set (config 32, 34, 36) stored as parallel arrays.
+
+    Per-validator dicts are built only by `validators()`/`to_dict()`.
+    """
+    __slots__ = ('total', 'utime_since', 'utime_until', 'total_weight', 'pubkeys', 'adnl_addrs', 'weights', 'index')
+
+    def __init__(self, total, utime_since, utime_until, total_weight, pubkeys, adnl_addrs, weights):
+        self.total = total
+        self.utime_since = utime_since
+        self.utime_until = utime_until
+        self.total_weight = total_weight
+        self.pubkeys = pubkeys
+        self.adnl_addrs = adnl_addrs
+        self.weights = weights
+        self.index = {pubkey: i for i, pubkey in enumerate(pubkeys)}
+
+    def __len__(self):
+        return len(self.pubkeys)
+
+    def adnl_addr(self, pubkey):
+        i = self.index.get(pubkey)
+        return None if i is None else self.adnl_addrs[i]
+
+    def validator(self, i):
+        return {
+            "adnl_addr": self.adnl_addrs[i],
+            "pubkey": self.pubkeys[i],
+            "weight": self.weights[i],
+            "index": i
+        }
+
+    def validators(self):
+        return [self.validator(i) for i in range(len(self.pubkeys))]
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "utime_since": self.utime_since,
+            "utime_until": self.utime_until,
+            "total_weight": self.total_weight,
+            "validators": self.validators()
+        }
+
+VSET_TOTAL = re.compile(r'total:(\d+)')
+VSET_UTIME_SINCE = re.compile(r'utime_since:(\d+)')
+VSET_UTIME_UNTIL = re.compile(r'utime_until:(\d+)')
+VSET_TOTAL_WEIGHT = re.compile(r'total_weight:(\d+)')
+VSET_VALIDATOR = re.compile(r'pubkey:x([0-9A-Fa-f]{64})\)\s+weight:(\d+)(?:\s+adnl_addr:x([0-9A-Fa-f]{64}))?')
+
+def parse_validator_set(text):
+    """Validator set from `getconfig 32/34/36` output in one pass over the text."""
+    pubkeys, adnl_addrs, weights = [], [], []
+    for match in VSET_VALIDATOR.finditer(text):
+        pubkey, weight, adnl_addr = match.groups()
+        pubkeys.append(pubkey)
+        adnl_addrs.append(adnl_addr)
+        weights.append(int(weight))
+    return ValidatorSet(int(VSET_TOTAL.search(text).group(1)),
+                        int(VSET_UTIME_SINCE.search(text).group(1)),
+                        int(VSET_UTIME_UNTIL.search(text).group(1)),
+                        int(VSET_TOTAL_WEIGHT.search(text).group(1)),
+                        pubkeys, adnl_addrs, weights)
+
+def parse_complaints_list(complaints_raw, val_set):
+
+    election_id = val_set.utime_since
+    total_weight = val_set.total_weight
+    complaints = []
+    for complaint in complaints_raw:
+        if len(complaint) == 0:
+            continue
+        chash = complaint[0]
+        subdata = complaint[1]
+
+        # Create dict
+        # parser from: https://github.com/ton-blockchain/ton/blob/dab7ee3f9794db5a6d32c895dbc2564f681d9126/crypto/smartcont/elector-code.fc#L1149
+        item = dict()
+        buff = subdata[0] # *complaint*
+        item["election_id"] = election_id
+        item["hash"] = str(chash)
+        pubkey = Dec2HexAddr(buff[0]) # *validator_pubkey*
+        adnl = val_set.adnl_addr(pubkey)
+        item["pubkey"] = pubkey
+        item["adnl_addr"] = adnl
+        item["description"] = buff[1] # *description*
+        item["created_time"] = buff[2] # *created_at*
+        item["severity"] = buff[3] # *severity*
+        reward_addr = buff[4]
+        reward_addr = "-1:" + Dec2HexAddr(reward_addr)
+        reward_addr = HexAddr2Base64Addr(reward_addr)
+        item["reward_addr"] = reward_addr # *reward_addr*
+        item["paid"] = buff[5] # *paid*
+        item["suggested_fine"] = buff[6] # *suggested_fine*
+        item["suggested_fine_part"] = buff[7] # *suggested_fine_part*
+        voted_validators = subdata[1] # *voters_list*
+        item["voted_validators"] = voted_validators
+        item["vset_id"] = str(subdata[2]) # *vset_id*
+        weight_remaining = subdata[3] # *weight_remaining*
+        required_weight = total_weight * 2 / 3
+        if len(voted_validators) == 0:
+            weight_remaining = required_weight
+        available_weight = required_weight - weight_remaining
+        item["weight_remaining"] = weight_remaining
+        item["approved_percent"] = round(available_weight / total_weight * 100, 3)
+        item["is_passed"] = (weight_remaining < 0)
+        pseudohash = pubkey + str(election_id)
+        item["pseudohash"] = pseudohash
+        complaints.append(item)
+
+    return complaints
+
+# Run `participant_list_extended` this many seconds before the election closes
+ELECTION_CLOSE_THRESHOLD = 10
+
+def parse_election(election_id, participants_info, finished):
+    """Election document from `participant_list_extended` result of the elector."""
+    elect_at = int(participants_info[0])
+    elect_close = int(participants_info[1])
+    min_stake = int(participants_info[2])
+    total_stake = int(participants_info[3])
+    participant_list_raw = participants_info[4]
+    # failed = bool(participants_info[5])
+    # finished = bool(participants_info[6])
+
+    if elect_at != election_id:
+        raise Exception(f'Inconsistency error: election_id={election_id}, elect_at={elect_at}')
+
+    participant_list = []
+    for participant_raw in participant_list_raw:
+        wallet_address = participant_raw[1][2]
+        wallet_address = "-1:" + Dec2HexAddr(wallet_address)
+        wallet_address = HexAddr2Base64Addr(wallet_address)
+        participant_list.append({
+            'pubkey': Dec2HexAddr(participant_raw[0]),
+            'stake': participant_raw[1][0],
+            'max_factor': participant_raw[1][1],
+            'wallet_address': wallet_address,
+            'adnl_addr': Dec2HexAddr(participant_raw[1][3])
+        })
+
+    return {
+        'election_id': election_id,
+        'elect_close': elect_close,
+        'min_stake': min_stake,
+        'total_stake': total_stake,
+        'participants_list': participant_list,
+        'finished': finished
+    }
+
+def set_complaints_wallet_address(complaints, participants_list):
+    wallets = {participant['pubkey']: participant['wallet_address'] for participant in participants_list}
+    for complaint in complaints:
+        complaint['wallet_address'] = wallets.get(complaint['pubkey'])
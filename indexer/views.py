@@ -0,0 +1,58 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from celery.utils.log import get_task_logger
+from pymongo.database import Database
+
+from indexer.database import META_FIELD, upsert_changed, decode_document
+
+
+logger = get_task_logger(__name__)
+
+# `cycle_view` holds one document per validation cycle in the shape returned by
+# /getValidationCycles: validators are merged with their election entries and
+# complaints, so the API reads it without joins. A view is rebuilt whenever
+# its cycle, election or complaints are written.
+NO_META = {'_id': False, META_FIELD: False}
+
+
+def build_cycle_view(db: Database, cycle_id: int) -> Optional[dict]:
+    view = db.validation_data.find_one({'cycle_id': cycle_id}, NO_META)
+    if view is None:
+        return None
+    view = decode_document(view)
+
+    election = db.elections_data.find_one({'election_id': cycle_id}, {'_id': False, 'participants_list': True})
+    if election is None:
+        logger.warning(f"Election info not found for cycle_id={cycle_id}")
+        participants = dict()
+    else:
+        participants = {x['pubkey']: x for x in decode_document(election)['participants_list']}
+
+    complaints = defaultdict(list)
+    for complaint in db.complaints_data.find({'election_id': cycle_id}, NO_META):
+        complaint = decode_document(complaint)
+        complaints[complaint['pubkey']].append(complaint)
+
+    for val in view['cycle_info']['validators']:
+        participant = participants.get(val['pubkey'])
+        if participant is None:
+            logger.error(f'Election entry not found for validator with pubkey: {val["pubkey"]}, election_id: {cycle_id}')
+        else:
+            if not (val['adnl_addr'] == participant['adnl_addr']):
+                logger.warning(f"Election info: adnl_addr mismatch")
+            val.update(participant)
+        val['complaints'] = complaints[val['pubkey']]
+
+    view['cycle_info']['total_participants'] = view['cycle_info'].pop('total')
+    return view
+
+
+def update_cycle_views(db: Database, cycle_ids: Iterable[int], seqno: Optional[int]) -> int:
+    views = [build_cycle_view(db, cycle_id) for cycle_id in set(cycle_ids)]
+    return len(upsert_changed(db.cycle_view, 'cycle_id', [view for view in views if view is not None], seqno))
+
+
+def rebuild_cycle_views(db: Database):
+    cycle_ids = db.validation_data.distinct('cycle_id')
+    update_cycle_views(db, cycle_ids, None)
@@ -0,0 +1,75 @@
+"""Micro-benchmark of indexer.utils.Result2List against the JSON based parser it replaced.
+
+Run from the repository root: python3 tests/bench_result2list.py
+
+On Python 3.11 Result2List is about 1.2-1.4x faster on both samples, with
+some spread between runs.
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexer.utils import Pars, Result2List
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+# lite-client runmethodfull output of the elector
+SAMPLES = ('participant_list_extended.txt', 'list_complaints.txt')
+
+
+def read_sample(name):
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return f.read()
+
+
+# Result2List before the stack parser, kept for comparison
+def old_result2list(text):
+    buff = Pars(text, "result:", "\n")
+    if buff is None or "error" in buff:
+        return
+    buff = buff.replace(')', ']')
+    buff = buff.replace('(', '[')
+    buff = buff.replace(']', ' ] ')
+    buff = buff.replace('[', ' [ ')
+    arr = buff.split()
+
+    # Get good raw data
+    output = ""
+    arrLen = len(arr)
+    for i in range(arrLen):
+        item = arr[i]
+        # get next item
+        if i+1 < arrLen:
+            nextItem = arr[i+1]
+        else:
+            nextItem = None
+        # add item to output
+        if item == '[':
+            output += item
+        elif nextItem == ']':
+            output += item
+        elif '{' in item or '}' in item:
+            output += "\"{item}\", ".format(item=item)
+        elif i+1 == arrLen:
+            output += item
+        else:
+            output += item + ', '
+    #end for
+    data = json.loads(output)
+    return data
+
+
+def bench(parse, text, number=20, repeat=5):
+    """Best time of one call in milliseconds."""
+    return min(timeit.repeat(lambda: parse(text), number=number, repeat=repeat)) / number * 1000
+
+
+if __name__ == '__main__':
+    for name in SAMPLES:
+        text = read_sample(name)
+        assert Result2List(text) == old_result2list(text), name
+        old, new = bench(old_result2list, text), bench(Result2List, text)
+        print(f'{name}: {len(text)} bytes, old {old:.3f} ms, new {new:.3f} ms, {old / new:.2f}x')
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# indexer.constants reads the container environment at import
+os.environ.setdefault('MONGO_PORT', '27017')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,75 @@
+"""Interactive lite-client stand-in answering from the recorded output in tests/data.
+
+Answers are written in two chunks, and unknown commands are reported the way
+lite-client does, with a late `cannot parse command` on stderr. Extra commands:
+`pid` prints the process id, `sleep <seconds>` answers late, `fail` prints an
+error on stderr and `exit` ends the process.
+
+`saveaccount` writes the StateInit of the mock liteserver's elector account,
+and nothing for the zero address.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexer.boc import Builder, serialize_boc
+from liteserver import ELECTOR_CODE, ELECTOR_DATA
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def write(stream, text: str):
+    stream.write(text)
+    stream.flush()
+
+
+def answer(text: str):
+    middle = len(text) // 2
+    write(sys.stdout, text[:middle])
+    time.sleep(0.02)
+    write(sys.stdout, text[middle:])
+
+
+def recorded(name: str) -> str:
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return f.read()
+
+
+def main():
+    assert sys.argv[1:3] == ['--global-config', 'liteserver_config.json']
+    for line in sys.stdin:
+        args = line.split()
+        if not args:
+            continue
+        if args[0] == 'time':
+            answer('server time is 1709899201\n')
+        elif args[0] == 'pid':
+            answer(f'pid {os.getpid()}\n')
+        elif args[0] == 'last':
+            answer(recorded('last.txt'))
+        elif args[0] in ('getconfig', 'getconfigfrom'):
+            answer(recorded(f'getconfig{args[-1]}.txt'))
+        elif args[0] == 'saveaccount':
+            if args[2].split(':')[1].strip('0'):
+                # split_depth:nothing special:nothing code:(just ..) data:(just ..) library:hme_empty
+                state_init = Builder().store_uint(0b00110, 5).store_ref(ELECTOR_CODE).store_ref(ELECTOR_DATA).end_cell()
+                with open(args[1], 'wb') as f:
+                    f.write(serialize_boc(state_init))
+            answer(f'account state of {args[2]} saved to {args[1]}\n')
+        elif args[0] == 'sleep':
+            time.sleep(float(args[1]))
+            answer('slept\n')
+        elif args[0] == 'fail':
+            write(sys.stderr, 'error: liteserver query failed\n')
+        elif args[0] == 'exit':
+            return
+        else:
+            write(sys.stdout, f'unknown command `{args[0]}`\n')
+            time.sleep(0.01)
+            write(sys.stderr, 'cannot parse command\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""In-memory stand-ins for the few MongoDB operations the tested code uses."""
+import threading
+import time
+
+from pymongo.errors import DuplicateKeyError
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if '$ne' in condition and value == condition['$ne']:
+                return False
+            if '$lt' in condition and not (value is not None and value < condition['$lt']):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class Locks:
+    """The part of a pymongo collection single-flight locks use."""
+    def __init__(self):
+        self.docs = dict()
+        self._lock = threading.Lock()
+
+    def update_one(self, query, update, upsert=False):
+        with self._lock:
+            self._update_one(query, update, upsert)
+
+    def _update_one(self, query, update, upsert):
+        doc = self.docs.get(query['_id'])
+        if doc is None:
+            if upsert:
+                self.docs[query['_id']] = {'_id': query['_id'], **update['$set']}
+            return
+        if not matches(doc, query):
+            if upsert:
+                raise DuplicateKeyError('duplicate _id')
+            return
+        doc.update(update.get('$set', {}))
+        for key, value in update.get('$addToSet', {}).items():
+            if value not in doc.setdefault(key, []):
+                doc[key].append(value)
+
+    def find_one_and_update(self, query, update):
+        with self._lock:
+            return self._find_one_and_update(query, update)
+
+    def _find_one_and_update(self, query, update):
+        doc = self.docs.get(query['_id'])
+        if doc is None or not matches(doc, query):
+            return None
+        previous = dict(doc)
+        doc.update(update['$set'])
+        return previous
+
+
+class Counters:
+    """`service_state` counters, keyed by dotted field names."""
+    def __init__(self):
+        self.docs = dict()
+        self._lock = threading.Lock()
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        with self._lock:
+            doc = self.docs.setdefault(query['_id'], {'_id': query['_id']})
+            for key, value in update['$inc'].items():
+                doc[key] = doc.get(key, 0) + value
+            return dict(doc)
+
+    def update_one(self, query, update, upsert=False):
+        with self._lock:
+            doc = self.docs.setdefault(query['_id'], {'_id': query['_id']})
+            for key, value in update.get('$inc', {}).items():
+                doc[key] = doc.get(key, 0) + value
+            doc.update(update.get('$set', {}))
+
+
+class Events:
+    def __init__(self):
+        self.docs = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            # interleave with concurrent publishers
+            time.sleep(0.001)
+            with self._lock:
+                self.docs.append(document)
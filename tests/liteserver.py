@@ -0,0 +1,322 @@
+"""Asyncio liteserver answering lite_api queries over ADNL for tests.
+
+Answers are built from the lite-client output in tests/data, so the native
+client decodes the same chain state the LiteClient text parsers read.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from indexer import adnl
+from indexer.adnl import BlockIdExt, TlReader, tl_bytes
+from indexer.boc import Builder, Cell, serialize_boc
+from indexer.liteclient import BLOCK_ID_EXT
+from indexer.utils import Tlb2Json, Pars, parse_validator_set
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CONFIG_IDS = (1, 15, 16, 17, 32, 34)
+METHODS = ('participant_list_extended', 'list_complaints')
+
+
+def read_data(name: str) -> str:
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return f.read()
+
+
+def text_cell(text: str) -> Cell:
+    data = text.encode()
+    return Builder().store_uint(int.from_bytes(data, 'big'), 8 * len(data)).end_cell()
+
+
+# cells of the elector state printed as C{hash} in the recorded results
+DESCRIPTIONS = {repr(cell): cell for cell in (text_cell(f'complaint {i}') for i in range(16))}
+ELECTOR_CODE = text_cell('elector code')
+ELECTOR_DATA = text_cell('elector data')
+
+
+def block_id_ext() -> BlockIdExt:
+    return BlockIdExt.from_str(BLOCK_ID_EXT.search(read_data('last.txt')).group())
+
+
+def method_id(name: str) -> int:
+    return (binascii.crc_hqx(name.encode(), 0) & 0xffff) | 0x10000
+
+
+# Hashmap with every edge label stored as hml_long. The root node is stored in
+# `b` when given, the way a Hashmap field is stored inline.
+def build_hashmap(values: dict, n: int, b: Builder = None) -> Cell:
+    def node(keys, m, b=None):
+        length = 0
+        while length < m and len({(key >> (m - 1 - length)) & 1 for key in keys}) == 1:
+            length += 1
+        b = (b or Builder()).store_uint(0b10, 2).store_uint(length, m.bit_length())
+        b.store_uint((keys[0] >> (m - length)) & ((1 << length) - 1), length)
+        rest = m - length
+        if rest == 0:
+            values[keys[0]](b)
+        else:
+            b.store_ref(node([key for key in keys if not (key >> (rest - 1)) & 1], rest - 1))
+            b.store_ref(node([key for key in keys if (key >> (rest - 1)) & 1], rest - 1))
+        return b.end_cell()
+    # keys keep their high bits, the node works on their low m bits
+    return node(sorted(values), n, b)
+
+
+def store_grams(b: Builder, amount: dict):
+    b.store_uint(amount['len'], 4).store_uint(amount['value'], amount['len'] * 8)
+
+
+def config_param(config_id: int) -> Cell:
+    if config_id == 32:
+        # the recorded set in the older format, without total_weight
+        return validator_set(read_data('getconfig34.txt'), tag=0x11)
+    text = read_data(f'getconfig{config_id}.txt')
+    if config_id == 34:
+        return validator_set(text)
+    config = Tlb2Json(text[text.find('ConfigParam'):])
+    b = Builder()
+    if config_id == 1:
+        b.store_uint(int(config['elector_addr'][1:], 16), 256)
+    elif config_id == 15:
+        for value in config.values():
+            b.store_uint(value, 32)
+    elif config_id == 16:
+        for value in config.values():
+            b.store_uint(value, 16)
+    elif config_id == 17:
+        for key in ('min_stake', 'max_stake', 'min_total_stake'):
+            store_grams(b, config[key]['amount'])
+        b.store_uint(config['max_stake_factor'], 32)
+    return b.end_cell()
+
+
+def validator_set(text: str, tag: int = 0x12) -> Cell:
+    val_set = parse_validator_set(text)
+    b = Builder().store_uint(tag, 8).store_uint(val_set.utime_since, 32).store_uint(val_set.utime_until, 32)
+    b.store_uint(val_set.total, 16).store_uint(int(re.search(r'main:(\d+)', text).group(1)), 16)
+
+    def validator(i):
+        def store(b):
+            b.store_uint(0x73, 8).store_uint(0x8e81278a, 32).store_uint(int(val_set.pubkeys[i], 16), 256)
+            b.store_uint(val_set.weights[i], 64).store_uint(int(val_set.adnl_addrs[i], 16), 256)
+        return store
+    validators = {i: validator(i) for i in range(len(val_set))}
+    if tag == 0x11:
+        # validators#11 ... list:(Hashmap 16 ValidatorDescr)
+        return build_hashmap(validators, 16, b)
+    # validators_ext#12 ... total_weight:uint64 list:(HashmapE 16 ValidatorDescr)
+    b.store_uint(val_set.total_weight, 64)
+    return b.store_uint(1, 1).store_ref(build_hashmap(validators, 16)).end_cell()
+
+
+def config_proof(config_ids) -> bytes:
+    params = {i: (lambda cell: lambda b: b.store_ref(cell))(config_param(i)) for i in config_ids if i in CONFIG_IDS}
+    config = build_hashmap(params, 32)
+    extra = Builder().store_uint(0xcc26, 16).store_uint(0, 1).store_uint(int('55' * 32, 16), 256).store_ref(config).end_cell()
+    pruned = Cell(bytes([1, 1]) + b'\x00' * 34, 8 * 36, [], True)
+    state = Builder().store_uint(0x9023afe2, 32).store_ref(pruned).store_ref(pruned).store_ref(pruned).store_ref(extra).end_cell()
+    return serialize_boc(Cell(bytes([3]) + state.hash() + b'\x00\x00', 8 * 35, [state], True))
+
+
+# VM stack of a recorded result line: `[ ... ]` are tuples, `( ... )` lisp lists
+STACK_TOKEN = re.compile(r'[A-Za-z]*\{[^{}]*\}|[\[\]()]|[^\s\[\]()]+')
+
+
+def parse_stack(text: str):
+    stack, current = [], []
+    for token in STACK_TOKEN.findall(Pars(text, 'result:', '\n')):
+        if token in '[(':
+            stack.append(current)
+            current = [token]
+        elif token in '])':
+            item = current
+            current = stack.pop()
+            current.append(('tuple' if item[0] == '[' else 'list', item[1:]))
+        elif token.startswith('C{'):
+            current.append(DESCRIPTIONS[token])
+        else:
+            current.append(int(token))
+    return current[0][1]
+
+
+def store_value(b: Builder, value):
+    if isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            b.store_uint(0x01, 8).store_int(value, 64)
+        else:
+            b.store_uint(0x0100, 15).store_int(value, 257)
+    elif isinstance(value, Cell):
+        b.store_uint(0x03, 8).store_ref(value)
+    elif value[0] == 'list':
+        # pairs of an item and the rest of the list, built from the end
+        tail = Builder().store_uint(0x00, 8).end_cell()
+        for item in reversed(value[1][1:]):
+            tail = Builder().store_uint(0x07, 8).store_uint(2, 16).store_ref(value_cell(item)).store_ref(tail).end_cell()
+        if value[1]:
+            b.store_uint(0x07, 8).store_uint(2, 16).store_ref(value_cell(value[1][0])).store_ref(tail)
+        else:
+            b.store_uint(0x00, 8)
+    else:
+        items = value[1]
+        b.store_uint(0x07, 8).store_uint(len(items), 16)
+        store_tuple(b, items)
+
+
+def store_tuple(b: Builder, items):
+    # VmTuple: head is a VmTupleRef of the first n - 1 items, tail a ref to the last one
+    if not items:
+        return
+    if len(items) == 2:
+        b.store_ref(value_cell(items[0]))
+    elif len(items) > 2:
+        head = Builder()
+        store_tuple(head, items[:-1])
+        b.store_ref(head.end_cell())
+    b.store_ref(value_cell(items[-1]))
+
+
+def value_cell(value) -> Cell:
+    b = Builder()
+    store_value(b, value)
+    return b.end_cell()
+
+
+def stack_boc(values) -> bytes:
+    rest = Builder().end_cell()
+    for value in values[:-1]:
+        b = Builder().store_ref(rest)
+        store_value(b, value)
+        rest = b.end_cell()
+    b = Builder().store_uint(len(values), 24)
+    if values:
+        b.store_ref(rest)
+        store_value(b, values[-1])
+    return serialize_boc(b.end_cell())
+
+
+def account_state(balance: int) -> bytes:
+    """Account BoC with the balance in the root cell and code and data in its refs."""
+    return serialize_boc(Builder().store_uint(balance, 64).store_ref(ELECTOR_CODE).store_ref(ELECTOR_DATA).end_cell())
+
+
+class LiteServer:
+    """Liteserver on 127.0.0.1 in a background event loop.
+
+    `queries` lists the name and arguments of every query received. The
+    answers to the first `hold` queries are sent together in reverse order,
+    after the last of them arrives.
+    """
+    def __init__(self, hold: int = 0):
+        self.hold = hold
+        self.queries = []
+        self.connections = 0
+        self.balance = 10 ** 15
+        self._held = []
+        self._private_key = X25519PrivateKey.generate()
+        public_key = self._private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+        self.key = adnl._x25519_to_ed25519(public_key)
+        self.block = block_id_ext()
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+
+    def start(self, config_path: str):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, '127.0.0.1', 0), self._loop).result()
+        port = self._server.sockets[0].getsockname()[1]
+        with open(config_path, 'w') as f:
+            json.dump({'liteservers': [{'ip': 0x7f000001, 'port': port,
+                                        'id': {'@type': 'pub.ed25519', 'key': base64.b64encode(self.key).decode()}}]}, f)
+
+    def stop(self):
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def answer(self, query: bytes) -> bytes:
+        reader = TlReader(query)
+        constructor = reader.read(4)
+        if constructor == adnl.LS_GET_MASTERCHAIN_INFO:
+            self.queries.append(('getMasterchainInfo',))
+            return adnl.LS_MASTERCHAIN_INFO + self.block.serialize() + b'\x00' * 32 + b'\x00' * 68
+        if constructor == adnl.LS_LOOKUP_BLOCK:
+            reader.int()
+            reader.read(16)
+            utime = reader.int()
+            self.queries.append(('lookupBlock', utime))
+            return adnl.LS_BLOCK_HEADER + self.block.serialize() + struct.pack('<I', 0) + tl_bytes(b'')
+        if constructor == adnl.LS_GET_CONFIG_PARAMS:
+            reader.int()
+            block = reader.block_id_ext()
+            config_ids = [reader.int() for _ in range(reader.int())]
+            self.queries.append(('getConfigParams', block, config_ids))
+            return (adnl.LS_CONFIG_INFO + struct.pack('<I', 0) + block.serialize()
+                    + tl_bytes(b'') + tl_bytes(config_proof(config_ids)))
+        if constructor == adnl.LS_RUN_SMC_METHOD:
+            reader.int()
+            block = reader.block_id_ext()
+            reader.read(36)
+            name = {method_id(name): name for name in METHODS}.get(reader.long())
+            self.queries.append(('runSmcMethod', block, name))
+            if name is None:
+                return adnl.LS_ERROR + struct.pack('<i', 400) + tl_bytes(b'unknown method')
+            return (adnl.LS_RUN_METHOD_RESULT + struct.pack('<i', 4) + block.serialize() + block.serialize()
+                    + struct.pack('<i', 0) + tl_bytes(stack_boc(parse_stack(read_data(f'{name}.txt')))))
+        if constructor == adnl.LS_GET_ACCOUNT_STATE:
+            block = reader.block_id_ext()
+            workchain, account = struct.unpack('<i', reader.read(4))[0], reader.read(32)
+            self.queries.append(('getAccountState', block, f'{workchain}:{account.hex().upper()}'))
+            return (adnl.LS_ACCOUNT_STATE + block.serialize() + block.serialize()
+                    + tl_bytes(b'') + tl_bytes(b'') + tl_bytes(account_state(self.balance)))
+        return adnl.LS_ERROR + struct.pack('<i', 400) + tl_bytes(b'unknown query')
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        handshake = await reader.readexactly(256)
+        assert handshake[:32] == hashlib.sha256(adnl.PUB_ED25519 + self.key).digest()
+        client_key, checksum = handshake[32:64], handshake[64:96]
+        shared = self._private_key.exchange(X25519PublicKey.from_public_bytes(adnl._ed25519_to_x25519(client_key)))
+        params = adnl._aes_ctr(shared[0:16] + checksum[16:32], checksum[0:4] + shared[20:32]).update(handshake[96:])
+        assert hashlib.sha256(params).digest() == checksum
+        encryptor = adnl._aes_ctr(params[0:32], params[64:80])
+        decryptor = adnl._aes_ctr(params[32:64], params[80:96])
+
+        def send(payload):
+            nonce = os.urandom(32)
+            packet = nonce + payload + hashlib.sha256(nonce + payload).digest()
+            writer.write(encryptor.update(struct.pack('<I', len(packet)) + packet))
+
+        send(b'')
+        while True:
+            try:
+                length = struct.unpack('<I', decryptor.update(await reader.readexactly(4)))[0]
+                packet = decryptor.update(await reader.readexactly(length))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+                return
+            assert hashlib.sha256(packet[:-32]).digest() == packet[-32:]
+            message = TlReader(packet[32:-32])
+            assert message.read(4) == adnl.ADNL_QUERY
+            query_id = message.read(32)
+            query = TlReader(message.bytes())
+            assert query.read(4) == adnl.LS_QUERY
+            answer = adnl.ADNL_ANSWER + query_id + tl_bytes(self.answer(query.bytes()))
+            if len(self._held) < self.hold:
+                self._held.append(answer)
+                if len(self._held) == self.hold:
+                    for held in reversed(self._held):
+                        send(held)
+                continue
+            send(answer)
@@ -0,0 +1,45 @@
+from indexer.liteclient import ConfigCache, SqliteConfigCache
+from indexer.singleflight import record_task_run, METRICS_ID
+
+from fakes import Counters
+
+
+BLOCK = '(-1,8000000000000000,100):AA:BB'
+
+
+class Database:
+    def __init__(self):
+        self.service_state = Counters()
+
+
+def test_taken_stats_are_counted_once():
+    cache = ConfigCache([15])
+    cache.get(15, BLOCK)
+    cache.put(15, BLOCK, {'validators_elected_for': 65536})
+    cache.get(15, BLOCK)
+    assert cache.take_stats() == {'hits': 1, 'misses': 1}
+    cache.get(15, BLOCK)
+    assert cache.take_stats() == {'hits': 1, 'misses': 0}
+    assert cache.stats() == {'hits': 2, 'misses': 1}
+
+
+def test_shared_stats_are_taken_by_one_process(tmp_path):
+    # two caches over one file stand for two worker processes of a host
+    first = SqliteConfigCache(str(tmp_path / 'cache.sqlite'), [15])
+    second = SqliteConfigCache(str(tmp_path / 'cache.sqlite'), [15])
+    first.get(15, BLOCK)
+    first.put(15, BLOCK, {'validators_elected_for': 65536})
+    second.get(15, BLOCK)
+    assert first.take_stats() == {'hits': 1, 'misses': 1}
+    assert second.take_stats() == {'hits': 0, 'misses': 0}
+    assert second.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_task_runs_record_config_cache_stats():
+    db = Database()
+    record_task_run(db, 'update_elections', config_cache={'hits': 3, 'misses': 1})
+    record_task_run(db, 'update_complaints', config_cache={'hits': 2, 'misses': 0})
+    metrics = db.service_state.docs[METRICS_ID]
+    assert metrics['config_cache.hits'] == 5
+    assert metrics['config_cache.misses'] == 1
+    assert metrics['tasks.update_elections.runs'] == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from indexer.database import META_FIELD, confirm_changed, upsert_changed
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def election(stake):
+    return {'election_id': 1, 'participants_list': [{'pubkey': 'AA' * 32, 'stake': stake}]}
+
+
+def test_unconfirmed_documents_keep_the_confirmed_version():
+    collection = mongomock.MongoClient().db.elections_data
+    assert upsert_changed(collection, 'election_id', [election(1)], 10) == [1]
+    assert collection.find_one()[META_FIELD]['fingerprint'] is not None
+
+    # a run whose derived writes failed leaves the new version unconfirmed
+    previous = dict()
+    assert upsert_changed(collection, 'election_id', [election(2)], 11, previous, confirm=False) == [1]
+    assert previous[1]['participants_list'][0]['stake'] == 1
+
+    # so the next run writes it again, and compares with the confirmed version
+    previous = dict()
+    updated = upsert_changed(collection, 'election_id', [election(2)], 12, previous, confirm=False)
+    assert updated == [1]
+    assert previous[1] == election(1)
+
+    confirm_changed(collection, 'election_id', [election(2)], updated)
+    assert 'previous' not in collection.find_one()[META_FIELD]
+    assert upsert_changed(collection, 'election_id', [election(2)], 13, dict(), confirm=False) == []
+
+
+def test_new_unconfirmed_documents_have_no_previous_version():
+    collection = mongomock.MongoClient().db.elections_data
+    previous = dict()
+    upsert_changed(collection, 'election_id', [election(1)], 10, previous, confirm=False)
+    upsert_changed(collection, 'election_id', [election(1)], 10, previous, confirm=False)
+    assert previous == {}
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from indexer.events import publish_events
+
+from fakes import Counters, Events, Locks
+
+
+class Database:
+    def __init__(self):
+        self.task_locks = Locks()
+        self.service_state = Counters()
+        self.events = Events()
+
+
+def test_seq_follows_insertion_order_across_publishers():
+    db = Database()
+    batches = [[{'type': 'complaint', 'event': 'complaint_added', 'election_id': i, 'n': n} for n in range(5)]
+               for i in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda batch: publish_events(db, batch, 100), batches))
+
+    assert [event['seq'] for event in db.events.docs] == list(range(1, 41))
+    # events of one batch stay together and in order
+    for i in range(0, 40, 5):
+        assert [event['n'] for event in db.events.docs[i:i + 5]] == list(range(5))
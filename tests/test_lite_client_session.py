@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from indexer.liteclient import LiteClient, LiteClientException, LiteClientSession, LiteClientSessionPool, account_data_fingerprint
+
+from liteserver import account_state, read_data
+
+
+FAKE_LITE_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_lite_client.py')
+ELECTOR = '-1:3333333333333333333333333333333333333333333333333333333333333333'
+
+
+@pytest.fixture
+def binary(tmp_path):
+    path = tmp_path / 'lite-client'
+    path.write_text(f'#!/bin/sh\nexec {sys.executable} {FAKE_LITE_CLIENT} "$@"\n')
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def session(binary):
+    session = LiteClientSession(binary, 'liteserver_config.json')
+    session.start(5)
+    yield session
+    session.close()
+
+
+def pid(session):
+    return int(session.execute('pid', 5).split()[1])
+
+
+def test_output_is_split_by_command(session):
+    # each answer arrives in two chunks, and the trailing noise of the
+    # marker command of one command must not reach the next
+    for _ in range(3):
+        assert session.execute('last', 5) == read_data('last.txt')
+        assert session.execute('getconfig 15', 5) == read_data('getconfig15.txt')
+    assert 'unknown command' not in session.execute('getconfig 34', 5)
+
+
+def test_error_output_raises(session):
+    with pytest.raises(LiteClientException, match='liteserver query failed'):
+        session.execute('fail', 5)
+
+
+def test_timeout(session):
+    with pytest.raises(LiteClientException, match='timeout'):
+        session.execute('sleep 5', 0.3)
+
+
+def test_exited_process(session):
+    with pytest.raises(LiteClientException, match='terminated'):
+        session.execute('exit', 5)
+    session.process.wait(5)
+    assert not session.is_alive()
+
+
+def test_pool_kills_session_after_timeout(binary):
+    pool = LiteClientSessionPool(binary, 'liteserver_config.json', size=1, start_timeout=5)
+    try:
+        with pool.session(5) as session:
+            first = session
+        with pytest.raises(LiteClientException, match='timeout'):
+            with pool.session(5) as session:
+                assert session is first
+                session.execute('sleep 5', 0.3)
+        assert first.process is None
+        with pool.session(5) as session:
+            assert session is not first
+            assert session.execute('last', 5) == read_data('last.txt')
+    finally:
+        pool.close()
+
+
+def test_pool_restarts_exited_process(binary):
+    pool = LiteClientSessionPool(binary, 'liteserver_config.json', size=1, start_timeout=5)
+    try:
+        with pool.session(5) as session:
+            first = pid(session)
+            session.process.kill()
+            session.process.wait(5)
+        with pool.session(5) as session:
+            assert pid(session) != first
+    finally:
+        pool.close()
+
+
+def test_pool_is_shared_by_threads(binary):
+    client = LiteClient(binary, 'liteserver_config.json', pool_size=2)
+    pids, errors = set(), []
+
+    def work():
+        try:
+            for config_id in (1, 15, 16, 17):
+                assert client._run(f'getconfig {config_id}', timeout=5) == read_data(f'getconfig{config_id}.txt')
+            pids.add(int(client._run('pid', timeout=5).split()[1]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert 1 <= len(pids) <= 2
+        assert client.get_config(15)['validators_elected_for'] > 0
+    finally:
+        client.close()
+
+
+def test_account_data_fingerprint(binary):
+    # the saved StateInit has the code and data refs of the Account the native backend hashes
+    client = LiteClient(binary, 'liteserver_config.json')
+    try:
+        fingerprint = client.get_account_data_fingerprint(ELECTOR)
+        assert fingerprint == account_data_fingerprint(account_state(10 ** 9))
+        assert client.get_account_data_fingerprint(ELECTOR, client.get_last_block()) == fingerprint
+        with pytest.raises(LiteClientException, match='does not exist'):
+            client.get_account_data_fingerprint('-1:' + '0' * 64)
+    finally:
+        client.close()
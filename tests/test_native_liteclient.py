@@ -0,0 +1,188 @@
+import re
+
+import pytest
+
+from indexer import adnl
+from indexer.adnl import BlockIdExt, account_data_fingerprint
+from indexer.boc import deserialize_boc, parse_vm_stack
+from indexer.liteclient import LiteClient, LiteClientException, NativeLiteClient
+from indexer.utils import parse_election
+
+from liteserver import LiteServer, account_state, read_data, stack_boc
+
+
+ELECTOR = '-1:3333333333333333333333333333333333333333333333333333333333333333'
+
+
+class RecordedLiteClient(LiteClient):
+    """LiteClient reading lite-client output recorded in tests/data."""
+    def __init__(self):
+        super().__init__('lite-client', 'liteserver_config.json')
+        self.commands = []
+
+    def _run(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        args = cmd.split()
+        if args[0] == 'last':
+            return read_data('last.txt')
+        if args[0] in ('getconfig', 'getconfigfrom'):
+            return read_data(f'getconfig{args[-1]}.txt')
+        if args[0] == 'runmethodfull':
+            return read_data(f'{args[3]}.txt')
+        raise AssertionError(f'No recorded output for {cmd}')
+
+
+@pytest.fixture
+def liteserver(tmp_path):
+    server = LiteServer()
+    server.start(str(tmp_path / 'liteserver_config.json'))
+    yield server
+    server.stop()
+
+
+class RawLiteServer(LiteServer):
+    """LiteServer replaying the raw answers in tests/data.
+
+    They were built with pytoniq-core's TL, cell and BoC encoders, not with
+    the ones of this liteserver, from the same recorded lite-client output.
+    """
+    def answer(self, query: bytes) -> bytes:
+        constructor = query[:4]
+        if constructor == adnl.LS_GET_CONFIG_PARAMS:
+            return bytes.fromhex(read_data('config_info_34.hex'))
+        if constructor == adnl.LS_RUN_SMC_METHOD:
+            return bytes.fromhex(read_data('run_method_result_list_complaints.hex'))
+        return super().answer(query)
+
+
+@pytest.fixture
+def native(liteserver, tmp_path):
+    client = NativeLiteClient(str(tmp_path / 'liteserver_config.json'), timeout=5)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def recorded():
+    return RecordedLiteClient()
+
+
+@pytest.fixture
+def block(recorded):
+    return recorded.get_last_block()
+
+
+def test_last_block(native, recorded, liteserver):
+    assert native.get_last_block() == recorded.get_last_block()
+    assert liteserver.queries == [('getMasterchainInfo',)]
+
+
+@pytest.mark.parametrize('config_id', [1, 15, 16, 17])
+def test_config(native, recorded, liteserver, block, config_id):
+    assert native.get_config(config_id, block) == recorded.get_config(config_id, block)
+    assert liteserver.queries == [('getConfigParams', BlockIdExt.from_str(block), [config_id])]
+
+
+def test_unsupported_config(native, block):
+    with pytest.raises(LiteClientException, match='not supported'):
+        native.get_config(34, block)
+
+
+def test_config_17_and_elector_address(native, recorded, block):
+    assert native.get_config_17(block) == recorded.get_config_17(block)
+    assert native.get_elector_address(block) == recorded.get_elector_address(block) == ELECTOR
+
+
+def test_validator_set(native, recorded, block):
+    expected = recorded.get_validator_set(34, block)
+    val_set = native.get_validator_set(34, block)
+    assert len(expected) == 24
+    for field in ('total', 'utime_since', 'utime_until', 'total_weight', 'pubkeys', 'adnl_addrs', 'weights'):
+        assert getattr(val_set, field) == getattr(expected, field)
+    assert native.get_validators_list(34, block) == recorded.get_validators_list(34, block)
+
+
+def test_validator_set_without_total_weight(native, recorded, block):
+    # config 32 is served as validators#11, with the Hashmap stored inline
+    expected = recorded.get_validator_set(34, block)
+    val_set = native.get_validator_set(32, block)
+    for field in ('total', 'utime_since', 'utime_until', 'total_weight', 'pubkeys', 'adnl_addrs', 'weights'):
+        assert getattr(val_set, field) == getattr(expected, field)
+
+
+@pytest.mark.parametrize('method', ['participant_list_extended', 'list_complaints'])
+def test_run_method_full(native, recorded, liteserver, block, method):
+    result = native.run_method_full(ELECTOR, method, block=block)
+    assert result == recorded.run_method_full(ELECTOR, method, block=block)
+    assert liteserver.queries == [('runSmcMethod', BlockIdExt.from_str(block), method)]
+
+
+def test_participants_and_complaints(native, recorded, block):
+    election_id = int(re.search(r'result:\s+\[ (\d+)', read_data('participant_list_extended.txt')).group(1))
+    participants = native.run_method_full(ELECTOR, 'participant_list_extended', block=block)
+    assert (parse_election(election_id, participants, finished=True)
+            == parse_election(election_id, recorded.run_method_full(ELECTOR, 'participant_list_extended', block=block), finished=True))
+
+    complaints = native.get_complaints_list(34, block)
+    assert complaints == recorded.get_complaints_list(34, block)
+    # complaints on validators of the set get their ADNL address
+    assert len([c for c in complaints if c['adnl_addr']]) == 8
+    assert complaints[0]['description'].startswith('C{')
+
+
+def test_run_method_at_timestamp(native, recorded, liteserver, block):
+    result = native.run_method_full(ELECTOR, 'participant_list_extended', timestamp=1709909000)
+    assert result == recorded.run_method_full(ELECTOR, 'participant_list_extended', block=block)
+    assert liteserver.queries == [('lookupBlock', 1709909000), ('runSmcMethod', BlockIdExt.from_str(block), 'participant_list_extended')]
+
+
+def test_long_list_is_decoded():
+    # one nested pair per participant, deeper than the recursion limit allows
+    participants = [('tuple', [i, ('tuple', [10 ** 15, 196608, i, i])]) for i in range(600)]
+    stack = parse_vm_stack(deserialize_boc(stack_boc([('list', participants), ('tuple', [1, ('list', [])])]))[0])
+    assert stack == [[[i, [10 ** 15, 196608, i, i]] for i in range(600)], [1]]
+
+
+def test_account_data_fingerprint(native, liteserver, block):
+    fingerprint = native.get_account_data_fingerprint(ELECTOR, block)
+    assert fingerprint == account_data_fingerprint(account_state(liteserver.balance))
+    liteserver.balance += 10 ** 9
+    assert native.get_account_data_fingerprint(ELECTOR, block) == fingerprint
+    assert liteserver.queries[0] == ('getAccountState', BlockIdExt.from_str(block), ELECTOR)
+
+
+def test_queries_are_multiplexed(tmp_path, recorded, block):
+    # answers come back in reverse order, after all four queries were sent
+    server = LiteServer(hold=4)
+    server.start(str(tmp_path / 'liteserver_config.json'))
+    client = NativeLiteClient(str(tmp_path / 'liteserver_config.json'), timeout=5, max_in_flight=4)
+    try:
+        queries = [('get_config', 1), ('get_config', 15), ('get_config', 16), ('get_config', 17)]
+        results = client.snapshot(block).gather(*queries)
+        assert results == [recorded.get_config(config_id, block) for _, config_id in queries]
+        assert server.connections == 1
+        assert sorted(query[2] for query in server.queries) == [[1], [15], [16], [17]]
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_raw_answers(tmp_path, recorded, block):
+    server = RawLiteServer()
+    server.start(str(tmp_path / 'liteserver_config.json'))
+    client = NativeLiteClient(str(tmp_path / 'liteserver_config.json'), timeout=5)
+    try:
+        expected = recorded.get_validator_set(34, block)
+        val_set = client.get_validator_set(34, block)
+        for field in ('total', 'utime_since', 'utime_until', 'total_weight', 'pubkeys', 'adnl_addrs', 'weights'):
+            assert getattr(val_set, field) == getattr(expected, field)
+        assert val_set.utime_since == 1709852016
+        assert len(val_set) == 24
+
+        result = client.run_method_full(ELECTOR, 'list_complaints', [val_set.utime_since], block=block)
+        assert result == recorded.run_method_full(ELECTOR, 'list_complaints', block=block)
+        assert result[0][0][1][0][1] == 'C{6896E2E34E13E44604E6534AD2D49007E5AEFEC5FC543E007F0193B8DE2C1AE6}'
+        assert result[0][0][1][1] == [3, 9, 19]
+    finally:
+        client.close()
+        server.stop()
@@ -0,0 +1,66 @@
+import pytest
+
+import indexer.pipeline as pipeline
+from indexer.utils import ValidatorSet
+
+mongomock = pytest.importorskip('mongomock')
+
+
+CONFIG15 = {'validators_elected_for': 65536, 'elections_start_before': 32768, 'elections_end_before': 8192, 'stake_held_for': 32768}
+CONFIG16 = {'max_validators': 400, 'max_main_validators': 100, 'min_validators': 75}
+CONFIG17 = {'min_stake': 10 ** 13, 'max_stake': 10 ** 16, 'max_stake_factor': 196608}
+
+
+class Snapshot:
+    seqno = 100
+
+    def __init__(self, val_set):
+        self.val_set = val_set
+
+    def gather(self, *queries):
+        return [getattr(self, query[0])(*query[1:]) for query in queries]
+
+    def get_validators_list(self, config_id):
+        return self.val_set.to_dict()
+
+    def get_config(self, config_id):
+        return {15: CONFIG15, 16: CONFIG16}[config_id]
+
+    def get_config_17(self):
+        return CONFIG17
+
+
+def validator_set(weight=10):
+    return ValidatorSet(2, 1709852016, 1709917552, 2 * weight, ['AA' * 32, 'CC' * 32], ['BB' * 32, 'DD' * 32], [weight, weight])
+
+
+def data_version(db):
+    return (db.service_state.find_one({'_id': 'data_version'}) or {}).get('version', 0)
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError('write failed')
+
+
+def test_data_version_is_bumped_when_derived_writes_fail(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(pipeline, 'update_cycle_views', fail)
+    with pytest.raises(RuntimeError):
+        pipeline.run_stages(db, Snapshot(validator_set()), stages=(pipeline.index_validation_cycle,))
+    assert db.validation_data.count_documents({}) == 1
+    assert data_version(db) == 1
+
+
+def test_derived_writes_are_redone_after_a_failure(monkeypatch):
+    db = mongomock.MongoClient().db
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline, 'update_cycle_views', fail)
+        with pytest.raises(RuntimeError):
+            pipeline.run_stages(db, Snapshot(validator_set()), stages=(pipeline.index_validation_cycle,))
+    assert db.cycle_view.count_documents({}) == 0
+
+    # the cycle was written but not confirmed, so the next run writes its view
+    assert pipeline.run_stages(db, Snapshot(validator_set()), stages=(pipeline.index_validation_cycle,)) == 'Validators config updated'
+    assert db.cycle_view.count_documents({}) == 1
+    assert db.pubkey_cycles.count_documents({}) == 2
+    assert pipeline.run_stages(db, Snapshot(validator_set()), stages=(pipeline.index_validation_cycle,)) == 'Validators config did not change'
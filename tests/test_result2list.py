@@ -0,0 +1,84 @@
+import math
+import random
+
+import pytest
+
+from indexer.utils import Result2List
+
+from bench_result2list import SAMPLES, read_sample, old_result2list
+
+
+def result(line):
+    return f'arguments:  [ 1 ] \nresult:  {line} \nremote result (not to be trusted):  [ 1 ] \n'
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_recorded_results_match_old_parser(name):
+    text = read_sample(name)
+    assert Result2List(text) == old_result2list(text)
+
+
+@pytest.mark.parametrize('line', [
+    '[ 0 ]',
+    '[ -1 115792089237316195423570985008687907853269984665640564039457584007913129639935 ]',
+    '[ () ]',
+    '[ [] [ [ ] ] ]',
+    '[ (1 (2 3) [4]) -5 ]',
+    '[ ([1 [2 3 4 5]] [6 [7 8 9 10]]) 0 0 ]',
+    '[ C{F3483CBD1476FCE3A81012743AD8BAE50413F2186306875E236B5A70B699D12B} 1 ]',
+    '[ ([1 [[2 C{AB} 3] (4 5) 6 -7]]) ]',
+    '[ CS{AB} BC{CD} 1 ]',
+    '[ null 7 ]',
+])
+def test_matches_old_parser(line):
+    assert Result2List(result(line)) == old_result2list(result(line))
+
+
+def test_nan_matches_old_parser():
+    assert math.isnan(Result2List(result('[ NaN ]'))[0])
+    assert math.isnan(old_result2list(result('[ NaN ]'))[0])
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('[ CS{Cell{0123} bits: 0..267; refs: 0..0} C{AB} 1 ]', ['CS{Cell{0123} bits: 0..267; refs: 0..0}', 'C{AB}', 1]),
+    ('[ 1 C{AB} ]', [1, 'C{AB}']),
+    ('[ (CS{AB}) ]', [['CS{AB}']]),
+])
+def test_literals_the_old_parser_failed_on(line, expected):
+    # the old parser split slices on spaces and did not quote a literal closing a list
+    assert Result2List(result(line)) == expected
+    with pytest.raises(ValueError):
+        old_result2list(result(line))
+
+
+@pytest.mark.parametrize('text', ['arguments:  [ 1 ] \n', result('error: cannot run method')])
+def test_missing_result(text):
+    assert Result2List(text) is None
+    assert old_result2list(text) is None
+
+
+def random_value(rng, depth=0):
+    r = rng.random()
+    if depth < 4 and r < 0.2:
+        return '[' + ' '.join(random_value(rng, depth + 1) for _ in range(rng.randint(1, 4))) + ']'
+    if depth < 4 and r < 0.3:
+        return '(' + ' '.join(random_value(rng, depth + 1) for _ in range(rng.randint(1, 4))) + ')'
+    if r < 0.35:
+        return '()'
+    if r < 0.4:
+        return 'C{%064X}' % rng.getrandbits(256)
+    return str(rng.randint(-2 ** 256, 2 ** 256))
+
+
+def test_random_results_match_old_parser():
+    rng = random.Random(4)
+    compared = 0
+    for _ in range(2000):
+        text = result('[ ' + ' '.join(random_value(rng) for _ in range(rng.randint(0, 6))) + ' ]')
+        try:
+            expected = old_result2list(text)
+        except ValueError:
+            continue
+        assert Result2List(text) == expected
+        compared += 1
+    assert compared > 1000
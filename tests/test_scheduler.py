@@ -0,0 +1,93 @@
+from indexer import scheduler
+from indexer.boc import Builder, serialize_boc
+from indexer.liteclient import account_data_fingerprint
+from indexer.utils import ValidatorSet
+
+
+class ServiceState:
+    def __init__(self):
+        self.docs = dict()
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query['_id'], {'_id': query['_id']}).update(update['$set'])
+
+
+class Database:
+    def __init__(self):
+        self.service_state = ServiceState()
+
+
+CONFIG15 = {'validators_elected_for': 65536, 'elections_start_before': 32768, 'elections_end_before': 8192, 'stake_held_for': 32768}
+
+
+class Snapshot:
+    def __init__(self, chain):
+        self.chain = chain
+        self.seqno = chain['seqno']
+
+    def get_elector_address(self):
+        return '-1:' + '3' * 64
+
+    def get_config(self, config_id):
+        return CONFIG15
+
+    def get_validator_set(self, config_id):
+        return self.chain[config_id]
+
+    def gather(self, *queries):
+        return [getattr(self, query[0])(*query[1:]) if query[0] != 'get_account_data_fingerprint' else self.chain['elector']
+                for query in queries]
+
+
+class LiteClient:
+    def __init__(self, chain):
+        self.chain = chain
+
+    def snapshot(self):
+        return Snapshot(self.chain)
+
+
+def poll(db, chain):
+    db.service_state.docs.get(scheduler.STATE_ID, {})['next_poll_at'] = 0
+    dispatched = []
+    scheduler.poll(db, LiteClient(chain), dispatched.append)
+    return dispatched
+
+
+def make_chain(seqno, elector='A'):
+    cycle = ValidatorSet(1, 1000, 10 ** 10, 10, [], [], [])
+    return {'seqno': seqno, 'elector': elector, 32: None, 34: cycle, 36: None}
+
+
+def test_first_poll_dispatches_pipeline():
+    assert poll(Database(), make_chain(1)) == [scheduler.PIPELINE_TASK]
+
+
+def test_unchanged_elector_state_dispatches_nothing():
+    db = Database()
+    poll(db, make_chain(1))
+    for seqno in range(2, 10):
+        assert poll(db, make_chain(seqno)) == []
+
+
+def test_changed_inputs_dispatch_their_tasks():
+    db = Database()
+    poll(db, make_chain(1))
+    assert poll(db, make_chain(2, elector='B')) == ['indexer.tasks.update_elections', 'indexer.tasks.update_complaints']
+    chain = make_chain(3, elector='B')
+    chain[36] = ValidatorSet(1, 10 ** 10, 2 * 10 ** 10, 10, [], [], [])
+    assert poll(db, chain) == ['indexer.tasks.update_validation_cycle']
+
+
+def account_boc(balance, data):
+    code = Builder().store_uint(0xFF00, 16).end_cell()
+    data = Builder().store_uint(data, 32).end_cell()
+    return serialize_boc(Builder().store_uint(balance, 64).store_ref(code).store_ref(data).end_cell())
+
+
+def test_fingerprint_ignores_balance_and_lt():
+    assert account_data_fingerprint(account_boc(1, 7)) == account_data_fingerprint(account_boc(2, 7))
+    assert account_data_fingerprint(account_boc(1, 7)) != account_data_fingerprint(account_boc(1, 8))
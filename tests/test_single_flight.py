@@ -0,0 +1,103 @@
+import pytest
+
+import indexer.tasks as tasks
+from indexer.liteclient import LiteClientException
+
+from fakes import Locks
+
+
+class Database:
+    def __init__(self):
+        self.task_locks = Locks()
+
+
+class Request:
+    def __init__(self, task_id):
+        self.id = task_id
+        self.retries = 0
+
+
+class Task:
+    name = 'indexer.tasks.update_elections'
+    autoretry_for = (LiteClientException,)
+    max_retries = 2
+
+    def __init__(self, task_id='run-1'):
+        self.request = Request(task_id)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = Database()
+    sent = []
+    monkeypatch.setattr(tasks, 'get_database', lambda: db)
+    monkeypatch.setattr(tasks, 'queue_depth', lambda: None)
+    monkeypatch.setattr(tasks, 'record_task_run', lambda *args, **kwargs: None)
+    monkeypatch.setattr(tasks.app, 'send_task', lambda name, **kwargs: sent.append(name))
+    return db, sent
+
+
+def run(monkeypatch, task, body, *locks):
+    def update_elections():
+        return body()
+
+    monkeypatch.setattr(tasks, 'current_task', task)
+    return tasks.single_flight(*locks)(update_elections)()
+
+
+def test_overlapping_run_is_skipped_and_coalesced(monkeypatch, env):
+    db, sent = env
+    first = Task('run-1')
+
+    def body():
+        assert run(monkeypatch, Task('run-2'), lambda: 'second').endswith('run skipped')
+        assert run(monkeypatch, Task('run-3'), lambda: 'third').endswith('run skipped')
+        monkeypatch.setattr(tasks, 'current_task', first)
+        return 'first'
+
+    assert run(monkeypatch, first, body) == 'first'
+    assert sent == [Task.name]
+    assert db.task_locks.docs['update_elections']['owner'] is None
+
+
+def test_retried_run_keeps_lock(monkeypatch, env):
+    db, sent = env
+    task = Task('run-1')
+
+    def failing():
+        raise LiteClientException('timeout')
+
+    with pytest.raises(LiteClientException):
+        run(monkeypatch, task, failing)
+    assert db.task_locks.docs['update_elections']['owner'] == 'run-1'
+
+    # a run dispatched while the retry waits is coalesced into it
+    assert run(monkeypatch, Task('run-2'), failing).endswith('run skipped')
+    assert sent == []
+
+    task.request.retries = task.max_retries
+    with pytest.raises(LiteClientException):
+        run(monkeypatch, task, failing)
+    assert db.task_locks.docs['update_elections']['owner'] is None
+    assert sent == [Task.name]
+
+
+class PipelineTask(Task):
+    name = 'indexer.tasks.update_all'
+
+
+def test_pipeline_and_stage_tasks_share_locks(monkeypatch, env):
+    db, sent = env
+    stage = Task('stage-run')
+
+    def body():
+        # update_all needs the elections lock held by the stage task
+        assert run(monkeypatch, PipelineTask('pipeline-run'), lambda: 'all',
+                   'validation_cycle', 'elections', 'complaints').endswith('run skipped')
+        assert db.task_locks.docs['validation_cycle']['owner'] is None
+        monkeypatch.setattr(tasks, 'current_task', stage)
+        return 'elections'
+
+    assert run(monkeypatch, stage, body, 'elections') == 'elections'
+    assert sent == [PipelineTask.name]
+    assert all(lock['owner'] is None for lock in db.task_locks.docs.values())
@@ -0,0 +1,65 @@
+import pytest
+
+from indexer import storage
+
+
+PUBKEY = 'A1B2C3D4E5F60718293A4B5C6D7E8F90A1B2C3D4E5F60718293A4B5C6D7E8F90'
+WALLET = 'Ef8zMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzM0vF'
+
+
+def test_known_address_is_restored():
+    # elector address, the CRC16-XMODEM checksum is computed on decode
+    data = storage.encode_value('address', WALLET)
+    assert data == bytes([0x33] * 32)
+    assert storage.decode_value('address', data) == WALLET
+
+
+@pytest.mark.parametrize('kind, value', [
+    ('hex', PUBKEY),
+    ('hex', '00' * 32),
+    ('address', WALLET),
+    ('address', storage.decode_value('address', bytes(range(32)))),
+])
+def test_round_trip(kind, value):
+    data = storage.encode_value(kind, value)
+    assert isinstance(data, bytes) and len(data) == 32
+    assert storage.decode_value(kind, data) == value
+
+
+@pytest.mark.parametrize('kind, value', [
+    ('hex', PUBKEY.lower()),  # lower case would come back upper case
+    ('hex', PUBKEY[:-2]),
+    ('hex', 'Z' * 64),
+    ('address', 'not an address'),
+    ('address', WALLET.replace('Ef8', 'Uf8')),  # non-bounceable tag
+    ('address', WALLET[:-4] + 'AAAA'),  # wrong checksum
+    ('address', None),
+])
+def test_values_not_restorable_stay_strings(kind, value):
+    assert storage.encode_value(kind, value) is value
+
+
+def test_document_round_trip():
+    document = {'election_id': 1, 'participants_list': [{'pubkey': PUBKEY, 'adnl_addr': PUBKEY, 'wallet_address': WALLET, 'stake': 10}],
+                'reward_addr': WALLET, 'message': PUBKEY}
+    encoded = storage.encode_document(document)
+    assert encoded['participants_list'][0]['pubkey'] == bytes.fromhex(PUBKEY)
+    assert encoded['reward_addr'] == bytes([0x33] * 32)
+    assert encoded['message'] == PUBKEY
+    assert storage.decode_document(encoded) == document
+    assert storage.decode_document(document) == document
+
+
+@pytest.mark.parametrize('kind, value', [('hex', PUBKEY), ('address', WALLET)])
+def test_encodings_match_both_storage_forms(kind, value):
+    stored = [value, storage.encode_value(kind, value)]
+    assert storage.encodings(kind, value) == stored
+    assert storage.match(kind, value) == {'$in': stored}
+
+
+def test_encodings_of_lower_case_hex_match_binary_form():
+    assert storage.encodings('hex', PUBKEY.lower()) == [PUBKEY.lower(), bytes.fromhex(PUBKEY)]
+
+
+def test_encodings_of_invalid_value_is_the_value():
+    assert storage.encodings('address', 'not an address') == ['not an address']
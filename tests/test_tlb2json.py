@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from indexer.utils import Tlb2Json, parse_validator_set
+
+from liteserver import read_data
+
+
+# Tlb2Json before the single-pass parser, kept for comparison
+def old_tlb2json(text):
+    start = 0
+    end = len(text)
+    if '=' in text:
+        start = text.find('=')+1
+    if "x{" in text:
+        end = text.find("x{")
+    text = text[start:end]
+    text = text.strip()
+    text = text.replace('(', '{')
+    text = text.replace(')', '}')
+
+    buff = text
+    buff = buff.replace('\r', ' ')
+    buff = buff.replace('\n', ' ')
+    buff = buff.replace('\t', ' ')
+    buff = buff.replace('{', ' ')
+    buff = buff.replace('}', ' ')
+    buff = buff.replace(':', ' ')
+
+    buff2 = ""
+    itemList = list()
+    for item in list(buff):
+        if item == ' ':
+            if len(buff2) > 0:
+                itemList.append(buff2)
+                buff2 = ""
+            itemList.append(item)
+        else:
+            buff2 += item
+
+    i = 0
+    for item in itemList:
+        l = len(item)
+        if item == ' ':
+            pass
+        elif item.isdigit() is False:
+            c = '"'
+            item2 = c + item + c
+            text = text[:i] + item2 + text[i+l:]
+            i += 2
+        i += l
+
+    text = text.replace('{"', '{"_":"')
+
+    while True:
+        try:
+            data = json.loads(text)
+            break
+        except json.JSONDecodeError as err:
+            if "Expecting ',' delimiter" in err.msg:
+                text = text[:err.pos] + ',' + text[err.pos:]
+            elif "Expecting property name enclosed in double quotes" in err.msg:
+                text = text[:err.pos] + '"_":' + text[err.pos:]
+            else:
+                raise err
+    return data
+
+
+def config_text(config_id):
+    text = read_data(f'getconfig{config_id}.txt')
+    return text[text.find('ConfigParam'):]
+
+
+@pytest.mark.parametrize('config_id', [1, 15, 16, 17])
+def test_recorded_configs_match_old_parser(config_id):
+    assert Tlb2Json(config_text(config_id)) == old_tlb2json(config_text(config_id))
+
+
+@pytest.mark.parametrize('text', [
+    'ConfigParam(1) = ( elector_addr:x3333)',
+    '(x 1 2)',
+    '(cons 1 x:2)',
+    '(a b:(c 3 d:4) 5)',
+    '(a b:(c d:(e f:1)) g:(h))',
+    '(a (b c:1) 2)',
+])
+def test_matches_old_parser(text):
+    assert Tlb2Json(text) == old_tlb2json(text)
+
+
+def leaves(node):
+    if node['_'] == 'hmn_leaf':
+        yield node['value']
+        return
+    for edge in ('left', 'right'):
+        yield from leaves(node[edge]['node'])
+
+
+def test_validator_set():
+    # the old parser stopped at the first bitstring literal of the hashmap labels
+    with pytest.raises(json.JSONDecodeError):
+        old_tlb2json(config_text(34))
+    config = Tlb2Json(config_text(34))['cur_validators']
+    expected = parse_validator_set(read_data('getconfig34.txt'))
+    assert config['_'] == 'validators_ext'
+    assert (config['utime_since'], config['total_weight']) == (expected.utime_since, expected.total_weight)
+    assert config['list']['root']['label']['s'] == 'x{001_}'
+    validators = list(leaves(config['list']['root']['node']))
+    assert [v['public_key']['pubkey'][1:] for v in validators] == expected.pubkeys
+    assert [v['weight'] for v in validators] == expected.weights
@@ -0,0 +1,49 @@
+import pytest
+
+import indexer.constants as constants
+from indexer.database import upsert_changed
+from indexer.views import build_cycle_view, update_cycle_views
+
+mongomock = pytest.importorskip('mongomock')
+
+
+CYCLE_ID = 1709852016
+PUBKEYS = ['AA' * 32, 'CC' * 32]
+ADNL_ADDRS = ['BB' * 32, 'DD' * 32]
+WALLET = 'Ef8zMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzMzM0vF'
+
+
+@pytest.fixture(params=['string', 'binary'])
+def db(request, monkeypatch):
+    monkeypatch.setattr(constants, 'STORAGE_FORMAT', request.param)
+    db = mongomock.MongoClient().db
+    validators = [{'pubkey': pubkey, 'adnl_addr': adnl_addr, 'weight': 10 - i, 'index': i}
+                  for i, (pubkey, adnl_addr) in enumerate(zip(PUBKEYS, ADNL_ADDRS))]
+    upsert_changed(db.validation_data, 'cycle_id', [{'cycle_id': CYCLE_ID, 'cycle_info': {'validators': validators, 'total': 2}}], 1)
+    participants = [{'pubkey': pubkey, 'adnl_addr': adnl_addr, 'stake': 100, 'max_factor': 196608, 'wallet_address': WALLET}
+                    for pubkey, adnl_addr in zip(PUBKEYS, ADNL_ADDRS)]
+    upsert_changed(db.elections_data, 'election_id', [{'election_id': CYCLE_ID, 'participants_list': participants, 'finished': True}], 1)
+    upsert_changed(db.complaints_data, 'pseudohash', [{'pseudohash': PUBKEYS[1] + str(CYCLE_ID), 'election_id': CYCLE_ID,
+                                                        'pubkey': PUBKEYS[1], 'reward_addr': WALLET}], 1)
+    return db
+
+
+def test_build_cycle_view(db):
+    view = build_cycle_view(db, CYCLE_ID)
+    first, second = view['cycle_info']['validators']
+    assert view['cycle_info']['total_participants'] == 2
+    assert first == {'pubkey': PUBKEYS[0], 'adnl_addr': ADNL_ADDRS[0], 'weight': 10, 'index': 0, 'stake': 100,
+                     'max_factor': 196608, 'wallet_address': WALLET, 'complaints': []}
+    assert [c['reward_addr'] for c in second['complaints']] == [WALLET]
+    assert '_meta' not in view and '_meta' not in second['complaints'][0]
+
+
+def test_update_cycle_views(db):
+    assert update_cycle_views(db, [CYCLE_ID], 2) == 1
+    assert db.cycle_view.find_one({'cycle_id': CYCLE_ID})['_meta']['seqno'] == 2
+    # an unchanged view is not written again
+    assert update_cycle_views(db, [CYCLE_ID], 3) == 0
+
+
+def test_missing_cycle_has_no_view(db):
+    assert build_cycle_view(db, CYCLE_ID + 1) is None
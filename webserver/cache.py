@@ -0,0 +1,83 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from webserver import constants
+from webserver.utils import _get_data_version, _dumps
+
+
+class ResponseCache:
+    """Bounded LRU of rendered responses.
+
+    Entries are tagged with the data version they were computed at and are
+    stale as soon as the indexer bumps the version or `ttl` expires.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key, version: int):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_version, stored_at, body, headers = entry
+        if entry_version != version or stored_at + self.ttl <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body, headers
+
+    def put(self, key, version: int, body: bytes, headers: dict):
+        self._entries[key] = (version, time.monotonic(), body, headers)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class DataVersion:
+    """Data version counter of the indexer, read from MongoDB at most every `interval` seconds."""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._version = None
+        self._checked_at = 0
+
+    async def get(self):
+        if self._version is None or self._checked_at + self.interval <= time.monotonic():
+            self._version = await _get_data_version()
+            self._checked_at = time.monotonic()
+        return self._version
+
+
+response_cache = ResponseCache(constants.RESPONSE_CACHE_SIZE, constants.RESPONSE_CACHE_TTL)
+data_version = DataVersion(constants.DATA_VERSION_POLL_INTERVAL)
+
+
+async def cached_response(request: Request, func, *args, cursor: Optional[Callable] = None):
+    """Response of `func(*args)`, served from the cache while the data version is unchanged.
+
+    `cursor(result)` gives the query parameters of the next page, sent to the
+    client urlencoded in the `X-Next-Cursor` header. Supports conditional
+    requests: a matching `If-None-Match` gets an empty 304.
+    """
+    version = await data_version.get()
+    key = (func.__name__, args)
+    cached = response_cache.get(key, version)
+    if cached is None:
+        result = await func(*args)
+        body = _dumps(result)
+        headers = {'ETag': f'"{hashlib.sha1(body).hexdigest()}"'}
+        next_page = cursor(result) if cursor is not None else None
+        if next_page is not None:
+            headers['X-Next-Cursor'] = urlencode(next_page)
+        response_cache.put(key, version, body, headers)
+    else:
+        body, headers = cached
+
+    if request.headers.get('if-none-match') == headers['ETag']:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
@@ -1,11 +1,12 @@
 from typing import Optional
 from loguru import logger
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exceptions import HTTPException
 
-from webserver.utils import _get_validation_cycles, _get_elections, _get_complaints
+from webserver.cache import cached_response
+from webserver.utils import _get_validation_cycles, _get_elections, _get_complaints, _export, _subscribe, _get_indexer_metrics, _invalid_fields, EVENT_TYPES
 
 
 # FastAPI app
@@ -16,6 +17,27 @@ app = FastAPI(
     description=description
 )
 
+def page_cursor(limit: int, **fields):
+    # keyset cursor: `before_*` parameters taken from the last item of a full page
+    def cursor(page):
+        if len(page) == 0 or len(page) < limit:
+            return None
+        return {param: page[-1][field] for param, field in fields.items()}
+    return cursor
+
+def columnar_format(format: str):
+    # `columnar` returns validators/participants as parallel arrays per field instead of a list of objects
+    if format not in ('rows', 'columnar'):
+        raise HTTPException(status_code=422, detail="format must be 'rows' or 'columnar'")
+    return format == 'columnar'
+
+def public_fields(collection: str, fields: Optional[str]):
+    # checked before the response starts, exports stream their documents
+    invalid = _invalid_fields(collection, fields)
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(invalid)}")
+    return fields
+
 @app.exception_handler(HTTPException)
 async def httpexception_handler(request, exc):
     return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
@@ -25,29 +47,83 @@ async def exception_handler(request, exc):
     return JSONResponse({"detail": "unknown"}, status_code=503)
 
 @app.get('/getValidationCycles')
-def get_validation_cycles(cycle_id: Optional[int]=None, 
-                          wallet_address: Optional[str]=None,
-                          adnl_address: Optional[str]=None,
-                          return_participants: bool=True,
-                          offset: int=0,
-                          limit: int=1):
-    return _get_validation_cycles(cycle_id, wallet_address, adnl_address, return_participants, offset, limit)
+async def get_validation_cycles(request: Request,
+                                cycle_id: Optional[int]=None, 
+                                wallet_address: Optional[str]=None,
+                                adnl_address: Optional[str]=None,
+                                return_participants: bool=True,
+                                offset: int=0,
+                                limit: int=1,
+                                before_cycle_id: Optional[int]=None,
+                                fields: Optional[str]=None,
+                                format: str='rows'):
+    return await cached_response(request, _get_validation_cycles, cycle_id, wallet_address, adnl_address, return_participants, offset, limit, before_cycle_id,
+                                 public_fields('cycle_view', fields), columnar_format(format),
+                                 cursor=page_cursor(limit, before_cycle_id='cycle_id'))
 
 @app.get('/getElections')
-def get_elections(election_id: Optional[int]=None, 
-                  wallet_address: Optional[str]=None,
-                  adnl_address: Optional[str]=None, 
-                  return_participants: bool=True,
-                  offset: int=0,
-                  limit: int=1):
-    return _get_elections(election_id, wallet_address, adnl_address, return_participants, offset, limit)
+async def get_elections(request: Request,
+                        election_id: Optional[int]=None, 
+                        wallet_address: Optional[str]=None,
+                        adnl_address: Optional[str]=None, 
+                        return_participants: bool=True,
+                        offset: int=0,
+                        limit: int=1,
+                        before_election_id: Optional[int]=None,
+                        fields: Optional[str]=None,
+                        format: str='rows'):
+    return await cached_response(request, _get_elections, election_id, wallet_address, adnl_address, return_participants, offset, limit, before_election_id,
+                                 public_fields('elections_data', fields), columnar_format(format),
+                                 cursor=page_cursor(limit, before_election_id='election_id'))
 
 @app.get('/getComplaints')
-def get_complaints(wallet_address: Optional[str]=None, 
-                   adnl_address: Optional[str]=None, 
-                   election_id: Optional[int]=None,
-                   offset: int=0,
-                   limit: int=1):
-    return _get_complaints(wallet_address, adnl_address, election_id, offset, limit)
+async def get_complaints(request: Request,
+                         wallet_address: Optional[str]=None, 
+                         adnl_address: Optional[str]=None, 
+                         election_id: Optional[int]=None,
+                         offset: int=0,
+                         limit: int=1,
+                         before_election_id: Optional[int]=None,
+                         before_created_time: Optional[int]=None,
+                         before_pseudohash: Optional[str]=None,
+                         fields: Optional[str]=None):
+    return await cached_response(request, _get_complaints, wallet_address, adnl_address, election_id, offset, limit,
+                                 before_election_id, before_created_time, before_pseudohash, public_fields('complaints_data', fields),
+                                 cursor=page_cursor(limit, before_election_id='election_id', before_created_time='created_time', before_pseudohash='pseudohash'))
+
+# Full history exports as newline-delimited JSON, `since`/`until` are election ids (inclusive)
+@app.get('/exportValidationCycles')
+async def export_validation_cycles(since: Optional[int]=None,
+                                   until: Optional[int]=None,
+                                   fields: Optional[str]=None):
+    return StreamingResponse(_export('cycle_view', 'cycle_id', since, until, public_fields('cycle_view', fields)), media_type='application/x-ndjson')
+
+@app.get('/exportElections')
+async def export_elections(since: Optional[int]=None,
+                           until: Optional[int]=None,
+                           fields: Optional[str]=None):
+    return StreamingResponse(_export('elections_data', 'election_id', since, until, public_fields('elections_data', fields)), media_type='application/x-ndjson')
+
+@app.get('/exportComplaints')
+async def export_complaints(since: Optional[int]=None,
+                            until: Optional[int]=None,
+                            fields: Optional[str]=None):
+    return StreamingResponse(_export('complaints_data', 'election_id', since, until, public_fields('complaints_data', fields)), media_type='application/x-ndjson')
 
+# Server-sent events pushed as the indexer writes: participant_added, stake_changed,
+# election_finished (type `election`) and complaint_added, complaint_updated (type `complaint`)
+@app.get('/subscribe')
+async def subscribe(types: str=','.join(EVENT_TYPES),
+                    election_id: Optional[int]=None,
+                    last_event_id: Optional[str]=Header(None)):
+    types = [t.strip() for t in types.split(',') if t.strip()]
+    if not types or any(t not in EVENT_TYPES for t in types):
+        raise HTTPException(status_code=422, detail=f"types must be a comma-separated list of: {', '.join(EVENT_TYPES)}")
+    return StreamingResponse(_subscribe(types, election_id, last_event_id),
+                             media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache'})
 
+# runs, skipped duplicate runs and last duration per indexer task, config cache hits/misses, broker queue depth
+@app.get('/getIndexerMetrics')
+async def get_indexer_metrics():
+    return await _get_indexer_metrics()
@@ -1,10 +1,18 @@
+import asyncio
+import json
+import re
+import time
 from typing import Optional, List
-from collections import defaultdict
 
 import inject
-
-from pymongo import MongoClient, DESCENDING
-from pymongo.database import Database
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, CursorType
+from indexer import storage
 from webserver import constants
 
 from loguru import logger
@@ -14,173 +22,231 @@ from loguru import logger
 def inject_config(binder):
     with open(constants.MONGO_PASSWORD_FILE, 'r') as f:
         password = f.read()
-    client = MongoClient(host=constants.MONGO_HOST, 
-                         port=constants.MONGO_PORT,
-                         username=constants.MONGO_USER,
-                         password=password)
+    client = AsyncIOMotorClient(host=constants.MONGO_HOST,
+                                port=constants.MONGO_PORT,
+                                username=constants.MONGO_USER,
+                                password=password,
+                                maxPoolSize=constants.MONGO_MAX_POOL_SIZE,
+                                minPoolSize=constants.MONGO_MIN_POOL_SIZE,
+                                maxIdleTimeMS=constants.MONGO_MAX_IDLE_TIME_MS,
+                                connectTimeoutMS=constants.MONGO_CONNECT_TIMEOUT_MS,
+                                socketTimeoutMS=constants.MONGO_SOCKET_TIMEOUT_MS,
+                                serverSelectionTimeoutMS=constants.MONGO_SERVER_SELECTION_TIMEOUT_MS)
     db_name = constants.MONGO_DATABASE
-    binder.bind(Database, client[db_name])
+    binder.bind(AsyncIOMotorDatabase, client[db_name])
 
 inject.configure_once(inject_config)
 
 
-@inject.autoparams()
-def _get_validation_cycle_ids_by_limit(offset: int, limit: int, db: Database):
-    cycle_ids_pipeline = [
-        {"$sort": {'cycle_id': -1}},
-        {"$skip": offset},
-        {"$limit": limit},
-        {"$project": {"cycle_id": 1}}
-    ]
+# Keyset pagination: endpoints take the sort key of the last item of the previous
+# page (`before_*` parameters) instead of walking skipped documents with `offset`.
+COMPLAINTS_ORDER = [('election_id', DESCENDING), ('created_time', DESCENDING), ('pseudohash', DESCENDING)]
 
-    cycle_ids = list(x['cycle_id'] for x in db.validation_data.aggregate(cycle_ids_pipeline))
-    return cycle_ids
 
+# Top-level fields of the documents the API returns. `fields` may select them or
+# paths below them; anything else, such as the internal `_meta`, is rejected.
+PUBLIC_FIELDS = {
+    'cycle_view': ('cycle_id', 'cycle_info', 'config15', 'config16', 'config17'),
+    'elections_data': ('election_id', 'elect_close', 'min_stake', 'total_stake', 'participants_list', 'finished'),
+    'complaints_data': ('election_id', 'hash', 'pubkey', 'adnl_addr', 'wallet_address', 'description', 'created_time',
+                        'severity', 'reward_addr', 'paid', 'suggested_fine', 'suggested_fine_part', 'voted_validators',
+                        'vset_id', 'weight_remaining', 'approved_percent', 'is_passed', 'pseudohash'),
+}
+FIELD_PATH = re.compile(r'[A-Za-z][A-Za-z0-9_]*(?:\.[A-Za-z][A-Za-z0-9_]*)*')
 
-@inject.autoparams()
-def _get_validation_cycle_ids_by_wallet_address(wallet_address: Optional[str],
-                                                offset: int,
-                                                limit: int,
-                                                db: Database):
-
-    pubkey_pipeline = [
-        {"$unwind": "$participants_list"},
-        {"$match": {"participants_list.wallet_address": wallet_address}},
-        {"$group": {"_id": wallet_address, "pubkey": {"$addToSet": "$participants_list.pubkey"}}},
-    ]
-    pubkey_by_wallet = list(db.elections_data.aggregate(pubkey_pipeline))
-    if len(pubkey_by_wallet) == 0:
-        return []
 
-    pubkey_list = pubkey_by_wallet[0]['pubkey']
+def _invalid_fields(collection: str, fields: Optional[str]) -> List[str]:
+    """Paths of comma-separated `fields` that are not public fields of `collection` or below them."""
+    paths = [field.strip() for field in (fields or '').split(',') if field.strip()]
+    return [path for path in paths
+            if not FIELD_PATH.fullmatch(path) or path.split('.')[0] not in PUBLIC_FIELDS[collection]]
 
-    cycle_ids_pipeline = [
-        {"$unwind":"$cycle_info.validators"},
-        {"$match": {"cycle_info.validators.pubkey": {"$in": pubkey_list}}},
-        {"$sort": {'cycle_id': -1}},
-        {"$skip": offset},
-        {"$limit": limit},
-        {"$project": {"cycle_id": 1}}
-    ]
 
-    cycle_ids = list(x['cycle_id'] for x in db.validation_data.aggregate(cycle_ids_pipeline))
-    return cycle_ids
+def _projection(fields: Optional[str], *required: str):
+    """MongoDB projection of comma-separated `fields`, extended by fields the endpoint needs itself."""
+    if fields:
+        paths = set(field.strip() for field in fields.split(',') if field.strip()) | set(required)
+        # MongoDB rejects a path together with its parent path
+        paths = [path for path in paths if not any(path.startswith(parent + '.') for parent in paths)]
+        return {'_id': False, **{path: True for path in sorted(paths)}}
+    return {'_id': False, '_meta': False}
 
 
-@inject.autoparams()
-def _get_validation_cycle_ids_by_adnl_address(adnl_addr: Optional[str],
-                                              offset: int,
-                                              limit: int,
-                                              db: Database):
+def _columnar(items: List[dict]):
+    """List of dicts as a dict of parallel arrays."""
+    columns = dict()
+    for i, item in enumerate(items):
+        for key, value in item.items():
+            if key not in columns:
+                columns[key] = [None] * i
+            columns[key].append(value)
+        for column in columns.values():
+            if len(column) == i:
+                column.append(None)
+    return columns
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson does not serialize integers wider than 64 bits
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _before(field: str, value: Optional[int]):
+    return {} if value is None else {field: {'$lt': value}}
+
+
+def _before_complaint(election_id: int, created_time: Optional[int], pseudohash: Optional[str]):
+    # complaints after (election_id, created_time, pseudohash) in COMPLAINTS_ORDER
+    conditions = [{'election_id': {'$lt': election_id}}]
+    if created_time is not None:
+        conditions.append({'election_id': election_id, 'created_time': {'$lt': created_time}})
+        if pseudohash is not None:
+            conditions.append({'election_id': election_id, 'created_time': created_time, 'pseudohash': {'$lt': pseudohash}})
+    return conditions
 
-    cycle_ids_pipeline = [
-        {"$unwind":"$cycle_info.validators"},
-        {"$match": {"cycle_info.validators.adnl_addr": adnl_addr}},
-        {"$sort": {'cycle_id': -1}},
-        {"$skip": offset},
-        {"$limit": limit},
-        {"$project": {"cycle_id": 1}}
-    ]
 
-    cycle_ids = list(x['cycle_id'] for x in db.validation_data.aggregate(cycle_ids_pipeline))
-    return cycle_ids
+@inject.autoparams()
+async def _get_data_version(db: AsyncIOMotorDatabase):
+    # bumped by the indexer after every change of indexed data
+    state = await db.service_state.find_one({'_id': 'data_version'})
+    return 0 if state is None else state['version']
 
 
 @inject.autoparams()
-def _get_validation_cycles(cycle_id: Optional[int]=None, 
-                           wallet_address: Optional[str]=None,
-                           adnl_address: Optional[str]=None,
-                           return_participants: bool=True,
-                           offset: int=0,
-                           limit: int=1, 
-                           db: Database=None):
-    if cycle_id or wallet_address or adnl_address:
-        by_cycle_id, by_wallet_address, by_adnl_address = None, None, None
-        if cycle_id is not None:
-            by_cycle_id = [cycle_id]
-        if wallet_address is not None:
-            by_wallet_address = _get_validation_cycle_ids_by_wallet_address(wallet_address, offset, limit)
-        if adnl_address is not None:
-            by_adnl_address = _get_validation_cycle_ids_by_adnl_address(adnl_address, offset, limit)
-
-        # find intersection of arrays by_cycle_id, by_wallet_address, by_adnl_address but ignore None
-        cycle_ids = list(set.intersection(*map(set, filter(lambda x: x is not None, [by_cycle_id, by_wallet_address, by_adnl_address]))))
-    else:
-        cycle_ids = _get_validation_cycle_ids_by_limit(offset, limit)
-
-    pipeline = [
-        {"$match": {"cycle_id": {"$in": cycle_ids}}},
-        {"$lookup": {
-            "from": "elections_data",
-            "localField": "cycle_id",
-            "foreignField": "election_id",
-            "as": "election_info"
-        }},
-        {"$lookup": {
-            "from": "complaints_data",
-            "localField": "cycle_id",
-            "foreignField": "election_id",
-            "as": "complaints_list"
-        }},
-        {"$sort": {"cycle_id": -1}}
+async def _get_validation_cycle_ids(cycle_id: Optional[int],
+                                    wallet_address: Optional[str],
+                                    adnl_address: Optional[str],
+                                    offset: int,
+                                    limit: int,
+                                    before_cycle_id: Optional[int],
+                                    db: AsyncIOMotorDatabase):
+    """Ids of cycles matching all given filters, newest first, paginated by one query."""
+    cycle_filter = _before('cycle_id', before_cycle_id)
+    if cycle_id is not None:
+        cycle_filter.setdefault('cycle_id', {})['$eq'] = cycle_id
+    page = [
+        {"$skip": offset},
+        {"$limit": limit}
     ]
 
-    result = list(db.validation_data.aggregate(pipeline))
-    for rec in result:
-        if not (len(rec['election_info']) == 1):
-            logger.warning(f"More than one election_info found")
+    if wallet_address is None and adnl_address is None:
+        cycle_ids_pipeline = [
+            {"$match": cycle_filter},
+            {"$sort": {'cycle_id': -1}},
+            *page,
+            {"$project": {"cycle_id": 1}}
+        ]
+        return [x['cycle_id'] async for x in db.validation_data.aggregate(cycle_ids_pipeline)]
+
+    # lookup collections are maintained by the indexer, see indexer.lookups
+    if wallet_address is None:
+        cycle_ids_pipeline = [
+            {"$match": {"adnl_addr": storage.match('hex', adnl_address), **cycle_filter}},
+            {"$sort": {'cycle_id': -1}},
+            *page
+        ]
+        return [x['cycle_id'] async for x in db.adnl_cycles.aggregate(cycle_ids_pipeline)]
+
+    pubkey_list = await db.wallet_pubkeys.distinct('pubkey', {'wallet_address': storage.match('address', wallet_address)})
+    if len(pubkey_list) == 0:
+        return []
+    pubkey_list = [key for pubkey in pubkey_list for key in storage.encodings('hex', storage.decode_value('hex', pubkey))]
 
-        complaints_dict = defaultdict(list)
-        for comp in rec.pop('complaints_list'):
-            comp.pop('_id')
-            complaints_dict[comp['pubkey']].append(comp)
+    cycle_ids_pipeline = [
+        {"$match": {"pubkey": {"$in": pubkey_list}, **cycle_filter}},
+        {"$group": {"_id": "$cycle_id"}}
+    ]
+    if adnl_address is not None:
+        cycle_ids_pipeline += [
+            {"$lookup": {
+                "from": "adnl_cycles",
+                "localField": "_id",
+                "foreignField": "cycle_id",
+                "pipeline": [{"$match": {"adnl_addr": storage.match('hex', adnl_address)}}, {"$limit": 1}],
+                "as": "by_adnl_address"
+            }},
+            {"$match": {"by_adnl_address": {"$ne": []}}}
+        ]
+    cycle_ids_pipeline += [
+        {"$sort": {'_id': -1}},
+        *page
+    ]
+    return [x['_id'] async for x in db.pubkey_cycles.aggregate(cycle_ids_pipeline)]
 
-        elections_dict = rec.pop('election_info')[0]['participants_list']
-        elections_dict = {x['pubkey']: x for x in elections_dict}
 
+@inject.autoparams()
+async def _get_validation_cycles(cycle_id: Optional[int]=None, 
+                                 wallet_address: Optional[str]=None,
+                                 adnl_address: Optional[str]=None,
+                                 return_participants: bool=True,
+                                 offset: int=0,
+                                 limit: int=1, 
+                                 before_cycle_id: Optional[int]=None,
+                                 fields: Optional[str]=None,
+                                 columnar: bool=False,
+                                 db: AsyncIOMotorDatabase=None):
+    cycle_ids = await _get_validation_cycle_ids(cycle_id, wallet_address, adnl_address, offset, limit, before_cycle_id)
+
+    required = ['cycle_id']
+    if not return_participants and (wallet_address or adnl_address):
+        required += ['cycle_info.validators.wallet_address', 'cycle_info.validators.adnl_addr']
+
+    # cycle_view is the pre-joined cycle maintained by the indexer, see indexer.views
+    result = await (db.cycle_view.find({"cycle_id": {"$in": cycle_ids}}, _projection(fields, *required))
+                                 .sort('cycle_id', DESCENDING)
+                                 .to_list(None))
+    result = storage.decode_document(result)
+    for rec in result:
+        if 'validators' not in rec.get('cycle_info', {}):
+            continue
         if not return_participants:
             if wallet_address or adnl_address:
                 # leave only requested participant in `validators` array
                 if wallet_address:
-                    rec['cycle_info']['validators'] = list(filter(lambda x: elections_dict[x['pubkey']]['wallet_address'] == wallet_address, rec['cycle_info']['validators']))
+                    rec['cycle_info']['validators'] = list(filter(lambda x: x.get('wallet_address') == wallet_address, rec['cycle_info']['validators']))
                 if adnl_address:
                     rec['cycle_info']['validators'] = list(filter(lambda x: x['adnl_addr'] == adnl_address, rec['cycle_info']['validators']))
             else:
                 rec['cycle_info']['validators'] = []
-
-        for val in rec['cycle_info']['validators']:
-            elect = elections_dict[val['pubkey']]
-            if elect == None:
-                logger.error(f'Election entry not found for validator with pubkey: {val["pubkey"]}, election_id: {rec["cycle_id"]}')
-                continue
-            if not (val['adnl_addr'] == elect['adnl_addr']):
-                logger.warning(f"Election info: adnl_addr mismatch")
-            val.update(elect)
-
-            val['complaints'] = complaints_dict[val['pubkey']]
-
-        rec['cycle_info']['total_participants'] = rec['cycle_info'].pop('total')
-        rec.pop('_id')
+        if columnar:
+            rec['cycle_info']['validators'] = _columnar(rec['cycle_info']['validators'])
     return result
 
 
 @inject.autoparams()
-def _get_elections(election_id: Optional[int]=None, 
-                   wallet_address: Optional[str]=None,
-                   adnl_address: Optional[str]=None, 
-                   return_participants: bool=True,
-                   offset: int=0,
-                   limit: int=1,
-                   db: Database=None):
-    request = {}
+async def _get_elections(election_id: Optional[int]=None, 
+                         wallet_address: Optional[str]=None,
+                         adnl_address: Optional[str]=None, 
+                         return_participants: bool=True,
+                         offset: int=0,
+                         limit: int=1,
+                         before_election_id: Optional[int]=None,
+                         fields: Optional[str]=None,
+                         columnar: bool=False,
+                         db: AsyncIOMotorDatabase=None):
+    request = _before('election_id', before_election_id)
     if election_id is not None:
-        request['election_id'] = {'$eq': election_id}
+        request.setdefault('election_id', {})['$eq'] = election_id
     if wallet_address is not None:
-        request['participants_list.wallet_address'] = {'$eq': wallet_address}
+        request['participants_list.wallet_address'] = storage.match('address', wallet_address)
     if adnl_address is not None:
-        request['participants_list.adnl_addr'] = {'$eq': adnl_address}
+        request['participants_list.adnl_addr'] = storage.match('hex', adnl_address)
+
+    required = ['election_id', 'finished', 'participants_list.pubkey']
+    if not return_participants and (wallet_address or adnl_address):
+        required += ['participants_list.wallet_address', 'participants_list.adnl_addr']
+    response = storage.decode_document(await db.elections_data.find(request, _projection(fields, *required)).skip(offset).limit(limit).sort('election_id', DESCENDING).to_list(None))
 
-    response = list(db.elections_data.find(request, {'_id': False}).skip(offset).limit(limit).sort('election_id', DESCENDING))
+    # validator indexes of all returned elections in one query: cycle_id -> {pubkey: index}
+    validation_cycles = db.validation_data.find({'cycle_id': {'$in': [election['election_id'] for election in response]}},
+                                                {'_id': False, 'cycle_id': True, 'cycle_info.validators.pubkey': True, 'cycle_info.validators.index': True})
+    validator_indexes = {cycle['cycle_id']: {storage.decode_value('hex', validator['pubkey']): validator['index'] for validator in cycle['cycle_info']['validators']}
+                         async for cycle in validation_cycles}
 
     for election in response:
         election['total_participants'] = len(election['participants_list'])
@@ -196,41 +262,121 @@ def _get_elections(election_id: Optional[int]=None,
                 election['participants_list'] = []
 
         election_id = election['election_id']
-        validation_req = {'cycle_id': {'$eq': election_id}}
-        validation_cycle = db.validation_data.find_one(validation_req)
-        if validation_cycle is not None:
+        indexes = validator_indexes.get(election_id)
+        if indexes is not None:
             for participant in election['participants_list']:
-                try:
-                    validation_entry = next(validator for validator in validation_cycle['cycle_info']['validators'] if participant['pubkey'] == validator['pubkey'])
-                    validator_index = validation_entry['index']
-                except StopIteration:
-                    validator_index = None
-                participant['index'] = validator_index
+                participant['index'] = indexes.get(participant['pubkey'])
         else:
             if election['finished']:
                 logger.error(f"Validation entry for election_id={election_id} not found!")
 
+        if columnar:
+            election['participants_list'] = _columnar(election['participants_list'])
+
     return response
 
 
 @inject.autoparams()
-def _get_complaints(wallet_address: Optional[str]=None, 
-                    adnl_address: Optional[str]=None, 
-                    election_id: Optional[int]=None, 
-                    offset: int=0,
-                    limit: int=1, 
-                    db: Database=None):
+async def _get_complaints(wallet_address: Optional[str]=None, 
+                          adnl_address: Optional[str]=None, 
+                          election_id: Optional[int]=None, 
+                          offset: int=0,
+                          limit: int=1, 
+                          before_election_id: Optional[int]=None,
+                          before_created_time: Optional[int]=None,
+                          before_pseudohash: Optional[str]=None,
+                          fields: Optional[str]=None,
+                          db: AsyncIOMotorDatabase=None):
     request = {}
     if wallet_address is not None:
-        request['wallet_address'] = {'$eq': wallet_address}
+        request['wallet_address'] = storage.match('address', wallet_address)
     if adnl_address is not None:
-        request['adnl_addr'] = {'$eq': adnl_address}
+        request['adnl_addr'] = storage.match('hex', adnl_address)
     if election_id is not None:
         request['election_id'] = {'$eq': election_id}
+    if before_election_id is not None:
+        request['$or'] = _before_complaint(before_election_id, before_created_time, before_pseudohash)
 
-    response = list(db.complaints_data.find(request, {'_id': False})
-                                      .skip(offset)
-                                      .limit(limit)
-                                      .sort([('election_id', DESCENDING), ('created_time', DESCENDING)]))
+    response = await (db.complaints_data.find(request, _projection(fields, 'election_id', 'created_time', 'pseudohash'))
+                                        .skip(offset)
+                                        .limit(limit)
+                                        .sort(COMPLAINTS_ORDER)
+                                        .to_list(None))
 
-    return response
+    return storage.decode_document(response)
+
+
+# NDJSON exports read Mongo cursors batch by batch, so memory use does not
+# depend on the size of the export.
+EXPORT_BATCH_SIZE = 100
+
+
+@inject.autoparams()
+async def _export(collection: str,
+                  id_field: str,
+                  since: Optional[int]=None,
+                  until: Optional[int]=None,
+                  fields: Optional[str]=None,
+                  db: AsyncIOMotorDatabase=None):
+    """Documents of `collection` with `since <= id_field <= until` as NDJSON lines, oldest first."""
+    request = {}
+    if since is not None:
+        request['$gte'] = since
+    if until is not None:
+        request['$lte'] = until
+    request = {id_field: request} if request else {}
+
+    cursor = db[collection].find(request, _projection(fields), batch_size=EXPORT_BATCH_SIZE).sort(id_field, ASCENDING)
+    async for doc in cursor:
+        yield _dumps(storage.decode_document(doc)) + b'\n'
+
+
+# Server-sent events: the capped `events` collection written by the indexer
+# (see indexer.events) is followed with a tailable cursor.
+EVENT_TYPES = ('election', 'complaint')
+EVENTS_KEEPALIVE_INTERVAL = 15
+
+
+@inject.autoparams()
+async def _subscribe(types: List[str],
+                     election_id: Optional[int]=None,
+                     last_event_id: Optional[str]=None,
+                     db: AsyncIOMotorDatabase=None):
+    """SSE messages of new indexer events; resumes after `last_event_id` when it is given.
+
+    Event ids are the `seq` numbers the indexer assigns in insertion order.
+    """
+    request = {'type': {'$in': types}}
+    if election_id is not None:
+        request['election_id'] = election_id
+    try:
+        last_seq = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_seq = None
+    if last_seq is None:
+        last = await db.events.find_one({'seq': {'$exists': True}}, {'seq': True}, sort=[('$natural', DESCENDING)])
+        last_seq = last['seq'] if last is not None else 0
+
+    keepalive_at = time.monotonic() + EVENTS_KEEPALIVE_INTERVAL
+    while True:
+        request['seq'] = {'$gt': last_seq}
+        cursor = db.events.find(request, {'_id': False}, cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive:
+            async for event in cursor:
+                event = storage.decode_document(event)
+                last_seq = event['seq']
+                yield f"id: {last_seq}\nevent: {event.pop('event')}\ndata: {_dumps(event).decode()}\n\n"
+            if time.monotonic() >= keepalive_at:
+                keepalive_at = time.monotonic() + EVENTS_KEEPALIVE_INTERVAL
+                yield ": keepalive\n\n"
+        # a tailable cursor dies when the collection is empty
+        await asyncio.sleep(1)
+
+
+@inject.autoparams()
+async def _get_indexer_metrics(db: AsyncIOMotorDatabase=None):
+    """Task counters and queue depth recorded by the indexer, with the tasks running now."""
+    metrics = await db.service_state.find_one({'_id': 'task_metrics'}, {'_id': False}) or {}
+    locks = db.task_locks.find({'owner': {'$ne': None}, 'expires_at': {'$gte': time.time()}}, {'_id': True})
+    metrics['running'] = [lock['_id'] async for lock in locks]
+    return metrics